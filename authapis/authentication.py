@@ -0,0 +1,160 @@
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_CACHE_ALIAS = getattr(settings, 'AUTHAPIS_TOKEN_CACHE_ALIAS', 'tokens')
+KEY_PREFIX = 'authapis:token'
+
+stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[TOKEN_CACHE_ALIAS]
+
+
+def cache_enabled():
+    """
+    Returns whether the token cache is used: only with a backend shared by the worker processes,
+    since a token removed from the local memory of one worker would still authenticate in the others.
+    """
+    return not isinstance(get_cache(), (LocMemCache, DummyCache))
+
+
+def token_cache_key(key):
+    return f'{KEY_PREFIX}:{key}'
+
+
+def count(outcome):
+    with stats_lock:
+        stats[outcome] += 1
+
+
+def token_cache_stats():
+    """
+    Returns the token cache counters of this process.
+
+    Returns:
+        dict: The number of hits, misses and invalidations and the hit ratio.
+    """
+    with stats_lock:
+        hits, misses, invalidations = stats['hits'], stats['misses'], stats['invalidations']
+    return {
+        'hits': hits,
+        'misses': misses,
+        'invalidations': invalidations,
+        'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+    }
+
+
+def cache_entry(token):
+    # Only what authentication needs: the user's other fields, password hash included, stay out of the cache
+    return token.user_id, token.user.is_active
+
+
+def token_from_entry(key, entry):
+    """
+    Returns the token of a cache entry with its user. The user only holds its id and active flag,
+    its other fields are loaded from the database when they are read.
+    """
+    user_id, is_active = entry
+    user = get_user_model().from_db(DEFAULT_DB_ALIAS, ['id', 'is_active'], [user_id, is_active])
+    token = Token.from_db(DEFAULT_DB_ALIAS, ['key', 'user_id'], [key, user_id])
+    token.user = user
+    return token
+
+
+def get_token(key):
+    """
+    Returns the token with the given key, with its user, from the token cache or the database.
+
+    Returns:
+        Token: The token, or None if no token has this key.
+    """
+    if not cache_enabled():
+        return Token.objects.select_related('user').filter(key=key).first()
+
+    cache = get_cache()
+    entry = cache.get(token_cache_key(key))
+    if entry is not None:
+        count('hits')
+        return token_from_entry(key, entry)
+
+    count('misses')
+    token = Token.objects.select_related('user').filter(key=key).first()
+    if token is not None:
+        cache.set(token_cache_key(key), cache_entry(token))
+    return token
+
+
+async def aget_token(key):
+    """Same as get_token, for async views."""
+    if not cache_enabled():
+        return await Token.objects.select_related('user').filter(key=key).afirst()
+
+    cache = get_cache()
+    entry = await cache.aget(token_cache_key(key))
+    if entry is not None:
+        count('hits')
+        return token_from_entry(key, entry)
+
+    count('misses')
+    token = await Token.objects.select_related('user').filter(key=key).afirst()
+    if token is not None:
+        await cache.aset(token_cache_key(key), cache_entry(token))
+    return token
+
+
+def invalidate_tokens(keys):
+    """
+    Removes tokens from the token cache.
+
+    The entries are removed right away and again once the current transaction commits, so
+    that a request which read the token before the commit cannot leave a stale entry behind.
+    """
+    keys = [token_cache_key(key) for key in keys]
+    if not keys:
+        return
+    get_cache().delete_many(keys)
+    transaction.on_commit(lambda: get_cache().delete_many(keys))
+    with stats_lock:
+        stats['invalidations'] += len(keys)
+
+
+def token_deleted(sender, instance, **kwargs):
+    """post_delete receiver of Token, for logout."""
+    invalidate_tokens([instance.key])
+
+
+def user_saved(sender, instance, created, **kwargs):
+    """post_save receiver of the user model: the cached tokens hold the active flag of their user."""
+    if not created and cache_enabled():
+        invalidate_tokens(Token.objects.filter(user=instance).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that serves the token and its user from the token cache, so that a
+    request authenticated with a known token does not query the database.
+
+    The cache entries hold the id and active flag of the user, expire after the timeout of the token
+    cache and are removed as soon as the token is deleted (logout, or with its user) or its user is
+    saved (update_user). Without a shared cache backend every request reads the token from the database.
+    """
+
+    def authenticate_credentials(self, key):
+        token = get_token(key)
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return token.user, token
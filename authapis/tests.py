@@ -1,3 +1,74 @@
-from django.test import TestCase
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .authentication import get_cache, get_token, token_cache_key
+from .models import User
+
+TOKEN_CACHE_DIR = tempfile.mkdtemp()
+
+# The token cache is only used with a backend shared between processes
+SHARED_TOKEN_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'tokens': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': TOKEN_CACHE_DIR},
+}
+
+
+def tearDownModule():
+    shutil.rmtree(TOKEN_CACHE_DIR, ignore_errors=True)
+
+
+@override_settings(CACHES=SHARED_TOKEN_CACHE)
+class TokenCacheTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user(username='cached', password='cached-password')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def cached_entry(self):
+        return get_cache().get(token_cache_key(self.token.key))
+
+    def test_only_the_user_id_and_active_flag_are_cached(self):
+        self.assertEqual(self.client.get('/api/auth/testtoken').status_code, 200)
+        self.assertEqual(self.cached_entry(), (self.user.pk, True))
+
+        with self.assertNumQueries(0):
+            token = get_token(self.token.key)
+        self.assertEqual((token.key, token.user.pk, token.user.is_active), (self.token.key, self.user.pk, True))
+        # The other fields are read from the database
+        with self.assertNumQueries(1):
+            self.assertEqual(token.user.username, 'cached')
+
+    def test_logout_invalidates_the_cached_token(self):
+        self.client.get('/api/auth/testtoken')
+        self.assertIsNotNone(self.cached_entry())
+
+        self.assertEqual(self.client.post('/api/auth/logout').status_code, 200)
+        self.assertIsNone(self.cached_entry())
+        self.assertEqual(self.client.get('/api/auth/testtoken').status_code, 403)
+
+    def test_update_user_invalidates_the_cached_token(self):
+        self.client.get('/api/auth/testtoken')
+        self.assertIsNotNone(self.cached_entry())
+
+        response = self.client.patch('/api/auth/update-user/', {'email': 'cached@example.com'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(self.cached_entry())
+        self.assertEqual(self.client.get('/api/auth/testtoken').json()['email'], 'cached@example.com')
+
+    def test_deactivated_users_are_refused(self):
+        self.client.get('/api/auth/testtoken')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/testtoken').status_code, 403)
+
+    @override_settings(CACHES=dict(SHARED_TOKEN_CACHE, tokens={'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}))
+    def test_local_memory_cache_is_not_used(self):
+        self.assertEqual(self.client.get('/api/auth/testtoken').status_code, 200)
+        self.assertIsNone(self.cached_entry())
@@ -1,7 +1,8 @@
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view, authentication_classes, permission_classes 
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from rest_framework.authentication import SessionAuthentication
+from authapis.authentication import CachedTokenAuthentication
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework import status
@@ -92,14 +93,14 @@ def signup(request):
 
 
 @api_view(['GET'])
-@authentication_classes([SessionAuthentication,TokenAuthentication])
+@authentication_classes([SessionAuthentication,CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def testtoken(request):
     """
     A view function that handles GET requests to the testtoken endpoint.
     
     This function is decorated with `@api_view(['GET'])` to indicate that it handles GET requests.
-    It is also decorated with `@authentication_classes([SessionAuthentication,TokenAuthentication])`
+    It is also decorated with `@authentication_classes([SessionAuthentication,CachedTokenAuthentication])`
     to specify that both session-based authentication and token-based authentication are required for accessing this endpoint.
     The `@permission_classes([IsAuthenticated])` decorator ensures that the user making the request is authenticated.
     
@@ -119,7 +120,7 @@ def testtoken(request):
 
 
 @api_view(['PATCH'])
-@authentication_classes([SessionAuthentication, TokenAuthentication])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def update_user(request):
     """
@@ -169,7 +170,7 @@ def update_user(request):
 
 
 @api_view(['POST'])
-@authentication_classes([SessionAuthentication, TokenAuthentication])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def logout(request):
     """
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "authapis",
     "cloudwatch",
     "corsheaders",
@@ -52,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "cloudwatch.metrics.MetricsMiddleware",
+    "cloudwatch.compression.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -59,6 +62,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "cloudwatch.routers.PrimaryAfterWriteMiddleware",
 ]
 
 ROOT_URLCONF = "backend.urls"
@@ -85,15 +89,127 @@ WSGI_APPLICATION = "backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    "default": {
+def database_settings(prefix, default=None):
+    """
+    Reads the settings of a database from the `<prefix>_NAME`, `_USER`, `_PASSWORD`, `_HOST` and `_PORT`
+    environment variables, falling back to the values of default.
+    """
+    default = default or {}
+    database = {
         "ENGINE": "django.db.backends.postgresql",
-        "NAME": os.getenv("DATABASE_NAME"),
-        "USER": os.getenv("DATABASE_USER"),
-        "PASSWORD": os.getenv("DATABASE_PASSWORD"),
-        "HOST": os.getenv("DATABASE_HOST"),
-        "PORT": os.getenv("DATABASE_PORT"),
+        "NAME": os.getenv(f"{prefix}_NAME", default.get("NAME")),
+        "USER": os.getenv(f"{prefix}_USER", default.get("USER")),
+        "PASSWORD": os.getenv(f"{prefix}_PASSWORD", default.get("PASSWORD")),
+        "HOST": os.getenv(f"{prefix}_HOST", default.get("HOST")),
+        "PORT": os.getenv(f"{prefix}_PORT", default.get("PORT")),
+        # Connections are checked before reuse and replaced if the server dropped them
+        "CONN_HEALTH_CHECKS": True,
     }
+    if os.getenv("DATABASE_POOL", "false").lower() == "true":
+        # Needs psycopg 3 with the pool extra (psycopg[pool]) and replaces persistent connections
+        database["CONN_MAX_AGE"] = 0
+        database["OPTIONS"] = {
+            "pool": {
+                "min_size": int(os.getenv("DATABASE_POOL_MIN_SIZE", "2")),
+                "max_size": int(os.getenv("DATABASE_POOL_MAX_SIZE", "10")),
+            },
+        }
+    else:
+        database["CONN_MAX_AGE"] = int(os.getenv("DATABASE_CONN_MAX_AGE", "60"))
+    return database
+
+
+DATABASES = {
+    "default": database_settings("DATABASE"),
+}
+
+# Read replicas, e.g. DATABASE_REPLICAS=replica with DATABASE_REPLICA_HOST=... (the other
+# variables default to the primary's). The read-only cloudwatch views read from them.
+CLOUDWATCH_REPLICA_DATABASES = [alias.strip() for alias in os.getenv("DATABASE_REPLICAS", "").split(",") if alias.strip()]
+for alias in CLOUDWATCH_REPLICA_DATABASES:
+    DATABASES[alias] = database_settings(f"DATABASE_{alias.upper()}", DATABASES["default"])
+    # Tests run against the primary only
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+# Seconds the reads of a user stay on the primary after a write, should exceed the replication lag
+CLOUDWATCH_PRIMARY_AFTER_WRITE_SECONDS = int(os.getenv("CLOUDWATCH_PRIMARY_AFTER_WRITE_SECONDS", "10"))
+
+DATABASE_ROUTERS = ["cloudwatch.routers.ReplicaRouter"]
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The local-memory default is per process: use a shared backend (for instance
+# django.core.cache.backends.redis.RedisCache) when running several workers.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "cloudwatch"),
+    },
+    # Tokens and the id and active flag of their users, see authapis.authentication.CachedTokenAuthentication.
+    # Only used with a shared backend: a logout has to reach every worker.
+    "tokens": {
+        "BACKEND": os.getenv("TOKEN_CACHE_BACKEND", "django.core.cache.backends.dummy.DummyCache"),
+        "LOCATION": os.getenv("TOKEN_CACHE_LOCATION", "tokens"),
+        "TIMEOUT": int(os.getenv("TOKEN_CACHE_TIMEOUT", "300")),
+    },
+}
+
+CLOUDWATCH_CACHE_TIMEOUT = int(os.getenv("CLOUDWATCH_CACHE_TIMEOUT", "60"))
+
+# Asynchronous ingestion: POSTs to log_list and log_batch are queued and answered with 202
+CLOUDWATCH_ASYNC_INGEST = os.getenv("CLOUDWATCH_ASYNC_INGEST", "false").lower() == "true"
+CLOUDWATCH_QUEUE_MAX_DEPTH = int(os.getenv("CLOUDWATCH_QUEUE_MAX_DEPTH", "50000"))
+
+# Live tail of the new logs at /api/cloudwatch/logs/tail/ (ASGI), a subscriber that falls
+# CLOUDWATCH_TAIL_BUFFER_SIZE events behind is dropped. Off by default, as every ingest then sends a NOTIFY
+CLOUDWATCH_LIVE_TAIL = os.getenv("CLOUDWATCH_LIVE_TAIL", "false").lower() == "true"
+CLOUDWATCH_TAIL_BUFFER_SIZE = int(os.getenv("CLOUDWATCH_TAIL_BUFFER_SIZE", "1000"))
+
+# Request metrics, exposed at /api/cloudwatch/metrics/, and the log of the requests slower than
+# CLOUDWATCH_SLOW_REQUEST_SECONDS (an empty value disables it)
+CLOUDWATCH_METRICS_ENABLED = os.getenv("CLOUDWATCH_METRICS_ENABLED", "true").lower() == "true"
+CLOUDWATCH_SLOW_REQUEST_SECONDS = float(os.getenv("CLOUDWATCH_SLOW_REQUEST_SECONDS", "1.0") or 0) or None
+
+# Compression of the responses of CLOUDWATCH_COMPRESSION_MIN_SIZE bytes or more with zstd, brotli
+# or gzip, whichever the client accepts (zstd and brotli need the zstandard and brotli packages)
+CLOUDWATCH_COMPRESSION = os.getenv("CLOUDWATCH_COMPRESSION", "true").lower() == "true"
+CLOUDWATCH_COMPRESSION_MIN_SIZE = int(os.getenv("CLOUDWATCH_COMPRESSION_MIN_SIZE", "1024"))
+
+# JSON is rendered and parsed with orjson when it is installed, see cloudwatch.renderers
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "cloudwatch.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "cloudwatch.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+
+# Logging of the cloudwatch app, as JSON lines or text. CLOUDWATCH_LOG_LEVEL=OFF disables it.
+# https://docs.djangoproject.com/en/5.0/topics/logging/
+CLOUDWATCH_LOG_LEVEL = os.getenv("CLOUDWATCH_LOG_LEVEL", "INFO").upper()
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "cloudwatch.formatters.JsonFormatter"},
+        "text": {"format": "%(asctime)s %(levelname)s %(name)s %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": os.getenv("CLOUDWATCH_LOG_FORMAT", "json")},
+        "null": {"class": "logging.NullHandler"},
+    },
+    "loggers": {
+        "cloudwatch": {
+            "handlers": ["null"] if CLOUDWATCH_LOG_LEVEL == "OFF" else ["console"],
+            "level": "CRITICAL" if CLOUDWATCH_LOG_LEVEL == "OFF" else CLOUDWATCH_LOG_LEVEL,
+            "propagate": False,
+        },
+    },
 }
 
 
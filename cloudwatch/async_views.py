@@ -0,0 +1,198 @@
+"""
+Async versions of the read endpoints, for deployments served over ASGI.
+
+They answer like the views of the same name in cloudwatch.views, but run their queries
+with the async ORM interfaces so a request waiting on PostgreSQL does not hold a thread.
+They are plain Django async views: the REST framework views are synchronous.
+"""
+from datetime import datetime, timedelta
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+
+from authapis.authentication import aget_token
+
+from .counters import aexact_count, estimated_count
+from .export import export_response
+from .histogram import ahistogram, filters_from_params, interval_counts, interval_from_params
+from .models import Log
+from .pagination import KeysetPagination
+from .renderers import ORJSONRenderer
+from .routers import replica_reads
+from .serializers import log_fields, log_rows, represent_logs
+from .tail import LIVE_TAIL, broker, parse_filters
+from .utils import build_log_filters
+from .views import count_filters, daily_counts
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    """Renders data like the REST framework JSON renderer does for the synchronous views."""
+    return HttpResponse(ORJSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+async def authenticate(request):
+    """
+    Returns the user of a request authenticated with a token (`Authorization: Token <key>`) or a session.
+
+    Returns:
+        tuple: (user, error) where error is the message to answer with when the request is not authenticated.
+    """
+    header = request.headers.get('Authorization', '').split()
+    if header and header[0].lower() == 'token':
+        if len(header) != 2:
+            return None, "Invalid token header."
+        token = await aget_token(header[1])
+        if token is None:
+            return None, "Invalid token."
+        if not token.user.is_active:
+            return None, "User inactive or deleted."
+        return token.user, None
+
+    user = await request.auser()
+    if user.is_authenticated:
+        return user, None
+    return None, "Authentication credentials were not provided."
+
+
+def async_api_view():
+    """
+    Turns an async function into a GET-only view, authenticated like the synchronous views.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return json_response({"detail": f'Method "{request.method}" not allowed.'},
+                                     status_code=status.HTTP_405_METHOD_NOT_ALLOWED)
+            user, error = await authenticate(request)
+            if user is None:
+                return json_response({"detail": error}, status_code=status.HTTP_403_FORBIDDEN)
+            request.user = user
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@async_api_view()
+@replica_reads
+async def recent_logs(request):
+    """Async version of cloudwatch.views.recent_logs: the 5 most recent logs."""
+    try:
+        fields = log_fields(request.GET.get('fields', None))
+    except ValueError as e:
+        return json_response({"error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    rows = [row async for row in log_rows(Log.objects.order_by('-timestamp'), fields)[:5]]
+    return json_response(represent_logs(rows, fields))
+
+
+@async_api_view()
+@replica_reads
+async def total_logs_count(request):
+    """Async version of cloudwatch.views.total_logs_count: the number of logs from the counters or estimated."""
+    params = request.GET
+    try:
+        filters, owner = count_filters(params)
+    except ValueError as e:
+        return json_response({"error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    if params.get('approximate') == 'true':
+        # EXPLAIN goes through a raw cursor, which has no async interface
+        total_count = await sync_to_async(estimated_count)(Log.objects.filter(filters))
+        return json_response({'total_logs_count': total_count, 'approximate': True})
+
+    total_count = None
+    if not params.get('period') and not params.get('securityinfo'):
+        total_count = await aexact_count(params.get('logGroupName'), params.get('logStreamName'), owner)
+    if total_count is None:
+        total_count = await Log.objects.filter(filters).acount()
+    return json_response({'total_logs_count': total_count})
+
+
+@async_api_view()
+@replica_reads
+async def filter_logs(request):
+    """Async version of cloudwatch.views.filter_logs: the logs matching the filters, optionally paginated."""
+    try:
+        filters = build_log_filters(request.GET)
+        fields = log_fields(request.GET.get('fields', None))
+    except ValueError as e:
+        return json_response({"error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    logs = Log.objects.filter(filters)
+
+    export_format = request.GET.get('export', None)
+    if export_format:
+        try:
+            return export_response(logs, export_format, fields, is_async=True)
+        except ValueError as e:
+            return json_response({"error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    rows = log_rows(logs, fields)
+    paginator = KeysetPagination()
+    page = await paginator.apaginate_queryset(rows, request)
+    if page is not None:
+        return json_response(paginator.get_paginated_data(represent_logs(page, fields)))
+
+    rows = [row async for row in rows]
+    return json_response(represent_logs(rows, fields))
+
+
+@async_api_view()
+@replica_reads
+async def log_count_interval(request):
+    """Async version of cloudwatch.views.log_count_interval: the number of logs per interval."""
+    try:
+        start_time, end_time, interval_delta = interval_from_params(request.GET, timezone.now())
+    except ValueError as e:
+        return json_response({"error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
+    split_by = request.GET.get('split_by', None)
+
+    try:
+        buckets = await ahistogram(start_time, end_time, interval_delta, split_by=split_by,
+                                   filters=filters_from_params(request.GET))
+    except ValueError as e:
+        return json_response({"error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    return json_response(interval_counts(buckets, split_by))
+
+
+@async_api_view()
+@replica_reads
+async def last_seven_days(request):
+    """Async version of cloudwatch.views.last_seven_days: the number of logs of each of the last seven days."""
+    current_date = datetime.now()
+    first_day = (current_date - timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
+    buckets = await ahistogram(first_day, first_day + timedelta(days=7), timedelta(days=1))
+    return json_response(daily_counts(current_date, [bucket['count'] for bucket in buckets]))
+
+
+@async_api_view()
+async def live_tail(request):
+    """
+    Streams the logs stored from now on as Server-Sent Events, optionally filtered by logGroupName,
+    logStreamName and level (a comma-separated list). Each event carries a log as the log_list
+    endpoint returns it, see cloudwatch.tail.
+    """
+    if not LIVE_TAIL:
+        return json_response({"detail": "The live tail is disabled."}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    filters = parse_filters(request.GET)
+
+    async def events():
+        # Subscribed once the response is streamed, the subscription ends when the client disconnects
+        subscriber = broker.subscribe(filters)
+        try:
+            yield b'retry: 5000\n\n'
+            async for frame in subscriber.events():
+                yield frame
+        finally:
+            broker.unsubscribe(subscriber)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Tells nginx not to buffer the events
+    response['X-Accel-Buffering'] = 'no'
+    return response
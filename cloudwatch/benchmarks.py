@@ -0,0 +1,348 @@
+"""
+End-to-end benchmark of the cloudwatch and authapis endpoints, run in-process with the Django test client.
+
+Every endpoint is requested a number of times and the latency, the number of SQL queries, the size of
+the response and the peak memory allocated by a request are recorded, see the benchmark_endpoints
+command. RenderingBenchmark times the serialization, rendering and compression of the large listings
+alone, see the benchmark_rendering command.
+"""
+import gzip
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+
+from authapis.models import User
+
+from .cache import invalidate
+from .compression import ENCODINGS
+from .ingest import record_deleted, store_log
+from .models import Log
+from .renderers import ORJSONRenderer
+from .serializers import LogSerializer, log_fields, log_rows, represent_logs
+from .synthetic import LogGenerator
+from .utils import get_time_interval
+
+BENCHMARK_GROUP = 'cloudwatch-benchmark'
+BENCHMARK_USERNAME = 'benchmark-user'
+LOGOUT_USERNAME = 'benchmark-logout'
+SIGNUP_PREFIX = 'benchmark-signup-'
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class Case:
+    """
+    One benchmarked request.
+
+    prepare is called before every request, outside the measurement, with the iteration number and
+    returns the keyword arguments of the request that change between iterations (path, data, ...).
+    Full listings return every stored log and are only run when asked for.
+    """
+
+    def __init__(self, name, method, path, prepare=None, full_listing=False, **request):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.prepare = prepare
+        self.full_listing = full_listing
+        self.request = request
+
+    def request_kwargs(self, iteration):
+        kwargs = dict(self.request, path=self.path)
+        if self.prepare is not None:
+            kwargs.update(self.prepare(iteration))
+        return kwargs
+
+
+class BenchmarkSuite:
+    """
+    Runs the benchmark cases against the configured database and removes what the write cases stored.
+
+    The logs stored while the suite runs are the ones with an id above the largest id found at the
+    start, so the suite should run against a database nobody else writes to.
+    """
+
+    def __init__(self, iterations=20, warmup=3, cold_cache=False, full_listings=False, accept_encoding=None):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.cold_cache = cold_cache
+        self.full_listings = full_listings
+        self.accept_encoding = accept_encoding
+        self.generator = LogGenerator(owner=None, groups=1, streams_per_group=1)
+
+    def setup(self):
+        self.user = self.get_user(BENCHMARK_USERNAME)
+        self.token = Token.objects.get_or_create(user=self.user)[0]
+        self.logout_user = self.get_user(LOGOUT_USERNAME)
+        self.first_new_id = (Log.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        self.sample_log = Log.objects.order_by('-timestamp').first()
+        headers = {'HTTP_ACCEPT_ENCODING': self.accept_encoding} if self.accept_encoding else {}
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {self.token.key}', **headers)
+
+    def get_user(self, username):
+        user, created = User.objects.get_or_create(username=username)
+        if created:
+            user.set_password(BENCHMARK_PASSWORD)
+            user.save()
+        return user
+
+    def teardown(self):
+        """Deletes the logs and users created by the write cases."""
+        with transaction.atomic():
+            logs = list(Log.objects.filter(id__gte=self.first_new_id))
+            Log.objects.filter(id__in=[log.id for log in logs]).delete()
+            record_deleted(logs)
+        User.objects.filter(username__startswith=SIGNUP_PREFIX).delete()
+        return len(logs)
+
+    def generate(self, count):
+        for event in self.generator.events(count):
+            event.update(logGroupName=BENCHMARK_GROUP, logStreamName=BENCHMARK_GROUP, owner=self.user.pk)
+            yield event
+
+    def new_events(self, count):
+        """Returns new log events of the benchmark log group, in the format accepted by the log endpoints."""
+        return [dict(event, timestamp=event['timestamp'].isoformat()) for event in self.generate(count)]
+
+    def new_log(self):
+        """Stores a log to update or delete and returns its id."""
+        with transaction.atomic():
+            return store_log(next(self.generate(1)))[0].id
+
+    def json_body(self, data):
+        return {'data': json.dumps(data), 'content_type': 'application/json'}
+
+    def logout_token(self, iteration):
+        Token.objects.filter(user=self.logout_user).delete()
+        token = Token.objects.create(user=self.logout_user)
+        return {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+    def cases(self):
+        sample = self.sample_log
+        sample_id = sample.id if sample else 0
+        group = sample.logGroupName if sample else BENCHMARK_GROUP
+        ndjson = lambda count: '\n'.join(json.dumps(event) for event in self.new_events(count))
+
+        cases = [
+            # Reads
+            Case('logs list, first page', 'get', '/api/cloudwatch/logs/?page_size=100'),
+            Case('logs list, last hour', 'get', '/api/cloudwatch/logs/?period=last_hour'),
+            Case('logs list', 'get', '/api/cloudwatch/logs/', full_listing=True),
+            Case('logs export ndjson', 'get', '/api/cloudwatch/logs/?export=ndjson', full_listing=True),
+            Case('log detail', 'get', f'/api/cloudwatch/logs/{sample_id}/'),
+            Case('log counts', 'get', '/api/cloudwatch/log-counts/', full_listing=True),
+            Case('filter logs, first page', 'get', f'/api/cloudwatch/filter-logs/?logGroupName={group}&page_size=100'),
+            Case('filter logs, level', 'get', '/api/cloudwatch/filter-logs/?level=ERROR&page_size=100'),
+            Case('search text', 'get', '/api/cloudwatch/search/?q=health'),
+            Case('search substring', 'get', '/api/cloudwatch/search/?q=watermark&mode=substring'),
+            Case('log api, first page', 'get', '/api/cloudwatch/log_api/?page_size=100'),
+            Case('total logs count', 'get', '/api/cloudwatch/total-logs-count/'),
+            Case('total logs count, group', 'get', f'/api/cloudwatch/total-logs-count/?logGroupName={group}'),
+            Case('total logs count, approximate', 'get', '/api/cloudwatch/total-logs-count/?approximate=true'),
+            Case('recent logs', 'get', '/api/cloudwatch/recent-logs/'),
+            Case('logs grouped', 'get', '/api/cloudwatch/logs/grouped/'),
+            Case('log count interval, day', 'get', '/api/cloudwatch/logs/log_count_interval/?period=last_day'),
+            Case('log count interval, week by level', 'get',
+                 '/api/cloudwatch/logs/log_count_interval/?period=last_week&split_by=level'),
+            Case('last seven days', 'get', '/api/cloudwatch/last_seven_days/'),
+            Case('ingest queue', 'get', '/api/cloudwatch/logs/queue/'),
+            Case('cache stats', 'get', '/api/cloudwatch/cache-stats/'),
+            Case('async recent logs', 'get', '/api/cloudwatch/async/recent-logs/'),
+            Case('async total logs count', 'get', '/api/cloudwatch/async/total-logs-count/'),
+            Case('async filter logs, first page', 'get',
+                 f'/api/cloudwatch/async/filter-logs/?logGroupName={group}&page_size=100'),
+            Case('async log count interval, day', 'get', '/api/cloudwatch/async/logs/log_count_interval/?period=last_day'),
+            Case('async last seven days', 'get', '/api/cloudwatch/async/last_seven_days/'),
+            # Writes
+            Case('create log', 'post', '/api/cloudwatch/logs/',
+                 prepare=lambda i: self.json_body(self.new_events(1)[0])),
+            Case('create log batch of 100', 'post', '/api/cloudwatch/logs/batch/',
+                 prepare=lambda i: self.json_body(self.new_events(100))),
+            Case('stream 1000 logs', 'post', '/api/cloudwatch/logs/stream/',
+                 prepare=lambda i: {'data': ndjson(1000), 'content_type': 'application/x-ndjson'}),
+            Case('stream 1000 logs, gzip', 'post', '/api/cloudwatch/logs/stream/',
+                 prepare=lambda i: {'data': gzip.compress(ndjson(1000).encode()), 'content_type': 'application/gzip'}),
+            Case('create log, log api', 'post', '/api/cloudwatch/log_api/',
+                 prepare=lambda i: self.json_body(self.new_events(1)[0])),
+            Case('update log', 'put', '/api/cloudwatch/logs/<id>/',
+                 prepare=lambda i: dict(self.json_body(self.new_events(1)[0]),
+                                        path=f'/api/cloudwatch/logs/{self.new_log()}/')),
+            Case('patch log', 'patch', '/api/cloudwatch/logs/<id>/',
+                 prepare=lambda i: dict(self.json_body({'message': f'[WARN ] patched {i}'}),
+                                        path=f'/api/cloudwatch/logs/{self.new_log()}/')),
+            Case('delete log', 'delete', '/api/cloudwatch/logs/<id>/', prepare=lambda i: {'path': f'/api/cloudwatch/logs/{self.new_log()}/'}),
+            Case('sample logs', 'get', '/api/cloudwatch/logs_views/'),
+            # authapis
+            Case('signup', 'post', '/api/auth/signup',
+                 prepare=lambda i: self.json_body({'username': f'{SIGNUP_PREFIX}{time.time_ns()}',
+                                                   'password': BENCHMARK_PASSWORD, 'email': 'benchmark@example.com'})),
+            Case('login', 'post', '/api/auth/login',
+                 **self.json_body({'username': BENCHMARK_USERNAME, 'password': BENCHMARK_PASSWORD})),
+            Case('test token', 'get', '/api/auth/testtoken'),
+            Case('update user', 'patch', '/api/auth/update-user/',
+                 prepare=lambda i: self.json_body({'email': f'benchmark{i}@example.com'})),
+            Case('logout', 'post', '/api/auth/logout', prepare=self.logout_token),
+        ]
+        return [case for case in cases if self.full_listings or not case.full_listing]
+
+    def send(self, case, iteration):
+        kwargs = case.request_kwargs(iteration)
+        if self.cold_cache:
+            invalidate()
+        return getattr(self.client, case.method)(**kwargs)
+
+    def run_case(self, case):
+        for iteration in range(self.warmup):
+            self.send(case, iteration)
+
+        latencies, queries, status_codes, cache_hits, sizes = [], [], {}, 0, []
+        for iteration in range(self.warmup, self.warmup + self.iterations):
+            with ExitStack() as stack:
+                captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in settings.DATABASES]
+                started = time.perf_counter()
+                response = self.send(case, iteration)
+                latencies.append(time.perf_counter() - started)
+                if response.streaming:
+                    # Streamed responses run their queries while the body is consumed
+                    sizes.append(len(b''.join(response.streaming_content)))
+                else:
+                    sizes.append(len(response.content))
+            queries.append(sum(len(context) for context in captured))
+            status_codes[str(response.status_code)] = status_codes.get(str(response.status_code), 0) + 1
+            cache_hits += response.get('X-Cache') == 'HIT'
+
+        # Memory is traced on a separate request, tracing slows the timed ones down
+        tracemalloc.start()
+        try:
+            response = self.send(case, self.warmup + self.iterations)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'name': case.name,
+            'method': case.method.upper(),
+            'path': case.path,
+            'requests': len(latencies),
+            'status_codes': status_codes,
+            'errors': sum(count for code, count in status_codes.items() if int(code) >= 400),
+            'cache_hits': cache_hits,
+            'latency_ms': {
+                'mean': statistics.mean(latencies) * 1000,
+                'p50': percentile(latencies, 0.50) * 1000,
+                'p95': percentile(latencies, 0.95) * 1000,
+                'p99': percentile(latencies, 0.99) * 1000,
+                'max': max(latencies) * 1000,
+            },
+            'queries': {'mean': statistics.mean(queries), 'max': max(queries)},
+            'response_bytes': statistics.mean(sizes),
+            'peak_memory_kb': peak_memory / 1024,
+        }
+
+    def run(self, only=None, progress=None):
+        """
+        Runs the cases whose name contains one of the only strings, or all of them.
+
+        Returns:
+            list: The result of every case, see run_case.
+        """
+        self.setup()
+        results = []
+        try:
+            for case in self.cases():
+                if only and not any(name.lower() in case.name.lower() for name in only):
+                    continue
+                result = self.run_case(case)
+                results.append(result)
+                if progress is not None:
+                    progress(result)
+        finally:
+            self.teardown()
+        return results
+
+
+class RenderingBenchmark:
+    """
+    Times the steps that turn a large listing into the bytes sent, for the listing endpoints:
+
+    - reading and serializing the logs, with model instances and LogSerializer as before, and with
+      values_list rows and represent_logs
+    - rendering the data to JSON with the json module (JSONRenderer) and with orjson (ORJSONRenderer)
+    - compressing the JSON with every available coding, and the size of the result
+
+    Every step is run a number of times and the median is kept.
+    """
+
+    def __init__(self, iterations=5, max_logs=50000):
+        self.iterations = iterations
+        self.max_logs = max_logs
+
+    def cases(self):
+        ordered = Log.objects.order_by('-timestamp', '-id')
+        sample = ordered.first()
+        group = sample.logGroupName if sample else BENCHMARK_GROUP
+        return [
+            ('logs list, last day', ordered.filter(timestamp__range=get_time_interval('last_day'))[:self.max_logs]),
+            ('logs list, page of 1000', ordered[:1000]),
+            ('filter logs, group, page of 1000', ordered.filter(logGroupName=group)[:1000]),
+            ('filter logs, errors, page of 1000', ordered.filter(level='ERROR')[:1000]),
+            ('recent logs', ordered[:5]),
+        ]
+
+    def timed(self, function):
+        """Returns the median duration of function in milliseconds and its last result."""
+        durations = []
+        for _ in range(self.iterations):
+            started = time.perf_counter()
+            result = function()
+            durations.append(time.perf_counter() - started)
+        return statistics.median(durations) * 1000, result
+
+    def run_case(self, name, queryset):
+        fields = log_fields()
+        serializer_ms, data = self.timed(lambda: LogSerializer(list(queryset), many=True).data)
+        values_ms, values_data = self.timed(lambda: represent_logs(list(log_rows(queryset, fields)), fields))
+        json_ms, body = self.timed(lambda: JSONRenderer().render(data))
+        orjson_ms, orjson_body = self.timed(lambda: ORJSONRenderer().render(values_data))
+
+        compression = {}
+        for encoding in ENCODINGS:
+            compress_ms, compressed = self.timed(lambda: encoding.compress(orjson_body))
+            compression[encoding.name] = {'bytes': len(compressed), 'ms': compress_ms}
+
+        return {
+            'name': name,
+            'logs': len(data),
+            'serialize_ms': {'serializer': serializer_ms, 'values': values_ms},
+            'render_ms': {'json': json_ms, 'orjson': orjson_ms},
+            # The new path has to produce the same bytes as the old one
+            'identical': body == orjson_body,
+            'bytes': len(body),
+            'compression': compression,
+        }
+
+    def run(self, progress=None):
+        results = []
+        for name, queryset in self.cases():
+            result = self.run_case(name, queryset)
+            results.append(result)
+            if progress is not None:
+                progress(result)
+        return results
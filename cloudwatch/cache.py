@@ -0,0 +1,189 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+CACHE_ALIAS = getattr(settings, 'CLOUDWATCH_CACHE_ALIAS', 'default')
+CACHE_TIMEOUT = getattr(settings, 'CLOUDWATCH_CACHE_TIMEOUT', 60)
+KEY_PREFIX = 'cloudwatch'
+GENERATION_KEY = f'{KEY_PREFIX}:generation'
+
+# The views cached with cached_response, for cache_stats
+CACHED_VIEWS = []
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def digest(value):
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def view_generation_key(view_name):
+    """Returns the key of the generation of the responses of a view."""
+    return f'{GENERATION_KEY}:view:{view_name}'
+
+
+def logs_generation_key(group=None, stream=None):
+    """Returns the key of the generation of the logs of a stream, of a group, or of all logs."""
+    if not group:
+        return f'{GENERATION_KEY}:logs'
+    if not stream:
+        return f'{GENERATION_KEY}:group:{digest(group)}'
+    return f'{GENERATION_KEY}:stream:{digest(group)}:{digest(stream)}'
+
+
+def current_generations(keys):
+    """
+    Returns the generations stored under keys, which are part of the cached response keys.
+
+    When a generation is missing from the cache, for instance after an eviction, it starts
+    again from the current time so that it never goes back to a value used by older entries.
+    """
+    cache = get_cache()
+    generations = cache.get_many(keys)
+    missing = [key for key in keys if key not in generations]
+    if missing:
+        started = time.time_ns()
+        for key in missing:
+            cache.add(key, started, timeout=None)
+        generations.update(cache.get_many(missing))
+    return [generations.get(key) for key in keys]
+
+
+def invalidate(streams=None, views=None):
+    """
+    Invalidates cached responses by moving their generations to the next value.
+
+    Parameters:
+        streams (iterable): The (logGroupName, logStreamName) pairs of the logs that changed. The responses
+            about these streams, their groups or all logs are invalidated, the ones restricted to other
+            groups or streams are kept.
+        views (iterable): The names of the views whose responses are all invalidated, when the change
+            only affects them.
+
+    Description:
+        Without arguments every cached response is invalidated. The old entries are not deleted,
+        they are no longer looked up and expire with their timeout. When called inside a transaction
+        the invalidation happens once the transaction commits, so a response computed before the
+        commit cannot be cached under the new generation.
+    """
+    if views is not None:
+        keys = {view_generation_key(name) for name in views}
+    elif streams is not None:
+        keys = set()
+        for group, stream in streams:
+            keys.update((logs_generation_key(), logs_generation_key(group), logs_generation_key(group, stream)))
+    else:
+        keys = {GENERATION_KEY}
+    if keys:
+        transaction.on_commit(lambda: bump_generations(sorted(keys)))
+
+
+def bump_generations(keys):
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def count(view_name, outcome):
+    cache = get_cache()
+    key = f'{KEY_PREFIX}:stats:{view_name}:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def response_key(view_name, request, scope=()):
+    """
+    Builds the cache key of a response from the view, the generations it depends on, the user and the
+    query parameters.
+
+    The responses of a view restricted to a group, or to a stream of a group, by the query parameters
+    in scope depend on the generation of the logs of that group or stream, the others on the
+    generation of all logs.
+    """
+    params = request.GET
+    group = params.get('logGroupName') if 'logGroupName' in scope else None
+    stream = params.get('logStreamName') if 'logStreamName' in scope else None
+    generations = current_generations(
+        [GENERATION_KEY, view_generation_key(view_name), logs_generation_key(group, stream)])
+    generation = '.'.join(str(value) for value in generations)
+    query = hashlib.md5(request.META.get('QUERY_STRING', '').encode()).hexdigest()
+    user = request.user.pk if request.user.is_authenticated else 'anonymous'
+    return f'{KEY_PREFIX}:response:{view_name}:{generation}:{user}:{query}'
+
+
+def cached_response(timeout=None, scope=()):
+    """
+    Caches the successful responses of a GET view per user and query string.
+
+    Parameters:
+        timeout (int): The number of seconds a response is kept, defaults to CLOUDWATCH_CACHE_TIMEOUT.
+        scope (tuple): The query parameters among logGroupName and logStreamName that the view restricts
+            the logs to with an exact match, so that its responses outlive changes to other groups and streams.
+
+    Description:
+        The decorator goes below the api_view decorator so that the request is authenticated first.
+        Responses are cached until they expire or until the logs they depend on change, see invalidate.
+        Every lookup is counted as a hit or a miss, see cache_stats, and the response carries
+        an X-Cache header with the outcome.
+    """
+    def decorator(view):
+        view_name = view.__name__
+        CACHED_VIEWS.append(view_name)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+
+            cache = get_cache()
+            key = response_key(view_name, request, scope)
+            cached = cache.get(key)
+            if cached is not None:
+                count(view_name, 'hits')
+                data, status_code = cached
+                return Response(data, status=status_code, headers={'X-Cache': 'HIT'})
+
+            count(view_name, 'misses')
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, (response.data, response.status_code), timeout or CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    """
+    Returns the hit and miss counts of the cached views.
+
+    Returns:
+        dict: The view names mapped to their hits, misses and hit ratio.
+    """
+    cache = get_cache()
+    keys = [f'{KEY_PREFIX}:stats:{name}:{outcome}' for name in CACHED_VIEWS for outcome in ('hits', 'misses')]
+    values = cache.get_many(keys)
+
+    stats = {}
+    for name in CACHED_VIEWS:
+        hits = values.get(f'{KEY_PREFIX}:stats:{name}:hits', 0)
+        misses = values.get(f'{KEY_PREFIX}:stats:{name}:misses', 0)
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+    return stats
@@ -0,0 +1,131 @@
+from collections import Counter
+
+from django.db import connection
+from django.db.models import F
+
+from .models import LogGroup, LogStream
+
+UPSERT_BATCH_SIZE = 1000
+
+
+def collect_streams(logs):
+    """
+    Sums logs per log stream.
+
+    Parameters:
+        logs (iterable): The Log objects.
+
+    Returns:
+        dict: (logGroupName, logStreamName) mapped to [count, first timestamp, last timestamp].
+    """
+    streams = {}
+    for log in logs:
+        key = (log.logGroupName, log.logStreamName)
+        if key not in streams:
+            streams[key] = [1, log.timestamp, log.timestamp]
+        else:
+            stats = streams[key]
+            stats[0] += 1
+            stats[1] = min(stats[1], log.timestamp)
+            stats[2] = max(stats[2], log.timestamp)
+    return streams
+
+
+def upsert(cursor, model, columns, conflict, rows, returning=None):
+    """
+    Inserts catalog rows, or adds their counts to the existing rows and widens their first/last seen range.
+
+    Returns:
+        list: The returned columns of every inserted or updated row, if returning is given.
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    column_list = ', '.join(quote(column) for column in columns)
+    conflict_list = ', '.join(quote(column) for column in conflict)
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(rows))
+    sql = (
+        f'INSERT INTO {table} ({column_list}) VALUES {placeholders} '
+        f'ON CONFLICT ({conflict_list}) DO UPDATE SET '
+        f'"first_seen" = LEAST({table}."first_seen", EXCLUDED."first_seen"), '
+        f'"last_seen" = GREATEST({table}."last_seen", EXCLUDED."last_seen"), '
+        f'"log_count" = {table}."log_count" + EXCLUDED."log_count"'
+    )
+    if returning:
+        sql += ' RETURNING ' + ', '.join(quote(column) for column in returning)
+    cursor.execute(sql, [value for row in rows for value in row])
+    return cursor.fetchall() if returning else []
+
+
+def add_to_catalog(logs, count=True):
+    """
+    Records stored logs in the LogGroup and LogStream catalog.
+
+    Parameters:
+        logs (iterable): The stored Log objects.
+        count (bool): False to only widen the first/last seen range of the streams, for logs that were modified.
+
+    Description:
+        The logs are summed per log stream in Python, then the groups and the streams are
+        each written with INSERT ... ON CONFLICT DO UPDATE statements, so the number of
+        queries does not depend on the number of logs.
+    """
+    streams = collect_streams(logs)
+    if not streams:
+        return
+    if not count:
+        for stats in streams.values():
+            stats[0] = 0
+
+    groups = {}
+    for (group_name, _), (total, first_seen, last_seen) in streams.items():
+        if group_name not in groups:
+            groups[group_name] = [total, first_seen, last_seen]
+        else:
+            stats = groups[group_name]
+            stats[0] += total
+            stats[1] = min(stats[1], first_seen)
+            stats[2] = max(stats[2], last_seen)
+
+    # Sorted so that concurrent writers lock the catalog rows in the same order and cannot deadlock
+    group_rows = [(name, first_seen, last_seen, total) for name, (total, first_seen, last_seen) in sorted(groups.items())]
+    group_ids = {}
+    with connection.cursor() as cursor:
+        for start in range(0, len(group_rows), UPSERT_BATCH_SIZE):
+            returned = upsert(
+                cursor, LogGroup, ('name', 'first_seen', 'last_seen', 'log_count'), ('name',),
+                group_rows[start:start + UPSERT_BATCH_SIZE], returning=('name', 'id'),
+            )
+            group_ids.update(returned)
+
+        stream_rows = [
+            (group_ids[group_name], stream_name, first_seen, last_seen, total)
+            for (group_name, stream_name), (total, first_seen, last_seen) in sorted(streams.items())
+        ]
+        for start in range(0, len(stream_rows), UPSERT_BATCH_SIZE):
+            upsert(
+                cursor, LogStream, ('group_id', 'name', 'first_seen', 'last_seen', 'log_count'), ('group_id', 'name'),
+                stream_rows[start:start + UPSERT_BATCH_SIZE],
+            )
+
+
+def remove_from_catalog(counts):
+    """
+    Subtracts removed logs from the log counts of the catalog.
+
+    Parameters:
+        counts (dict): (logGroupName, logStreamName) mapped to the number of removed logs.
+
+    Description:
+        The first and last seen timestamps are kept: they record when a group or stream
+        was seen, not the range of the logs it still holds.
+    """
+    group_counts = Counter()
+    for (group_name, stream_name), count in counts.items():
+        if count:
+            LogStream.objects.filter(group__name=group_name, name=stream_name).update(
+                log_count=F('log_count') - count
+            )
+            group_counts[group_name] += count
+
+    for group_name, count in group_counts.items():
+        LogGroup.objects.filter(name=group_name).update(log_count=F('log_count') - count)
@@ -0,0 +1,129 @@
+import json
+from collections import Counter
+
+from django.db import connection, connections
+from django.db.models import F, Sum
+
+from .models import LogCounter, LogGroup, LogStream
+
+COUNTER_COLUMNS = ('scope', 'key', 'count')
+
+
+def counter_keys(log):
+    return [(LogCounter.TOTAL, ''), (LogCounter.OWNER, str(log.owner))]
+
+
+def update_counters(logs, sign=1):
+    """
+    Adds logs to, or removes logs from, the total and per owner log counters.
+
+    Parameters:
+        logs (iterable): The Log objects.
+        sign (int): 1 to count the logs, -1 to uncount them.
+
+    Description:
+        The changes are summed per counter in Python and applied with one
+        INSERT ... ON CONFLICT DO UPDATE statement in the current transaction.
+        The per group and per stream counts are kept by the catalog, see cloudwatch.catalog.
+    """
+    deltas = Counter()
+    for log in logs:
+        for key in counter_keys(log):
+            deltas[key] += sign
+    apply_deltas(deltas)
+
+
+def apply_deltas(deltas):
+    """
+    Adds deltas to the log counters.
+
+    Parameters:
+        deltas (dict): (scope, key) mapped to the number to add, which may be negative.
+    """
+    rows = [key + (delta,) for key, delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+
+    quote = connection.ops.quote_name
+    table = quote(LogCounter._meta.db_table)
+    columns = ', '.join(quote(column) for column in COUNTER_COLUMNS)
+    placeholders = ', '.join(['(%s, %s, %s)'] * len(rows))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) VALUES {placeholders} '
+            f'ON CONFLICT ("scope", "key") DO UPDATE SET "count" = {table}."count" + EXCLUDED."count"',
+            [value for row in rows for value in row],
+        )
+
+
+def counter_queryset(logGroupName=None, logStreamName=None, owner=None):
+    """
+    Returns the counter rows that hold the number of logs matching the filters.
+
+    Parameters:
+        logGroupName (str): Optional log group.
+        logStreamName (str): Optional log stream.
+        owner (int): Optional owner.
+
+    Returns:
+        QuerySet: The counter rows, whose `count` values add up to the number of logs,
+                  or None when the counters do not cover the combination of filters
+                  (an owner together with a group or stream).
+    """
+    if owner is not None:
+        if logGroupName or logStreamName:
+            return None
+        return LogCounter.objects.filter(scope=LogCounter.OWNER, key=str(owner))
+
+    if logGroupName and logStreamName:
+        return LogStream.objects.filter(group__name=logGroupName, name=logStreamName).annotate(count=F('log_count'))
+    if logGroupName:
+        return LogGroup.objects.filter(name=logGroupName).annotate(count=F('log_count'))
+    if logStreamName:
+        return LogStream.objects.filter(name=logStreamName).annotate(count=F('log_count'))
+    return LogCounter.objects.filter(scope=LogCounter.TOTAL, key='')
+
+
+def exact_count(logGroupName=None, logStreamName=None, owner=None):
+    """
+    Reads the number of logs from the maintained counters, see counter_queryset.
+
+    Returns:
+        int: The number of logs, or None when the counters do not cover the combination of filters.
+    """
+    queryset = counter_queryset(logGroupName, logStreamName, owner)
+    if queryset is None:
+        return None
+    return queryset.aggregate(total=Sum('count'))['total'] or 0
+
+
+async def aexact_count(logGroupName=None, logStreamName=None, owner=None):
+    """Same as exact_count, for async views."""
+    queryset = counter_queryset(logGroupName, logStreamName, owner)
+    if queryset is None:
+        return None
+    return (await queryset.aaggregate(total=Sum('count')))['total'] or 0
+
+
+def estimated_count(queryset):
+    """
+    Returns the number of rows the PostgreSQL planner expects the queryset to return.
+
+    Parameters:
+        queryset (QuerySet): Any queryset, it is planned with EXPLAIN and not run.
+
+    Returns:
+        int: The estimate, based on the table statistics kept up to date by ANALYZE.
+
+    Description:
+        The query is planned on the database the queryset reads from, a replica in the views
+        decorated with replica_reads.
+    """
+    db = queryset.db
+    sql, params = queryset.order_by().query.get_compiler(using=db).as_sql()
+    with connections[db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
@@ -0,0 +1,143 @@
+import csv
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+
+from .renderers import ORJSONRenderer
+from .serializers import log_fields
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'logs.ndjson'),
+    'csv': ('text/csv', 'logs.csv'),
+}
+
+
+class Echo:
+    """A write-only file-like object that returns what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_values(queryset, fields):
+    return queryset.values_list(*(field.source for field in fields))
+
+
+def represent_row(fields, row):
+    return [field.to_representation(value) for field, value in zip(fields, row)]
+
+
+def iter_rows(queryset, fields=None):
+    """
+    Yields the logs of a queryset in the LogSerializer representation, without building model instances.
+
+    Parameters:
+        queryset (QuerySet): The logs to export.
+        fields (list): The fields to export, see log_fields. All fields by default.
+
+    Yields:
+        list: The field names first, then the represented values of each log.
+
+    Description:
+        The rows are read with values_list() through a server-side cursor in chunks of
+        EXPORT_CHUNK_SIZE, so memory use does not depend on the number of logs.
+    """
+    fields = fields or log_fields()
+    yield [field.field_name for field in fields]
+
+    for row in export_values(queryset, fields).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield represent_row(fields, row)
+
+
+def next_chunk(rows):
+    return list(islice(rows, EXPORT_CHUNK_SIZE))
+
+
+async def aiter_rows(queryset, fields=None):
+    """
+    Async version of iter_rows: the chunks are read from the server-side cursor in a thread.
+
+    QuerySet.aiterator() would run the query of values_list() in the event loop.
+    """
+    fields = fields or log_fields()
+    yield [field.field_name for field in fields]
+
+    rows = export_values(queryset, fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    try:
+        while chunk := await sync_to_async(next_chunk)(rows):
+            for row in chunk:
+                yield represent_row(fields, row)
+    finally:
+        # Closes the cursor when the client goes away before the end
+        await sync_to_async(rows.close)()
+
+
+def ndjson_line(names):
+    """Returns the function rendering a row of iter_rows as a newline-delimited JSON line."""
+    renderer = ORJSONRenderer()
+    return lambda row: renderer.render(dict(zip(names, row))) + b'\n'
+
+
+def iter_ndjson(queryset, fields=None):
+    """Yields the logs of a queryset as newline-delimited JSON lines."""
+    rows = iter_rows(queryset, fields)
+    render = ndjson_line(next(rows))
+    for row in rows:
+        yield render(row)
+
+
+async def aiter_ndjson(queryset, fields=None):
+    """Async version of iter_ndjson."""
+    rows = aiter_rows(queryset, fields)
+    render = ndjson_line(await anext(rows))
+    async for row in rows:
+        yield render(row)
+
+
+def iter_csv(queryset, fields=None):
+    """Yields the logs of a queryset as CSV lines, starting with a header line."""
+    writer = csv.writer(Echo())
+    for row in iter_rows(queryset, fields):
+        yield writer.writerow(row)
+
+
+async def aiter_csv(queryset, fields=None):
+    """Async version of iter_csv."""
+    writer = csv.writer(Echo())
+    async for row in aiter_rows(queryset, fields):
+        yield writer.writerow(row)
+
+
+def export_response(queryset, export_format, fields=None, is_async=False):
+    """
+    Streams the logs of a queryset as newline-delimited JSON or CSV.
+
+    Parameters:
+        queryset (QuerySet): The logs to export.
+        export_format (str): 'ndjson' or 'csv'.
+        fields (list): The fields to export, see log_fields. All fields by default.
+        is_async (bool): Whether to stream the logs from an async iterator, for async views. Under ASGI,
+            Django reads a synchronous iterator to the end before sending anything.
+
+    Returns:
+        StreamingHttpResponse: The response, sent while the logs are read.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid export format. Valid options are {', '.join(repr(name) for name in EXPORT_FORMATS)}.")
+
+    content_type, filename = EXPORT_FORMATS[export_format]
+    # The logs are read once the view has returned, the database is chosen while replica_reads still applies
+    queryset = queryset.using(queryset.db)
+    if is_async:
+        content = aiter_ndjson(queryset, fields) if export_format == 'ndjson' else aiter_csv(queryset, fields)
+    else:
+        content = iter_ndjson(queryset, fields) if export_format == 'ndjson' else iter_csv(queryset, fields)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
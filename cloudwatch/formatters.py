@@ -0,0 +1,26 @@
+import json
+import logging
+
+# The attributes every LogRecord has, the others were passed with `extra`
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', logging.INFO, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a log record as one JSON object per line, with the fields passed with `extra`.
+
+    For example `logger.warning("Slow request", extra={'view': 'log_list', 'duration': 1.2})` gives
+    {"time": "...", "level": "WARNING", "logger": "...", "message": "Slow request", "view": "log_list", "duration": 1.2}
+    """
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
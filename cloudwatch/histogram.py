@@ -0,0 +1,255 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Count, DateTimeField, DurationField, F, Func, Sum, Value
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_duration
+
+from .models import Log, LogRollup
+from .rollups import pick_granularity, truncate
+
+MAX_BUCKETS = 5000
+
+SPLIT_FIELDS = {
+    'level': 'level',
+    'stream': 'logStreamName',
+}
+
+
+class DateBin(Func):
+    """
+    PostgreSQL date_bin(stride, source, origin): the start of the stride-wide bin,
+    counted from origin, that contains source.
+    """
+    function = 'date_bin'
+    output_field = DateTimeField()
+
+
+def histogram_queryset(start_time, end_time, width, split_by=None, filters=None):
+    """
+    Builds the single grouped query behind a log count histogram.
+
+    Parameters:
+        start_time (datetime): The start of the first bucket.
+        end_time (datetime): The end of the last bucket, excluded.
+        width (timedelta): The width of the buckets.
+        split_by (str): Optional 'level' or 'stream' to count each bucket per level or per log stream.
+        filters (dict): Optional exact filters on logGroupName, logStreamName and level.
+
+    Returns:
+        QuerySet: Rows with the bucket start as 'interval', the split value if any, and 'count'.
+
+    Description:
+        When the buckets line up with a rollup granularity the counts are summed from the
+        LogRollup table, otherwise they are counted from the Log table. Either way the
+        rows are binned with date_bin and grouped in the database.
+    """
+    filters = filters or {}
+    granularity = pick_granularity(start_time, width)
+
+    if granularity is not None and truncate(end_time, granularity) == end_time:
+        queryset = LogRollup.objects.filter(
+            granularity=granularity, bucket__gte=start_time, bucket__lt=end_time, **filters
+        )
+        source, total = 'bucket', Sum('count')
+    else:
+        queryset = Log.objects.filter(timestamp__gte=start_time, timestamp__lt=end_time, **filters)
+        source, total = 'timestamp', Count('id')
+
+    fields = ['interval']
+    if split_by:
+        fields.append(SPLIT_FIELDS[split_by])
+
+    return (
+        queryset.annotate(interval=DateBin(
+            Value(width, output_field=DurationField()),
+            F(source),
+            Value(start_time, output_field=DateTimeField()),
+        ))
+        .values(*fields)
+        .annotate(count=total)
+        .order_by()
+    )
+
+
+def fill_histogram(rows, start_time, end_time, width, split_by=None):
+    """
+    Lays out the rows of histogram_queryset over every bucket of the range, including empty ones.
+
+    Parameters:
+        rows (iterable): The rows returned by histogram_queryset.
+        start_time (datetime): The start of the first bucket.
+        end_time (datetime): The end of the last bucket, excluded.
+        width (timedelta): The width of the buckets.
+        split_by (str): The split used to build the rows, if any.
+
+    Returns:
+        list: One dictionary per bucket with its start, its end, the total count and,
+              when split, the count per level or log stream.
+    """
+    totals = defaultdict(int)
+    splits = defaultdict(dict)
+    for row in rows:
+        totals[row['interval']] += row['count']
+        if split_by:
+            splits[row['interval']][row[SPLIT_FIELDS[split_by]]] = row['count']
+
+    buckets = []
+    interval_start = start_time
+    while interval_start < end_time:
+        bucket = {
+            'interval_start': interval_start,
+            'interval_end': min(interval_start + width, end_time),
+            'count': totals.get(interval_start, 0),
+        }
+        if split_by:
+            bucket['counts'] = splits.get(interval_start, {})
+        buckets.append(bucket)
+        interval_start += width
+    return buckets
+
+
+def histogram(start_time, end_time, width, split_by=None, filters=None):
+    """
+    Counts the logs in consecutive buckets with one query.
+
+    Parameters:
+        start_time (datetime): The start of the first bucket, naive values are read in the current time zone.
+        end_time (datetime): The end of the last bucket, excluded.
+        width (timedelta): The width of the buckets.
+        split_by (str): Optional 'level' or 'stream' to count each bucket per level or per log stream.
+        filters (dict): Optional exact filters on logGroupName, logStreamName and level.
+
+    Returns:
+        list: The buckets, see fill_histogram.
+
+    Raises:
+        ValueError: If the range, the width or the split is invalid, or the range holds too many buckets.
+    """
+    start_time, end_time = validate_range(start_time, end_time, width, split_by)
+    rows = histogram_queryset(start_time, end_time, width, split_by, filters)
+    return fill_histogram(rows, start_time, end_time, width, split_by)
+
+
+def validate_range(start_time, end_time, width, split_by=None):
+    """
+    Checks the arguments of a histogram and makes the range time zone aware.
+
+    Returns:
+        tuple: The aware start and end times.
+
+    Raises:
+        ValueError: If the range, the width or the split is invalid, or the range holds too many buckets.
+    """
+    if timezone.is_naive(start_time):
+        start_time = timezone.make_aware(start_time)
+    if timezone.is_naive(end_time):
+        end_time = timezone.make_aware(end_time)
+
+    if split_by and split_by not in SPLIT_FIELDS:
+        raise ValueError(f"Invalid split. Valid options are {', '.join(repr(name) for name in SPLIT_FIELDS)}.")
+    if width.total_seconds() <= 0:
+        raise ValueError("The bucket width must be positive.")
+    if end_time <= start_time:
+        raise ValueError("The end of the range must be after its start.")
+    if (end_time - start_time) / width > MAX_BUCKETS:
+        raise ValueError(f"The range cannot contain more than {MAX_BUCKETS} buckets.")
+    return start_time, end_time
+
+
+async def ahistogram(start_time, end_time, width, split_by=None, filters=None):
+    """Same as histogram, for async views: the query is run with the async ORM interface."""
+    start_time, end_time = validate_range(start_time, end_time, width, split_by)
+    rows = [row async for row in histogram_queryset(start_time, end_time, width, split_by, filters)]
+    return fill_histogram(rows, start_time, end_time, width, split_by)
+
+
+def interval_from_params(params, now):
+    """
+    Reads the range and bucket width of the log_count_interval endpoint from its query parameters.
+
+    Parameters:
+        params (QueryDict): Either `start`, `end` (defaults to now) and `width`, or an `interval_type` preset.
+        now (datetime): The current time.
+
+    Returns:
+        tuple: The start of the first interval, the end of the last one and the width of the intervals.
+
+    Raises:
+        ValueError: If the range or the preset is invalid.
+    """
+    start = params.get('start', None)
+
+    if start:
+        start_time = parse_datetime(start)
+        end_time = parse_datetime(params['end']) if 'end' in params else now
+        interval_delta = parse_duration(params.get('width', ''))
+        if start_time is None or end_time is None or interval_delta is None:
+            raise ValueError("Invalid range. 'start' and 'end' must be ISO 8601 datetimes and 'width' a duration.")
+        return start_time, end_time, interval_delta
+
+    interval_type = params.get('interval_type', 'last_week')
+
+    if interval_type == 'last_hour':
+        end_time = now.replace(minute=0, second=0, microsecond=0) + timedelta(minutes=10)
+        start_time = end_time - timedelta(hours=1)
+        interval_delta = timedelta(minutes=5)
+    elif interval_type == 'last_day':
+        end_time = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(hours=6,minutes=45)
+        start_time = end_time - timedelta(days=1)
+        interval_delta = timedelta(hours=1)
+    elif interval_type == 'previous_day':
+        end_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        start_time = end_time - timedelta(days=1)
+        interval_delta = timedelta(hours=1)
+    elif interval_type == 'last_week':
+        end_of_last_week = now - timedelta(days=now.weekday() + 2)
+        end_time = end_of_last_week.replace(hour=0, minute=0, second=0, microsecond=0)
+        start_of_last_week = end_time - timedelta(days=6)
+        start_time = start_of_last_week.replace(hour=0, minute=0, second=0, microsecond=0)
+        interval_delta = timedelta(days=1)
+    elif interval_type == 'last_month':
+        first_day_of_current_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        last_day_of_last_month = first_day_of_current_month - timedelta(days=1)
+        start_time = last_day_of_last_month.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end_time = last_day_of_last_month.replace(hour=23, minute=59, second=59, microsecond=999999)
+        interval_delta = timedelta(days=1)
+    else:
+        raise ValueError("Invalid interval type. Valid options are 'last_hour', 'last_day', 'previous_day', 'last_week', and 'last_month'.")
+
+    # The presets include the interval that starts at their end time
+    end_time = start_time + ((end_time - start_time) // interval_delta + 1) * interval_delta
+    return start_time, end_time, interval_delta
+
+
+def filters_from_params(params):
+    """
+    Returns the histogram filters given by the `logGroupName`, `logStreamName` and `securityinfo` query parameters.
+
+    Raises:
+        ValueError: If the securityinfo is not a level.
+    """
+    filters = {}
+    if params.get('logGroupName'):
+        filters['logGroupName'] = params['logGroupName']
+    if params.get('logStreamName'):
+        filters['logStreamName'] = params['logStreamName']
+    if params.get('securityinfo'):
+        if params['securityinfo'] not in ['INFO', 'ERROR', 'WARN']:
+            raise ValueError("Invalid securityinfo. Valid options are 'INFO', 'ERROR', and 'WARN'.")
+        filters['level'] = params['securityinfo']
+    return filters
+
+
+def interval_counts(buckets, split_by=None):
+    """Lays out histogram buckets as the log_count_interval response: the end of each interval and its counts."""
+    response_data = []
+    for bucket in buckets:
+        interval_data = {
+            'interval': bucket['interval_end'],
+            'count': bucket['count']
+        }
+        if split_by:
+            interval_data['counts'] = bucket['counts']
+        response_data.append(interval_data)
+    return response_data
@@ -0,0 +1,230 @@
+"""
+Parallel import of CloudWatch-style export files, see the import_logs command.
+
+The files are cut into units of work: an uncompressed newline-delimited JSON file is split on line
+boundaries into byte ranges of about split_size bytes, any other file is a unit of its own.
+Every unit is parsed, validated and loaded by a worker process with its own database connection,
+so the import is not bound by one Python thread.
+"""
+import gzip
+import json
+import mmap
+import os
+import signal
+import time
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, transaction
+
+from .stream import CHUNK_SIZE, MAX_REPORTED_ERRORS, clean_event, write_chunk
+
+FILE_SUFFIXES = ('.json', '.ndjson', '.jsonl', '.log')
+SPLIT_SIZE = 64 * 1024 * 1024
+WRITE_ATTEMPTS = 3
+CHECKPOINT_VERSION = 1
+
+
+def is_gzipped(path):
+    with open(path, 'rb') as f:
+        return f.read(2) == b'\x1f\x8b'
+
+
+def is_ndjson(path):
+    """Returns False for a file holding one JSON document (a list of events or an object with events)."""
+    name = path[:-3] if path.endswith('.gz') else path
+    return not name.endswith('.json')
+
+
+def find_files(paths):
+    """Returns the export files given or found in the given directories, in a stable order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, name) for name in names
+                    if name.endswith(FILE_SUFFIXES) or (name.endswith('.gz') and name[:-3].endswith(FILE_SUFFIXES))
+                )
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def plan_units(files, split_size=SPLIT_SIZE):
+    """
+    Cuts the files into units of work.
+
+    Returns:
+        list: (path, start, end) tuples where start and end are byte offsets, end is None for a whole file.
+    """
+    units = []
+    for path in files:
+        size = os.path.getsize(path)
+        if size == 0:
+            continue
+        if not is_ndjson(path) or is_gzipped(path) or size <= split_size:
+            units.append((path, 0, None))
+            continue
+
+        # Every range ends after the first newline that follows its nominal end
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start = 0
+            while start < size:
+                newline = mapped.find(b'\n', min(start + split_size, size) - 1)
+                end = size if newline == -1 else newline + 1
+                units.append((path, start, end))
+                start = end
+    return units
+
+
+def unit_key(unit):
+    path, start, end = unit
+    return f'{path}:{os.path.getsize(path)}:{start}-{"" if end is None else end}'
+
+
+def mapped_lines(path, start, end):
+    """Yields the lines of a byte range of a file through a memory map, without reading the file into memory."""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        end = len(mapped) if end is None else end
+        position = start
+        while position < end:
+            newline = mapped.find(b'\n', position, end)
+            stop = end if newline == -1 else newline + 1
+            yield mapped[position:stop]
+            position = stop
+
+
+def read_events(path, start, end, defaults):
+    """
+    Yields the raw events of a unit, with the log group, stream and owner filled in from defaults when missing.
+
+    Newline-delimited files hold one event per line. JSON files hold a list of events, or an object with
+    an "events" list like the output of `aws logs filter-log-events` and `aws logs get-log-events`,
+    optionally with logGroupName and logStreamName at the top level.
+    """
+    fallback = dict(defaults)
+    if not fallback.get('logStreamName'):
+        fallback['logStreamName'] = os.path.basename(path).split('.')[0]
+
+    if is_ndjson(path):
+        if is_gzipped(path):
+            with gzip.open(path, 'rb') as f:
+                yield from (parse_line(line, fallback) for line in f if line.strip())
+        else:
+            yield from (parse_line(line, fallback) for line in mapped_lines(path, start, end) if line.strip())
+        return
+
+    opener = gzip.open if is_gzipped(path) else open
+    with opener(path, 'rb') as f:
+        document = json.load(f)
+    events = document
+    if isinstance(document, dict):
+        events = document.get('events', [])
+        fallback.update({key: document[key] for key in ('logGroupName', 'logStreamName') if key in document})
+    for event in events:
+        yield with_defaults(event, fallback)
+
+
+def parse_line(line, fallback):
+    try:
+        return with_defaults(json.loads(line), fallback)
+    except ValueError as e:
+        return e
+
+
+def with_defaults(event, fallback):
+    if isinstance(event, dict):
+        event = {**{key: value for key, value in fallback.items() if value is not None}, **event}
+        # CloudWatch timestamps are milliseconds since the epoch
+        if isinstance(event.get('timestamp'), (int, float)):
+            event['timestamp'] = datetime.fromtimestamp(event['timestamp'] / 1000, tz=dt_timezone.utc)
+    return event
+
+
+def write(chunk):
+    """Writes a chunk in its own transaction, retrying when PostgreSQL aborts it to break a deadlock."""
+    for attempt in range(1, WRITE_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                return write_chunk(chunk)
+        except OperationalError:
+            if attempt == WRITE_ATTEMPTS:
+                raise
+            time.sleep(0.1 * 2 ** attempt)
+
+
+def import_unit(unit, defaults, chunk_size=CHUNK_SIZE):
+    """
+    Parses, validates and loads the events of a unit. Runs in a worker process.
+
+    Returns:
+        dict: The unit, the number of loaded, duplicate and rejected events, the first rejected
+              events and the time spent.
+    """
+    started = time.perf_counter()
+    path, start, end = unit
+    summary = {'unit': unit_key(unit), 'loaded': 0, 'duplicates': 0, 'rejected': 0, 'errors': []}
+
+    events = enumerate(read_events(path, start, end, defaults), start=1)
+    while batch := list(islice(events, chunk_size)):
+        chunk = []
+        for number, event in batch:
+            try:
+                if isinstance(event, Exception):
+                    raise event
+                chunk.append(clean_event(event))
+                continue
+            except ValueError as e:
+                errors = [str(e)]
+            except ValidationError as e:
+                errors = e.message_dict if hasattr(e, 'error_dict') else e.messages
+            summary['rejected'] += 1
+            if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                summary['errors'].append({'file': path, 'offset': start, 'event': number, 'errors': errors})
+
+        if chunk:
+            loaded = write(chunk)
+            summary['loaded'] += loaded
+            summary['duplicates'] += len(chunk) - loaded
+
+    summary['seconds'] = time.perf_counter() - started
+    return summary
+
+
+def init_worker():
+    import django
+    django.setup()
+    # Interrupting the import stops the parent from handing out ranges, the ranges in progress are finished
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class Checkpoint:
+    """
+    The units an import already loaded, saved as JSON after every finished unit.
+
+    A unit that was interrupted is loaded again when the import resumes; its events that were
+    already stored are skipped as duplicates.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state.get('version') == CHECKPOINT_VERSION:
+                self.done = state['done']
+
+    def add(self, summary):
+        self.done[summary['unit']] = {key: summary[key] for key in ('loaded', 'duplicates', 'rejected')}
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'version': CHECKPOINT_VERSION, 'done': self.done}, f)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        self.done = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
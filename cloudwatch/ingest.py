@@ -0,0 +1,268 @@
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from .cache import invalidate
+from .catalog import add_to_catalog, collect_streams, remove_from_catalog
+from .counters import update_counters
+from .models import Log, LogCount
+from .rollups import update_rollups
+from .serializers import LogSerializer
+from .templates import miner
+from .tail import publish_created
+from .utils import count_levels, hash_message, parse_level
+
+BATCH_MAX_SIZE = getattr(settings, 'CLOUDWATCH_BATCH_MAX_SIZE', 5000)
+BULK_CREATE_BATCH_SIZE = 1000
+
+EVENT_IDENTITY = ('logGroupName', 'logStreamName', 'ingestionTime', 'message_hash', 'timestamp')
+INSERT_COLUMNS = ('logGroupName', 'logStreamName', 'owner', 'timestamp', 'message', 'ingestionTime', 'level', 'message_hash', 'template_id')
+
+
+def build_log(data):
+    """
+    Returns an unsaved Log for validated event data, with its derived level, message hash and template text.
+
+    Nothing is written: the template id is set when the log is stored, see TemplateMiner.assign.
+    """
+    log = Log(**data, level=parse_level(data['message']), message_hash=hash_message(data['message']))
+    log.template_text = miner.match(data['message'])
+    return log
+
+
+def event_identity(log):
+    return tuple(getattr(log, field) for field in EVENT_IDENTITY)
+
+
+def insert_logs(logs):
+    """
+    Inserts logs, skipping the ones whose event identity is already stored.
+
+    Parameters:
+        logs (list): Unsaved Log objects built with build_log.
+
+    Returns:
+        list: The inserted logs, with their id set. Logs that duplicate a stored log,
+              or an earlier log of the same list, are left out.
+
+    Description:
+        The logs are written with INSERT ... ON CONFLICT DO NOTHING on the unique event identity,
+        so a retried delivery costs one index probe per event and concurrent deliveries of the
+        same event cannot both be stored.
+        The template ids are set first, storing the new template texts, so it runs in the
+        transaction that stores the logs.
+    """
+    pending = {}
+    for log in logs:
+        pending.setdefault(event_identity(log), log)
+    miner.assign(list(pending.values()))
+
+    quote = connection.ops.quote_name
+    table = quote(Log._meta.db_table)
+    columns = ', '.join(quote(column) for column in INSERT_COLUMNS)
+    returning = ', '.join(quote(column) for column in ('id',) + EVENT_IDENTITY)
+    rows = list(pending.values())
+
+    inserted = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), BULK_CREATE_BATCH_SIZE):
+            batch = rows[start:start + BULK_CREATE_BATCH_SIZE]
+            placeholders = ', '.join(['(' + ', '.join(['%s'] * len(INSERT_COLUMNS)) + ')'] * len(batch))
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {placeholders} ON CONFLICT DO NOTHING RETURNING {returning}',
+                [getattr(log, column) for log in batch for column in INSERT_COLUMNS],
+            )
+            for log_id, *identity in cursor.fetchall():
+                log = pending[tuple(identity)]
+                log.id = log_id
+                log._state.adding = False
+                inserted.append(log)
+    return inserted
+
+
+def find_stored(logs):
+    """
+    Returns the ids of the stored logs that have the event identity of the given logs.
+
+    Returns:
+        dict: Event identity mapped to the id of the stored log.
+
+    Description:
+        The identities are joined against the Log table as a VALUES list, one probe of the
+        unique event index per identity, instead of a condition OR'd per log.
+    """
+    identities = list(dict.fromkeys(event_identity(log) for log in logs))
+    if not identities:
+        return {}
+
+    quote = connection.ops.quote_name
+    table = quote(Log._meta.db_table)
+    columns = ', '.join(quote(column) for column in EVENT_IDENTITY)
+    selected = ', '.join(f'{table}.{quote(column)}' for column in ('id',) + EVENT_IDENTITY)
+    matches = ' AND '.join(f'{table}.{quote(column)} = wanted.{quote(column)}' for column in EVENT_IDENTITY)
+
+    stored = {}
+    with connection.cursor() as cursor:
+        for start in range(0, len(identities), BULK_CREATE_BATCH_SIZE):
+            batch = identities[start:start + BULK_CREATE_BATCH_SIZE]
+            placeholders = ', '.join(['(' + ', '.join(['%s'] * len(EVENT_IDENTITY)) + ')'] * len(batch))
+            cursor.execute(
+                f'SELECT {selected} FROM {table} JOIN (VALUES {placeholders}) AS wanted ({columns}) ON {matches}',
+                [value for identity in batch for value in identity],
+            )
+            for log_id, *identity in cursor.fetchall():
+                stored[tuple(identity)] = log_id
+    return stored
+
+
+def store_log(data):
+    """
+    Stores a single validated log event unless it is already stored.
+
+    Parameters:
+        data (dict): The validated event data.
+
+    Returns:
+        tuple: (log, created) where log is the new log, or the stored log with the same event identity.
+    """
+    log = build_log(data)
+    if not insert_logs([log]):
+        return Log.objects.get(**{field: getattr(log, field) for field in EVENT_IDENTITY}), False
+
+    LogCount.objects.create(log=log, **count_levels(log.message))
+    record_created([log])
+    return log, True
+
+
+def store_logs(logs):
+    """
+    Stores logs that are not already stored, together with their LogCount rows, and updates the derived tables.
+
+    Parameters:
+        logs (list): Unsaved Log objects built with build_log.
+
+    Returns:
+        list: The inserted logs, see insert_logs.
+    """
+    logs = insert_logs(logs)
+    LogCount.objects.bulk_create(
+        [LogCount(log=log, **count_levels(log.message)) for log in logs],
+        batch_size=BULK_CREATE_BATCH_SIZE,
+    )
+    record_created(logs)
+    return logs
+
+
+def validate_events(events):
+    """
+    Validates log events with the LogSerializer fields.
+
+    Parameters:
+        events (list): The log events, each in the same format accepted by the log_list endpoint.
+
+    Returns:
+        tuple: (candidates, results) where candidates holds (index, log) pairs with an unsaved Log
+               for every valid event, and results holds the rejection of every invalid event
+               at its index and None elsewhere.
+    """
+    serializer = LogSerializer()
+    results = [None] * len(events)
+    candidates = []
+
+    for index, event in enumerate(events):
+        try:
+            candidates.append((index, build_log(serializer.run_validation(event))))
+        except ValidationError as e:
+            results[index] = {'index': index, 'status': 'rejected', 'errors': e.detail}
+    return candidates, results
+
+
+def ingest_batch(events):
+    """
+    Validates a batch of log events and stores the valid ones with bulk inserts.
+
+    Parameters:
+        events (list): The log events, each in the same format accepted by the log_list endpoint.
+
+    Returns:
+        list: One result per event, in input order. Accepted events carry the id of the
+              stored log, duplicate events the id of the log already stored for them,
+              and rejected events the validation errors.
+
+    Description:
+        Every event is validated with the LogSerializer fields, then the valid events are inserted
+        with ON CONFLICT DO NOTHING on the event identity (log group, log stream, ingestionTime,
+        message hash and timestamp), see insert_logs. Events that were already stored, or that
+        repeat an earlier event of the batch, are reported as duplicates so that a retried batch
+        is idempotent.
+        The Log rows and their LogCount rows are written inside one transaction, so a batch
+        costs a constant number of round trips.
+    """
+    candidates, results = validate_events(events)
+
+    with transaction.atomic():
+        logs = store_logs([log for _, log in candidates])
+
+    inserted = {id(log) for log in logs}
+    duplicates = [log for _, log in candidates if id(log) not in inserted]
+    stored = find_stored(duplicates)
+
+    for index, log in candidates:
+        if id(log) in inserted:
+            results[index] = {'index': index, 'status': 'accepted', 'id': log.id}
+        else:
+            results[index] = {'index': index, 'status': 'duplicate', 'id': stored.get(event_identity(log))}
+
+    return results
+
+
+def log_streams(logs):
+    """Returns the (logGroupName, logStreamName) pairs of logs."""
+    return {(log.logGroupName, log.logStreamName) for log in logs}
+
+
+def record_created(logs):
+    """
+    Updates the tables derived from the Log table after logs have been stored.
+
+    Parameters:
+        logs (list): The stored Log objects.
+    """
+    update_rollups(logs)
+    add_to_catalog(logs)
+    update_counters(logs)
+    publish_created(logs)
+    invalidate(streams=log_streams(logs))
+
+
+def record_updated(previous, log):
+    """
+    Updates the tables derived from the Log table after a log has been modified.
+
+    Parameters:
+        previous (Log): A copy of the log taken before the modification.
+        log (Log): The modified log.
+    """
+    update_rollups([previous], sign=-1)
+    update_rollups([log])
+    moved = (previous.logGroupName, previous.logStreamName) != (log.logGroupName, log.logStreamName)
+    if moved:
+        remove_from_catalog({(previous.logGroupName, previous.logStreamName): 1})
+    add_to_catalog([log], count=moved)
+    if previous.owner != log.owner:
+        update_counters([previous], sign=-1)
+        update_counters([log])
+    invalidate(streams=log_streams([previous, log]))
+
+
+def record_deleted(logs):
+    """
+    Updates the tables derived from the Log table after logs have been deleted.
+
+    Parameters:
+        logs (list): The deleted Log objects.
+    """
+    update_rollups(logs, sign=-1)
+    remove_from_catalog({key: stats[0] for key, stats in collect_streams(logs).items()})
+    update_counters(logs, sign=-1)
+    invalidate(streams=log_streams(logs))
@@ -0,0 +1,111 @@
+import json
+import platform
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from cloudwatch.benchmarks import BenchmarkSuite
+from cloudwatch.counters import exact_count
+from cloudwatch.models import LogGroup, LogStream
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=settings.BASE_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Requests every cloudwatch and authapis endpoint against the current database and reports the "
+        "p50/p95/p99 latency, the number of SQL queries, the response size and the peak memory of each. "
+        "Load a data set "
+        "with generate_logs first. With --output the results are saved as JSON, and --baseline compares "
+        "them with the results of an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help="Number of measured requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=3, help="Number of unmeasured requests per endpoint.")
+        parser.add_argument('--only', nargs='+', default=None,
+                            help="Only run the endpoints whose name contains one of these strings.")
+        parser.add_argument('--cold-cache', action='store_true',
+                            help="Invalidate the response cache before every request.")
+        parser.add_argument('--full-listings', action='store_true',
+                            help="Also run the endpoints that return every stored log.")
+        parser.add_argument('--accept-encoding', default=None,
+                            help="Accept-Encoding header of the requests, for instance 'zstd, br, gzip'.")
+        parser.add_argument('--output', default=None, help="Save the results to this JSON file.")
+        parser.add_argument('--baseline', default=None, help="Compare the results with this JSON file of an earlier run.")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError("--iterations must be positive and --warmup must not be negative.")
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = {result['name']: result for result in json.load(f)['results']}
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Could not read the baseline: {e}")
+
+        report = {
+            'started_at': timezone.now().isoformat(),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': {'vendor': connection.vendor, 'server_version': getattr(connection, 'pg_version', None)},
+            'dataset': {
+                'logs': exact_count(),
+                'log_groups': LogGroup.objects.count(),
+                'log_streams': LogStream.objects.count(),
+            },
+            'settings': {option: options[option] for option in
+                         ('iterations', 'warmup', 'cold_cache', 'full_listings', 'accept_encoding')},
+        }
+        self.stdout.write(
+            f"{report['dataset']['logs']} logs in {report['dataset']['log_groups']} groups and "
+            f"{report['dataset']['log_streams']} streams, {options['iterations']} requests per endpoint"
+        )
+        self.stdout.write(
+            f"{'endpoint':<40} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'size KB':>9} {'peak KB':>9}"
+        )
+
+        def progress(result):
+            latency = result['latency_ms']
+            line = (
+                f"{result['name']:<40} {latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f} "
+                f"{result['queries']['mean']:>8.1f} {result['response_bytes'] / 1024:>9.1f} {result['peak_memory_kb']:>9.0f}"
+            )
+            previous = baseline.get(result['name']) if baseline else None
+            if previous:
+                change = (latency['p95'] - previous['latency_ms']['p95']) / previous['latency_ms']['p95'] * 100
+                line += f"  p95 {change:+.0f}%, queries {result['queries']['mean'] - previous['queries']['mean']:+.1f}"
+                if previous.get('response_bytes'):
+                    line += f", size {(result['response_bytes'] / previous['response_bytes'] - 1) * 100:+.0f}%"
+            if result['errors']:
+                line = self.style.ERROR(f"{line}  {result['errors']} errors {result['status_codes']}")
+            self.stdout.write(line)
+
+        suite = BenchmarkSuite(iterations=options['iterations'], warmup=options['warmup'],
+                               cold_cache=options['cold_cache'], full_listings=options['full_listings'],
+                               accept_encoding=options['accept_encoding'])
+        started = time.perf_counter()
+        # The test client sends its requests to the "testserver" host
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            report['results'] = suite.run(only=options['only'], progress=progress)
+        report['duration_seconds'] = time.perf_counter() - started
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results saved to {options['output']}"))
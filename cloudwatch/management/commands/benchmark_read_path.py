@@ -0,0 +1,120 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cloudwatch.benchmarks import percentile
+
+
+async def fetch(url, token, timeout):
+    """Sends one GET request and returns its status code, reading the whole response."""
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(parts.hostname, parts.port or 80), timeout)
+    try:
+        writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nAuthorization: Token {token}\r\n'
+            f'Connection: close\r\n\r\n'.encode()
+        )
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1]) if response.startswith(b'HTTP/') else 0
+
+
+async def slow_client(url, interval, stop):
+    """Holds a connection open by sending the request headers one line at a time until stop is set."""
+    parts = urlsplit(url)
+    try:
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    except OSError:
+        return
+    try:
+        writer.write(f'GET {parts.path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'.encode())
+        while not stop.is_set():
+            await writer.drain()
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                writer.write(b'X-Slow-Client: 1\r\n')
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+
+async def run_target(url, token, clients, requests, slow_clients, slow_interval, timeout):
+    stop = asyncio.Event()
+    holders = [asyncio.create_task(slow_client(url, slow_interval, stop)) for _ in range(slow_clients)]
+    # Let the slow clients connect before measuring
+    await asyncio.sleep(min(1.0, slow_interval))
+
+    latencies, errors = [], 0
+
+    async def client():
+        nonlocal errors
+        for _ in range(requests):
+            started = time.perf_counter()
+            try:
+                status_code = await fetch(url, token, timeout)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                status_code = 0
+            if status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await asyncio.gather(*holders)
+    return latencies, errors, elapsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the latency of a read endpoint served by a WSGI and an ASGI server while slow clients "
+        "hold connections open. Start both servers first, for instance "
+        "`gunicorn backend.wsgi -w 4 -b 127.0.0.1:8000` and `uvicorn backend.asgi:application --port 8001`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000/api/cloudwatch/recent-logs/',
+                            help="The synchronous endpoint, served over WSGI.")
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001/api/cloudwatch/async/recent-logs/',
+                            help="The async endpoint, served over ASGI.")
+        parser.add_argument('--token', required=True, help="An API token.")
+        parser.add_argument('--clients', type=int, default=50, help="Number of concurrent clients.")
+        parser.add_argument('--requests', type=int, default=20, help="Number of requests sent by each client.")
+        parser.add_argument('--slow-clients', type=int, default=100,
+                            help="Number of connections kept open by clients that send their request slowly.")
+        parser.add_argument('--slow-interval', type=float, default=5.0,
+                            help="Seconds between two header lines of a slow client.")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Timeout of a request in seconds.")
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1 or options['requests'] < 1:
+            raise CommandError("--clients and --requests must be positive.")
+
+        for name, url in (('WSGI', options['wsgi_url']), ('ASGI', options['asgi_url'])):
+            latencies, errors, elapsed = asyncio.run(run_target(
+                url, options['token'], options['clients'], options['requests'],
+                options['slow_clients'], options['slow_interval'], options['timeout'],
+            ))
+            self.stdout.write(f"{name} {url}")
+            if not latencies:
+                self.stdout.write(self.style.ERROR(f"  no successful request, {errors} errors"))
+                continue
+            self.stdout.write(
+                f"  {len(latencies)} ok, {errors} errors, {len(latencies) / elapsed:.1f} requests/s\n"
+                f"  latency ms: mean {statistics.mean(latencies) * 1000:.1f}"
+                f" p50 {percentile(latencies, 0.50) * 1000:.1f}"
+                f" p95 {percentile(latencies, 0.95) * 1000:.1f}"
+                f" p99 {percentile(latencies, 0.99) * 1000:.1f}"
+                f" max {max(latencies) * 1000:.1f}"
+            )
@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cloudwatch.benchmarks import RenderingBenchmark
+from cloudwatch.compression import ENCODINGS
+from cloudwatch.management.commands.benchmark_endpoints import git_commit
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the serialization and JSON rendering of the large log listings the old way (model instances, "
+        "LogSerializer, the json module) and the new one (values_list rows, orjson), and reports the size of "
+        "the listings uncompressed and with every available compression. Load a data set with generate_logs first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5, help="Number of runs of every step, the median is kept.")
+        parser.add_argument('--max-logs', type=int, default=50000, help="Largest number of logs of a listing.")
+        parser.add_argument('--output', default=None, help="Save the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['max_logs'] < 1:
+            raise CommandError("--iterations and --max-logs must be positive.")
+
+        encodings = [encoding.name for encoding in ENCODINGS]
+        self.stdout.write(
+            f"{'listing':<36} {'logs':>7} {'serializer':>11} {'values':>8} {'json':>8} {'orjson':>8} {'KB':>9}"
+            + ''.join(f" {name + ' KB':>9} {name + ' ms':>8}" for name in encodings)
+        )
+
+        def progress(result):
+            serialize, render = result['serialize_ms'], result['render_ms']
+            line = (
+                f"{result['name']:<36} {result['logs']:>7} {serialize['serializer']:>9.1f}ms {serialize['values']:>6.1f}ms "
+                f"{render['json']:>6.1f}ms {render['orjson']:>6.1f}ms {result['bytes'] / 1024:>9.1f}"
+            )
+            for name in encodings:
+                compressed = result['compression'][name]
+                line += f" {compressed['bytes'] / 1024:>9.1f} {compressed['ms']:>8.1f}"
+            if not result['identical']:
+                line = self.style.ERROR(f"{line}  the orjson output differs")
+            self.stdout.write(line)
+
+        benchmark = RenderingBenchmark(iterations=options['iterations'], max_logs=options['max_logs'])
+        report = {
+            'started_at': timezone.now().isoformat(),
+            'git_commit': git_commit(),
+            'settings': {option: options[option] for option in ('iterations', 'max_logs')},
+            'results': benchmark.run(progress=progress),
+        }
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results saved to {options['output']}"))
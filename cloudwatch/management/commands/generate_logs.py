@@ -0,0 +1,92 @@
+import json
+import sys
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from cloudwatch.partitions import ensure_partitions, is_partitioned
+from cloudwatch.stream import CHUNK_SIZE, write_chunk
+from cloudwatch.synthetic import LogGenerator, parse_level_mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates synthetic logs spread over log groups, streams and time, and loads them with COPY "
+        "like the logs/stream/ endpoint does. With --output the logs are written as newline-delimited "
+        "JSON instead, for example to send them to logs/stream/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help="Number of logs to generate.")
+        parser.add_argument('--groups', type=int, default=10, help="Number of log groups.")
+        parser.add_argument('--streams-per-group', type=int, default=5, help="Number of log streams per group.")
+        parser.add_argument('--levels', default='INFO=80,WARN=15,ERROR=5',
+                            help="Relative weights of the log levels, e.g. INFO=80,WARN=15,ERROR=5.")
+        parser.add_argument('--days', type=float, default=30, help="Number of days the logs are spread over.")
+        parser.add_argument('--end', default=None,
+                            help="Timestamp of the most recent log (ISO 8601), defaults to now.")
+        parser.add_argument('--owner', type=int, default=1, help="Owner of the logs.")
+        parser.add_argument('--seed', type=int, default=None, help="Seed of the random generator, for repeatable data sets.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help="Number of logs written per COPY and per transaction.")
+        parser.add_argument('--output', default=None,
+                            help="Write the logs as newline-delimited JSON to this file ('-' for stdout) instead of loading them.")
+
+    def handle(self, *args, **options):
+        if options['count'] < 1 or options['chunk_size'] < 1 or options['days'] <= 0:
+            raise CommandError("--count, --chunk-size and --days must be positive.")
+
+        end = timezone.now()
+        if options['end']:
+            end = parse_datetime(options['end'])
+            if end is None:
+                raise CommandError(f"Invalid --end timestamp '{options['end']}'.")
+            if timezone.is_naive(end):
+                end = timezone.make_aware(end)
+        start = end - timedelta(days=options['days'])
+
+        try:
+            generator = LogGenerator(
+                options['owner'], groups=options['groups'], streams_per_group=options['streams_per_group'],
+                level_mix=parse_level_mix(options['levels']), start=start, end=end, seed=options['seed'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        events = generator.events(options['count'])
+
+        if options['output']:
+            self.write_ndjson(events, options['output'])
+            return
+
+        if is_partitioned():
+            # Without their partitions the logs would land in the default partition
+            ensure_partitions(since=start)
+
+        started = time.perf_counter()
+        loaded = 0
+        while chunk := list(islice(events, options['chunk_size'])):
+            with transaction.atomic():
+                loaded += write_chunk(chunk)
+            if self.stdout.isatty():
+                self.stdout.write(f"{loaded} logs loaded", ending='\r')
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {loaded} logs ({options['count'] - loaded} duplicates skipped) in {elapsed:.1f}s, "
+            f"{loaded / elapsed:.0f} logs/s."
+        ))
+
+    def write_ndjson(self, events, path):
+        output = sys.stdout if path == '-' else open(path, 'w')
+        try:
+            for event in events:
+                event['timestamp'] = event['timestamp'].isoformat()
+                output.write(json.dumps(event) + '\n')
+        finally:
+            if output is not sys.stdout:
+                output.close()
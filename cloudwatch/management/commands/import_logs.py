@@ -0,0 +1,101 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from cloudwatch.importer import SPLIT_SIZE, Checkpoint, find_files, import_unit, init_worker, plan_units, unit_key
+from cloudwatch.stream import CHUNK_SIZE
+
+REPORTED_ERRORS = 10
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports CloudWatch-style export files (NDJSON, or JSON with an events list, optionally gzipped) "
+        "from files or directories. The files are parsed, validated and loaded with COPY by a pool of "
+        "worker processes. An interrupted import resumes from its checkpoint when run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Export files or directories holding them.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="Number of worker processes, each with its own database connection.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help="Number of logs written per COPY and per transaction.")
+        parser.add_argument('--split-size', type=int, default=SPLIT_SIZE // (1024 * 1024),
+                            help="Uncompressed NDJSON files are split into ranges of about this many megabytes.")
+        parser.add_argument('--checkpoint', default='import_logs.checkpoint.json',
+                            help="File recording the imported ranges, removed once the import is complete.")
+        parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and import everything.")
+        parser.add_argument('--log-group', default=None, help="logGroupName of the events that have none.")
+        parser.add_argument('--log-stream', default=None,
+                            help="logStreamName of the events that have none, defaults to the file name.")
+        parser.add_argument('--owner', type=int, default=None, help="Owner of the events that have none.")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['chunk_size'] < 1 or options['split_size'] < 1:
+            raise CommandError("--workers, --chunk-size and --split-size must be positive.")
+        missing = [path for path in options['paths'] if not os.path.exists(path)]
+        if missing:
+            raise CommandError(f"No such file or directory: {', '.join(missing)}")
+
+        checkpoint = Checkpoint(options['checkpoint'])
+        if options['restart']:
+            checkpoint.clear()
+
+        units = plan_units(find_files(options['paths']), options['split_size'] * 1024 * 1024)
+        pending = [unit for unit in units if unit_key(unit) not in checkpoint.done]
+        if not pending:
+            self.stdout.write(self.style.SUCCESS(f"Nothing to import, {len(units)} ranges already imported."))
+            return
+        self.stdout.write(
+            f"Importing {len(pending)} ranges of {len({unit[0] for unit in pending})} files with "
+            f"{options['workers']} workers ({len(units) - len(pending)} ranges already imported)"
+        )
+
+        defaults = {'logGroupName': options['log_group'], 'logStreamName': options['log_stream'],
+                    'owner': options['owner']}
+        totals = {'loaded': 0, 'duplicates': 0, 'rejected': 0}
+        errors = []
+
+        # The workers open their own connections, a forked worker must not share the parent's
+        connections.close_all()
+        started = time.perf_counter()
+
+        def record(summary):
+            checkpoint.add(summary)
+            for key in totals:
+                totals[key] += summary[key]
+            errors.extend(summary['errors'][:REPORTED_ERRORS - len(errors)])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"[{len(checkpoint.done)}/{len(units)}] {totals['loaded']} loaded, {totals['duplicates']} duplicates, "
+                f"{totals['rejected']} rejected, {(totals['loaded'] + totals['duplicates']) / elapsed:.0f} logs/s"
+            )
+
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as executor:
+            futures = [executor.submit(import_unit, unit, defaults, options['chunk_size']) for unit in pending]
+            finished = set()
+            try:
+                for future in as_completed(futures):
+                    finished.add(future)
+                    record(future.result())
+            except KeyboardInterrupt:
+                self.stderr.write("Interrupted, finishing the ranges in progress.")
+                for future in futures:
+                    future.cancel()
+                for future in futures:
+                    if future not in finished and not future.cancelled():
+                        record(future.result())
+                raise CommandError("Import interrupted, run the same command again to resume.")
+
+        elapsed = time.perf_counter() - started
+        for error in errors:
+            self.stderr.write(f"{error['file']} (range at {error['offset']}, event {error['event']}): {error['errors']}")
+        checkpoint.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['loaded']} logs in {elapsed:.1f}s ({totals['loaded'] / elapsed:.0f} logs/s), "
+            f"{totals['duplicates']} duplicates skipped, {totals['rejected']} rejected."
+        ))
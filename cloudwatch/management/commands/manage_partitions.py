@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cloudwatch.partitions import drop_partitions_before, ensure_partitions, is_partitioned, month_start
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the upcoming monthly partitions of the Log table and, with --retention-days, "
+        "drops the partitions whose whole month is older than the retention period. "
+        "Meant to be run daily, for example from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help="Number of future months to create partitions for.")
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help="Remove the partitions that only hold logs older than this many days.")
+        parser.add_argument('--detach', action='store_true',
+                            help="Detach expired partitions and keep them as standalone tables instead of dropping them.")
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError("The Log table is not partitioned, run the migrations on PostgreSQL first.")
+
+        for name in ensure_partitions(months_ahead=options['months_ahead']):
+            self.stdout.write(f"Created {name}")
+
+        if options['retention_days'] is not None:
+            cutoff = month_start(timezone.now() - timedelta(days=options['retention_days']))
+            for name in drop_partitions_before(cutoff, detach_only=options['detach']):
+                self.stdout.write(f"{'Detached' if options['detach'] else 'Dropped'} {name}")
+
+        self.stdout.write(self.style.SUCCESS("Partitions are up to date."))
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from cloudwatch.cache import invalidate
+from cloudwatch.models import Log, LogTemplate
+from cloudwatch.templates import miner
+
+
+class Command(BaseCommand):
+    help = (
+        "Assigns a message template to the logs stored without one, for instance before template "
+        "extraction was added. Logs stored afterwards get their template when they are ingested."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Number of logs updated per transaction.")
+        parser.add_argument('--all', action='store_true',
+                            help="Assign the templates of every log again, not only of the logs without one.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        logs = Log.objects.all() if options['all'] else Log.objects.filter(template_id__isnull=True)
+        table = connection.ops.quote_name(Log._meta.db_table)
+        started = time.perf_counter()
+        last_id = 0
+        total = 0
+
+        while batch := list(logs.filter(id__gt=last_id).order_by('id').only('id', 'message')[:batch_size]):
+            for log in batch:
+                log.template_text = miner.match(log.message)
+            with transaction.atomic(), connection.cursor() as cursor:
+                miner.assign(batch)
+                cursor.execute(
+                    f'UPDATE {table} SET "template_id" = assigned.template_id '
+                    f'FROM (VALUES {", ".join(["(%s, %s)"] * len(batch))}) AS assigned (id, template_id) '
+                    f'WHERE {table}."id" = assigned.id',
+                    [value for log in batch for value in (log.id, log.template_id)],
+                )
+            last_id = batch[-1].id
+            total += len(batch)
+            self.stdout.write(f"{total} logs, {total / (time.perf_counter() - started):.0f} logs/s")
+
+        # Only the template counts depend on the template of the logs
+        invalidate(views=['log_templates'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Assigned templates to {total} logs, {LogTemplate.objects.count()} templates."
+        ))
@@ -0,0 +1,47 @@
+from datetime import timezone as dt_timezone
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMinute, TruncHour, TruncDay
+
+from cloudwatch.models import Log, LogRollup
+
+TRUNCATE_FUNCTIONS = {
+    LogRollup.MINUTE: TruncMinute,
+    LogRollup.HOUR: TruncHour,
+    LogRollup.DAY: TruncDay,
+}
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the minute, hour and day log count rollups from the Log table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Number of rollup rows inserted per query.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            LogRollup.objects.all().delete()
+
+            for granularity, truncate_function in TRUNCATE_FUNCTIONS.items():
+                buckets = (
+                    Log.objects.annotate(bucket=truncate_function('timestamp', tzinfo=dt_timezone.utc))
+                    .values('bucket', 'logGroupName', 'logStreamName', 'level')
+                    .annotate(count=Count('id'))
+                    .order_by()
+                    .iterator(chunk_size=batch_size)
+                )
+                rollups = (LogRollup(granularity=granularity, **bucket) for bucket in buckets)
+
+                total = 0
+                while batch := list(islice(rollups, batch_size)):
+                    LogRollup.objects.bulk_create(batch)
+                    total += len(batch)
+                self.stdout.write(f"{granularity}: {total} rollup rows")
+
+        self.stdout.write(self.style.SUCCESS("Rollups rebuilt."))
@@ -0,0 +1,327 @@
+"""
+Per-request performance metrics, aggregated in process into histograms and exposed in the
+Prometheus text format, see MetricsMiddleware and the metrics endpoint.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from rest_framework import serializers
+
+logger = logging.getLogger('cloudwatch.requests')
+
+METRICS_ENABLED = getattr(settings, 'CLOUDWATCH_METRICS_ENABLED', True)
+# Requests slower than this are logged, None disables the slow request log
+SLOW_REQUEST_SECONDS = getattr(settings, 'CLOUDWATCH_SLOW_REQUEST_SECONDS', 1.0)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Views that did not resolve are grouped under one label, so unknown paths do not create new series
+UNMATCHED_VIEW = '<unmatched>'
+
+current_request = ContextVar('current_request', default=None)
+
+
+class Histogram:
+    """
+    A Prometheus histogram per combination of label values.
+
+    Every series keeps the number of observations at or below each bucket bound (cumulated
+    when exported), their sum and their count.
+    """
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = {'buckets': [0] * (len(self.buckets) + 1), 'sum': 0, 'count': 0}
+            series['buckets'][bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def samples(self):
+        with self.lock:
+            series = {labels: dict(values, buckets=list(values['buckets'])) for labels, values in self.series.items()}
+        for label_values, values in sorted(series.items()):
+            labels = format_labels(self.labels, label_values)
+            cumulated = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values['buckets']):
+                cumulated += count
+                bucket_labels = format_labels(self.labels + ('le',), label_values + (format_value(bound),))
+                yield f'{self.name}_bucket{bucket_labels} {cumulated}'
+            yield f'{self.name}_sum{labels} {format_value(values["sum"])}'
+            yield f'{self.name}_count{labels} {values["count"]}'
+
+    def export(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram', *self.samples()]
+
+
+class Counter:
+    """A Prometheus counter per combination of label values."""
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self.lock:
+            self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def export(self):
+        with self.lock:
+            series = dict(self.series)
+        return [
+            f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter',
+            *(f'{self.name}{format_labels(self.labels, labels)} {value}' for labels, value in sorted(series.items())),
+        ]
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REQUEST_LABELS = ('view', 'method')
+
+requests_total = Counter(
+    'cloudwatch_http_requests_total', 'Number of HTTP requests.', REQUEST_LABELS + ('status',))
+request_duration = Histogram(
+    'cloudwatch_http_request_duration_seconds', 'Time spent handling a request.', REQUEST_LABELS, DURATION_BUCKETS)
+db_queries = Histogram(
+    'cloudwatch_db_queries_per_request', 'Number of SQL queries run by a request.', REQUEST_LABELS, QUERY_COUNT_BUCKETS)
+db_duration = Histogram(
+    'cloudwatch_db_duration_seconds', 'Time a request spent running SQL queries.', REQUEST_LABELS, DURATION_BUCKETS)
+response_size = Histogram(
+    'cloudwatch_http_response_size_bytes', 'Size of the response body as sent, streamed responses excluded.',
+    REQUEST_LABELS, SIZE_BUCKETS)
+serializer_duration = Histogram(
+    'cloudwatch_serializer_duration_seconds', 'Time a request spent serializing logs.',
+    REQUEST_LABELS, DURATION_BUCKETS)
+
+# The counters of the background log writer, see writer.BatchWriter.metrics
+INGEST_COUNTERS = {
+    'enqueued': 'queued for the background writer',
+    'rejected': 'refused because the ingestion queue was full',
+    'stored': 'stored by the background writer',
+    'duplicates': 'skipped by the background writer as duplicates',
+    'failed': 'dropped by the background writer after failed attempts',
+}
+
+METRICS = (requests_total, request_duration, db_queries, db_duration, response_size, serializer_duration)
+
+
+class RequestStats:
+    """What a request spent on the database and in serializers, filled while the request runs."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper, see Django's connection.execute_wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+@contextmanager
+def timed_serialization():
+    """Adds the time spent in the block to the serializer time of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = current_request.get()
+        if stats is not None:
+            stats.serializer_seconds += time.perf_counter() - started
+
+
+class TimedSerializerMixin:
+    """Adds the time spent building the data of a serializer to the metrics of the current request."""
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else UNMATCHED_VIEW
+
+
+def wrap_queries(stats):
+    """
+    Installs stats as execute wrapper of every database connection of the current thread.
+
+    Returns:
+        ExitStack: Removes the wrappers when closed.
+    """
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(stats))
+    return stack
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, the number and duration of the SQL queries, the response size and the
+    serializer time of every request, per URL name and method, and logs the slow requests.
+
+    Goes first in MIDDLEWARE so that the time spent in the other middleware is included. Works under
+    WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not METRICS_ENABLED:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            with wrap_queries(stats):
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not METRICS_ENABLED:
+            return await self.get_response(request)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            # Connections belong to a thread: the async ORM runs its queries in the thread of the
+            # request's thread-sensitive sync_to_async calls, so the wrappers are installed there
+            queries = await sync_to_async(wrap_queries)(stats)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(queries.close)()
+        finally:
+            current_request.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, stats, elapsed):
+        labels = (view_label(request), request.method)
+        requests_total.inc(labels + (str(response.status_code),))
+        request_duration.observe(labels, elapsed)
+        db_queries.observe(labels, stats.queries)
+        db_duration.observe(labels, stats.db_seconds)
+        serializer_duration.observe(labels, stats.serializer_seconds)
+        if not response.streaming:
+            response_size.observe(labels, len(response.content))
+
+        if SLOW_REQUEST_SECONDS is not None and elapsed >= SLOW_REQUEST_SECONDS:
+            logger.warning(
+                "Slow request %s %s took %.3fs", request.method, request.get_full_path(), elapsed,
+                extra={
+                    'view': labels[0], 'method': request.method, 'path': request.path,
+                    'status': response.status_code, 'duration': round(elapsed, 6), 'db_queries': stats.queries,
+                    'db_duration': round(stats.db_seconds, 6), 'serializer_duration': round(stats.serializer_seconds, 6),
+                },
+            )
+
+
+def export_metrics():
+    """
+    Returns the metrics of this process in the Prometheus text exposition format.
+
+    Returns:
+        str: The request metrics, followed by the queue of the background log writer, the live tail
+             and the token cache.
+    """
+    from authapis.authentication import token_cache_stats
+
+    from .tail import broker
+    from .writer import writer
+
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.export())
+
+    queue = writer.metrics()
+    lines += [
+        '# HELP cloudwatch_ingest_queue_depth Number of logs waiting for the background writer.',
+        '# TYPE cloudwatch_ingest_queue_depth gauge',
+        f'cloudwatch_ingest_queue_depth {queue["queue_depth"]}',
+    ]
+    for name, documentation in INGEST_COUNTERS.items():
+        lines += [
+            f'# HELP cloudwatch_ingest_{name}_total Number of logs {documentation}.',
+            f'# TYPE cloudwatch_ingest_{name}_total counter',
+            f'cloudwatch_ingest_{name}_total {queue[name]}',
+        ]
+
+    tail = broker.metrics()
+    lines += [
+        '# HELP cloudwatch_tail_subscribers Number of live tail subscribers.',
+        '# TYPE cloudwatch_tail_subscribers gauge',
+        f'cloudwatch_tail_subscribers {tail["subscribers"]}',
+        '# HELP cloudwatch_tail_dropped_total Number of live tail subscribers dropped because their buffer was full.',
+        '# TYPE cloudwatch_tail_dropped_total counter',
+        f'cloudwatch_tail_dropped_total {tail["dropped"]}',
+    ]
+
+    tokens = token_cache_stats()
+    lines += [
+        '# HELP authapis_token_cache_requests_total Number of token lookups by outcome in the token cache.',
+        '# TYPE authapis_token_cache_requests_total counter',
+        f'authapis_token_cache_requests_total{{outcome="hit"}} {tokens["hits"]}',
+        f'authapis_token_cache_requests_total{{outcome="miss"}} {tokens["misses"]}',
+        '# HELP authapis_token_cache_invalidations_total Number of tokens removed from the token cache.',
+        '# TYPE authapis_token_cache_invalidations_total counter',
+        f'authapis_token_cache_invalidations_total {tokens["invalidations"]}',
+    ]
+    return '\n'.join(lines) + '\n'
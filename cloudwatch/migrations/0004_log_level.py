@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:47
+
+from django.db import migrations, models
+
+
+def backfill_level(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Log = apps.get_model('cloudwatch', 'Log')
+    # Least severe first so that the most severe marker of a message wins.
+    for level in ('INFO', 'WARN', 'ERROR'):
+        Log.objects.using(db).filter(message__contains=f'[{level} ]').update(level=level)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloudwatch', '0003_alter_log_ingestiontime'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='log',
+            name='level',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=5),
+        ),
+        migrations.RunPython(backfill_level, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloudwatch', '0004_log_level'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=6)),
+                ('bucket', models.DateTimeField()),
+                ('logGroupName', models.CharField(max_length=100)),
+                ('logStreamName', models.CharField(max_length=100)),
+                ('level', models.CharField(blank=True, default='', max_length=5)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'bucket', 'logGroupName', 'logStreamName', 'level'), name='cloudwatch_logrollup_unique_bucket')],
+            },
+        ),
+    ]
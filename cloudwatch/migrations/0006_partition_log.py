@@ -0,0 +1,118 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:52
+
+from datetime import datetime, timezone as dt_timezone
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+LOG_TABLE = 'cloudwatch_log'
+OLD_TABLE = 'cloudwatch_log_old'
+MONTHS_AHEAD = 3
+
+
+def month_start(value):
+    """Returns the first instant of the UTC month containing value."""
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value, months):
+    """Returns the first instant of the month that is `months` months after the month of value."""
+    month = value.year * 12 + value.month - 1 + months
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def create_partition(cursor, start):
+    """Creates the partition of the new, still empty, log table for the month starting at start."""
+    cursor.execute(
+        f'CREATE TABLE {LOG_TABLE}_p{start.year:04d}_{start.month:02d} PARTITION OF {LOG_TABLE} '
+        f'FOR VALUES FROM (%s) TO (%s)',
+        [start, add_months(start, 1)],
+    )
+
+
+def rebuild_log_table(schema_editor, partitioned):
+    """
+    Recreates cloudwatch_log as a partitioned table (or back as a plain table) and copies the rows over.
+
+    The indexes are recreated under their original names so that later migrations can
+    still find them, and the id sequence is carried over with its current value.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+            [LOG_TABLE, f'{LOG_TABLE}_pkey'],
+        )
+        indexes = cursor.fetchall()
+
+        cursor.execute(f'ALTER TABLE {LOG_TABLE} RENAME TO {OLD_TABLE}')
+        cursor.execute(f'ALTER TABLE {OLD_TABLE} RENAME CONSTRAINT {LOG_TABLE}_pkey TO {OLD_TABLE}_pkey')
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX "{name}"')
+
+        if partitioned:
+            cursor.execute(
+                f'CREATE TABLE {LOG_TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+                f'PARTITION BY RANGE ("timestamp")'
+            )
+            cursor.execute(f'ALTER TABLE {LOG_TABLE} ADD CONSTRAINT {LOG_TABLE}_pkey PRIMARY KEY (id, "timestamp")')
+        else:
+            cursor.execute(f'CREATE TABLE {LOG_TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS INCLUDING IDENTITY)')
+            cursor.execute(f'ALTER TABLE {LOG_TABLE} ADD CONSTRAINT {LOG_TABLE}_pkey PRIMARY KEY (id)')
+
+        for _, definition in indexes:
+            cursor.execute(definition.replace(' ON ONLY ', ' ON '))
+
+        if partitioned:
+            cursor.execute(f'CREATE TABLE {LOG_TABLE}_default PARTITION OF {LOG_TABLE} DEFAULT')
+            cursor.execute(f'SELECT min("timestamp") FROM {OLD_TABLE}')
+            oldest = cursor.fetchone()[0]
+            month = month_start(oldest or timezone.now())
+            last = add_months(month_start(timezone.now()), MONTHS_AHEAD)
+            while month <= last:
+                create_partition(cursor, month)
+                month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO {LOG_TABLE} SELECT * FROM {OLD_TABLE}')
+
+        # Serial ids (tables created before Django 4.1) use a sequence owned by the old column
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id'), pg_get_serial_sequence(%s, 'id')",
+                       [OLD_TABLE, LOG_TABLE])
+        old_sequence, new_sequence = cursor.fetchone()
+        if new_sequence is None or new_sequence == old_sequence:
+            cursor.execute(f'ALTER SEQUENCE {old_sequence} OWNED BY {LOG_TABLE}.id')
+        else:
+            cursor.execute(
+                f'SELECT setval(%s, COALESCE((SELECT max(id) FROM {LOG_TABLE}), 0) + 1, false)', [new_sequence]
+            )
+
+        cursor.execute(f'DROP TABLE {OLD_TABLE}')
+
+
+def partition_log_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        rebuild_log_table(schema_editor, partitioned=True)
+
+
+def unpartition_log_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        rebuild_log_table(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloudwatch', '0005_logrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='logcount',
+            name='log',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='log_count', to='cloudwatch.log'),
+        ),
+        migrations.RunPython(partition_log_table, unpartition_log_table),
+    ]
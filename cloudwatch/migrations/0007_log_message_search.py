@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:54
+
+import re
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.contrib.postgres.search
+from django.db import migrations
+
+INDEXES = [
+    django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('message', config='simple'), name='cloudwatch_log_message_fts'),
+    django.contrib.postgres.indexes.GinIndex(fields=['message'], name='cloudwatch_log_message_trgm', opclasses=['gin_trgm_ops']),
+]
+
+
+def create_index_concurrently(schema_editor, model, index):
+    """
+    Creates an index of the partitioned Log table without blocking the writes to it.
+
+    Description:
+        PostgreSQL cannot build an index of a partitioned table concurrently. The index is created
+        on the partitioned table only, invalid until every partition has its copy. Each partition's
+        copy is then built with CREATE INDEX CONCURRENTLY and attached, which makes the index valid
+        once the last one is attached. A copy left invalid by an interrupted build is built again,
+        so the migration can be run again after a failure.
+    """
+    quote = schema_editor.quote_name
+    table = model._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        statement = index.create_sql(model, schema_editor)
+        statement.parts['table'] = f'ONLY {quote(table)}'
+        cursor.execute(if_not_exists(statement))
+
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s) ORDER BY child.relname",
+            [table],
+        )
+        for (partition,) in cursor.fetchall():
+            name = f'{index.name}{partition[len(table):]}'
+            statement = index.create_sql(model, schema_editor, concurrently=True)
+            statement.parts['table'] = quote(partition)
+            statement.parts['name'] = quote(name)
+            cursor.execute("SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(%s) AND NOT indisvalid", [name])
+            if cursor.fetchone():
+                cursor.execute(f'DROP INDEX CONCURRENTLY {quote(name)}')
+            cursor.execute(if_not_exists(statement))
+            cursor.execute(f'ALTER INDEX {quote(index.name)} ATTACH PARTITION {quote(name)}')
+
+
+def if_not_exists(statement):
+    return re.sub(r'^CREATE INDEX( CONCURRENTLY)?', r'\g<0> IF NOT EXISTS', str(statement))
+
+
+def create_indexes(apps, schema_editor):
+    Log = apps.get_model('cloudwatch', 'Log')
+    for index in INDEXES:
+        create_index_concurrently(schema_editor, Log, index)
+
+
+def drop_indexes(apps, schema_editor):
+    Log = apps.get_model('cloudwatch', 'Log')
+    for index in INDEXES:
+        schema_editor.remove_index(Log, index)
+
+
+class Migration(migrations.Migration):
+    # The indexes are built concurrently, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('cloudwatch', '0006_partition_log'),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.TrigramExtension(),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name='log', index=index) for index in INDEXES],
+            database_operations=[migrations.RunPython(create_indexes, drop_indexes)],
+        ),
+    ]
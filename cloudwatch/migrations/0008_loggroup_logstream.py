@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def backfill_catalog(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Log = apps.get_model('cloudwatch', 'Log')
+    LogGroup = apps.get_model('cloudwatch', 'LogGroup')
+    LogStream = apps.get_model('cloudwatch', 'LogStream')
+
+    streams = list(
+        Log.objects.using(db).values('logGroupName', 'logStreamName')
+        .annotate(log_count=Count('id'), first_seen=Min('timestamp'), last_seen=Max('timestamp'))
+        .order_by()
+    )
+    groups = {}
+    for stream in streams:
+        group = groups.get(stream['logGroupName'])
+        if group is None:
+            groups[stream['logGroupName']] = LogGroup(
+                name=stream['logGroupName'], first_seen=stream['first_seen'],
+                last_seen=stream['last_seen'], log_count=stream['log_count'],
+            )
+        else:
+            group.first_seen = min(group.first_seen, stream['first_seen'])
+            group.last_seen = max(group.last_seen, stream['last_seen'])
+            group.log_count += stream['log_count']
+    LogGroup.objects.using(db).bulk_create(groups.values(), batch_size=1000)
+
+    LogStream.objects.using(db).bulk_create(
+        [
+            LogStream(
+                group=groups[stream['logGroupName']], name=stream['logStreamName'],
+                first_seen=stream['first_seen'], last_seen=stream['last_seen'], log_count=stream['log_count'],
+            )
+            for stream in streams
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloudwatch', '0007_log_message_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+                ('log_count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LogStream',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+                ('log_count', models.BigIntegerField(default=0)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='streams', to='cloudwatch.loggroup')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('group', 'name'), name='cloudwatch_logstream_unique_name')],
+            },
+        ),
+        migrations.RunPython(backfill_catalog, migrations.RunPython.noop),
+    ]
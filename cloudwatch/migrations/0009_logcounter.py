@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:59
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Log = apps.get_model('cloudwatch', 'Log')
+    LogCounter = apps.get_model('cloudwatch', 'LogCounter')
+
+    owners = Log.objects.using(db).values_list('owner').annotate(count=Count('id')).order_by()
+    counters = [LogCounter(scope='owner', key=str(owner), count=count) for owner, count in owners]
+    counters.append(LogCounter(scope='total', key='', count=sum(counter.count for counter in counters)))
+    LogCounter.objects.using(db).bulk_create(counters, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloudwatch', '0008_loggroup_logstream'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('total', 'Total'), ('owner', 'Owner')], max_length=5)),
+                ('key', models.CharField(blank=True, default='', max_length=100)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('scope', 'key'), name='cloudwatch_logcounter_unique_key')],
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
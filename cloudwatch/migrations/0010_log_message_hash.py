@@ -0,0 +1,103 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:06
+
+import hashlib
+from collections import Counter
+from datetime import timezone
+
+from django.db import migrations, models
+
+# The fields zeroed to truncate a UTC timestamp to the start of its rollup bucket
+ROLLUP_TRUNCATION = {
+    'minute': {'second': 0, 'microsecond': 0},
+    'hour': {'minute': 0, 'second': 0, 'microsecond': 0},
+    'day': {'hour': 0, 'minute': 0, 'second': 0, 'microsecond': 0},
+}
+
+
+def backfill_message_hash(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Log = apps.get_model('cloudwatch', 'Log')
+    if schema_editor.connection.vendor == 'postgresql':
+        Log.objects.using(db).update(message_hash=models.Func(models.F('message'), function='md5'))
+        return
+
+    for log in Log.objects.using(db).only('id', 'message').iterator():
+        Log.objects.using(db).filter(pk=log.pk).update(message_hash=hashlib.md5(log.message.encode('utf-8')).hexdigest())
+
+
+def delete_duplicates(apps, schema_editor):
+    """
+    Keeps the oldest log of every event identity so that the unique constraint can be added.
+
+    The deleted logs are subtracted from the rollups, the catalog and the counters as they
+    stand at this migration.
+    """
+    db = schema_editor.connection.alias
+    Log = apps.get_model('cloudwatch', 'Log')
+    LogCount = apps.get_model('cloudwatch', 'LogCount')
+    LogRollup = apps.get_model('cloudwatch', 'LogRollup')
+    LogGroup = apps.get_model('cloudwatch', 'LogGroup')
+    LogStream = apps.get_model('cloudwatch', 'LogStream')
+    LogCounter = apps.get_model('cloudwatch', 'LogCounter')
+
+    identity = ('logGroupName', 'logStreamName', 'ingestionTime', 'message_hash', 'timestamp')
+    duplicated = (
+        Log.objects.using(db).values(*identity)
+        .annotate(first_id=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    rollups, streams, counters = Counter(), Counter(), Counter()
+    for event in list(duplicated):
+        first_id = event.pop('first_id')
+        event.pop('total')
+        duplicates = list(
+            Log.objects.using(db).filter(**event).exclude(id=first_id)
+            .values_list('id', 'logGroupName', 'logStreamName', 'level', 'timestamp', 'owner')
+        )
+        ids = [duplicate[0] for duplicate in duplicates]
+        LogCount.objects.using(db).filter(log_id__in=ids).delete()
+        Log.objects.using(db).filter(id__in=ids).delete()
+
+        for _, group, stream, level, timestamp, owner in duplicates:
+            timestamp = timestamp.astimezone(timezone.utc)
+            for granularity, fields in ROLLUP_TRUNCATION.items():
+                rollups[(granularity, timestamp.replace(**fields), group, stream, level)] += 1
+            streams[(group, stream)] += 1
+            counters[('total', '')] += 1
+            counters[('owner', str(owner))] += 1
+
+    for (granularity, bucket, group, stream, level), count in rollups.items():
+        LogRollup.objects.using(db).filter(
+            granularity=granularity, bucket=bucket, logGroupName=group, logStreamName=stream, level=level,
+        ).update(count=models.F('count') - count)
+    groups = Counter()
+    for (group, stream), count in streams.items():
+        LogStream.objects.using(db).filter(group__name=group, name=stream).update(log_count=models.F('log_count') - count)
+        groups[group] += count
+    for group, count in groups.items():
+        LogGroup.objects.using(db).filter(name=group).update(log_count=models.F('log_count') - count)
+    for (scope, key), count in counters.items():
+        LogCounter.objects.using(db).filter(scope=scope, key=key).update(count=models.F('count') - count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloudwatch', '0009_logcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='log',
+            name='message_hash',
+            field=models.CharField(default='', editable=False, max_length=32),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_message_hash, migrations.RunPython.noop),
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='log',
+            constraint=models.UniqueConstraint(fields=('logGroupName', 'logStreamName', 'ingestionTime', 'message_hash', 'timestamp'), name='cloudwatch_log_unique_event'),
+        ),
+    ]
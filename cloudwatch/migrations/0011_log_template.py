@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloudwatch', '0010_log_message_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('template', models.TextField()),
+                ('token_count', models.IntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='template_id',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['template_id', 'timestamp'], name='cloudwatch_log_template_time'),
+        ),
+    ]
@@ -0,0 +1,105 @@
+import re
+
+from django.db import migrations, models
+
+INDEXES = [
+    models.Index(fields=['-timestamp', '-id'], name='cloudwatch_log_time'),
+    models.Index(fields=['logGroupName', 'logStreamName', '-timestamp', '-id'], name='cloudwatch_log_grp_strm_time'),
+    models.Index(fields=['level', '-timestamp', '-id'], name='cloudwatch_log_level_time'),
+    models.Index(fields=['owner', '-timestamp'], name='cloudwatch_log_owner_time'),
+]
+
+
+def create_index_concurrently(schema_editor, model, index):
+    """
+    Creates an index of the Log table without blocking the writes to it.
+
+    Parameters:
+        schema_editor (BaseDatabaseSchemaEditor): The schema editor of the migration.
+        model (Model): The Log model of the migration state.
+        index (Index): The index to create.
+
+    Description:
+        PostgreSQL cannot build an index of a partitioned table concurrently. The index is created
+        on the partitioned table only, invalid until every partition has its copy. Each partition's
+        copy is then built with CREATE INDEX CONCURRENTLY and attached, which makes the index valid
+        once the last one is attached. A copy left invalid by an interrupted build is built again,
+        so the migration can be run again after a failure.
+        A plain table gets a concurrent index, other databases the usual one.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        schema_editor.add_index(model, index)
+        return
+
+    quote = schema_editor.quote_name
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+        if cursor.fetchone()[0] != 'p':
+            statement = index.create_sql(model, schema_editor, concurrently=True)
+            drop_invalid_index(cursor, index.name)
+            cursor.execute(if_not_exists(statement))
+            return
+
+        statement = index.create_sql(model, schema_editor)
+        statement.parts['table'] = f'ONLY {quote(table)}'
+        cursor.execute(if_not_exists(statement))
+
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s) ORDER BY child.relname",
+            [table],
+        )
+        for (partition,) in cursor.fetchall():
+            name = f'{index.name}{partition[len(table):]}'
+            statement = index.create_sql(model, schema_editor, concurrently=True)
+            statement.parts['table'] = quote(partition)
+            statement.parts['name'] = quote(name)
+            drop_invalid_index(cursor, name)
+            cursor.execute(if_not_exists(statement))
+            cursor.execute(f'ALTER INDEX {quote(index.name)} ATTACH PARTITION {quote(name)}')
+
+
+def if_not_exists(statement):
+    return re.sub(r'^CREATE INDEX( CONCURRENTLY)?', r'\g<0> IF NOT EXISTS', str(statement))
+
+
+def drop_invalid_index(cursor, name):
+    cursor.execute("SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(%s) AND NOT indisvalid", [name])
+    if cursor.fetchone():
+        cursor.execute(f'DROP INDEX CONCURRENTLY {cursor.db.ops.quote_name(name)}')
+
+
+def create_indexes(apps, schema_editor):
+    Log = apps.get_model('cloudwatch', 'Log')
+    for index in INDEXES:
+        create_index_concurrently(schema_editor, Log, index)
+
+
+def drop_indexes(apps, schema_editor):
+    Log = apps.get_model('cloudwatch', 'Log')
+    for index in INDEXES:
+        schema_editor.remove_index(Log, index)
+
+
+class Migration(migrations.Migration):
+    # The indexes are built concurrently, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('cloudwatch', '0011_log_template'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name='log', index=index) for index in INDEXES],
+            database_operations=[migrations.RunPython(create_indexes, drop_indexes)],
+        ),
+        # Replaced by cloudwatch_log_level_time, which serves the lookups on the level alone as well
+        migrations.AlterField(
+            model_name='log',
+            name='level',
+            field=models.CharField(blank=True, default='', editable=False, max_length=5),
+        ),
+    ]
@@ -0,0 +1,50 @@
+import hashlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def merge_duplicate_templates(apps, schema_editor):
+    """
+    Hashes the stored templates, keeping the lowest id of every text: the logs of the other ids
+    are moved to it and the other ids are deleted, so that the hash can be unique.
+    """
+    db = schema_editor.connection.alias
+    Log = apps.get_model('cloudwatch', 'Log')
+    LogTemplate = apps.get_model('cloudwatch', 'LogTemplate')
+
+    kept = {}
+    hashed = []
+    for template in LogTemplate.objects.using(db).order_by('id').iterator():
+        template_hash = hashlib.md5(template.template.encode('utf-8')).hexdigest()
+        if template_hash in kept:
+            Log.objects.using(db).filter(template_id=template.id).update(template_id=kept[template_hash])
+            LogTemplate.objects.using(db).filter(id=template.id).delete()
+            continue
+        kept[template_hash] = template.id
+        template.template_hash = template_hash
+        hashed.append(template)
+    LogTemplate.objects.using(db).bulk_update(hashed, ['template_hash'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloudwatch', '0012_log_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logtemplate',
+            name='template_hash',
+            field=models.CharField(default='', editable=False, max_length=32),
+            preserve_default=False,
+        ),
+        migrations.RunPython(merge_duplicate_templates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='logtemplate',
+            name='template_hash',
+            field=models.CharField(editable=False, max_length=32, unique=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloudwatch', '0013_logtemplate_template_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logtemplate',
+            name='general',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='generalized', to='cloudwatch.logtemplate'),
+        ),
+    ]
@@ -1,5 +1,10 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
 
+from .templates import miner
+from .utils import hash_message, parse_level
+
 class Log(models.Model):
     logGroupName = models.CharField(max_length=100)
     logStreamName = models.CharField(max_length=100)
@@ -7,13 +12,137 @@ class Log(models.Model):
     timestamp = models.DateTimeField()
     message = models.TextField()
     ingestionTime = models.BigIntegerField()
+    level = models.CharField(max_length=5, blank=True, default='', editable=False)
+    message_hash = models.CharField(max_length=32, editable=False)
+    # The LogTemplate of the message, see cloudwatch.templates
+    template_id = models.BigIntegerField(null=True, blank=True, editable=False)
+    # The text of the template of a log being stored, its id is set when it is stored
+    template_text = None
+
+    class Meta:
+        constraints = [
+            # The identity of a log event, retried deliveries are stored once. The partition key has to be part of it.
+            models.UniqueConstraint(
+                fields=['logGroupName', 'logStreamName', 'ingestionTime', 'message_hash', 'timestamp'],
+                name='cloudwatch_log_unique_event',
+            ),
+        ]
+        indexes = [
+            # Full-text search, see cloudwatch.search
+            GinIndex(SearchVector('message', config='simple'), name='cloudwatch_log_message_fts'),
+            # Substring (ILIKE) search, needs the pg_trgm extension
+            GinIndex(fields=['message'], opclasses=['gin_trgm_ops'], name='cloudwatch_log_message_trgm'),
+            # Counts per template over time
+            models.Index(fields=['template_id', 'timestamp'], name='cloudwatch_log_template_time'),
+            # The listings filter on these columns and return the newest logs first, by (timestamp, id)
+            # like the keyset pagination. See migration 0012 and the EXPLAIN tests.
+            models.Index(fields=['-timestamp', '-id'], name='cloudwatch_log_time'),
+            models.Index(fields=['logGroupName', 'logStreamName', '-timestamp', '-id'], name='cloudwatch_log_grp_strm_time'),
+            models.Index(fields=['level', '-timestamp', '-id'], name='cloudwatch_log_level_time'),
+            models.Index(fields=['owner', '-timestamp'], name='cloudwatch_log_owner_time'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.level = parse_level(self.message)
+        self.message_hash = hash_message(self.message)
+        self.template_text = miner.match(self.message)
+        miner.assign([self])
+        super().save(*args, **kwargs)
 
 def __str__(self):
     return f"Log {self.id} - {self.logGroupName} - {self.logStreamName} - {self.message}"
 
 
 class LogCount(models.Model):
-    log = models.OneToOneField(Log, on_delete=models.CASCADE, related_name='log_count')
+    # Not enforced by the database: a foreign key cannot reference the partitioned Log table by id alone.
+    log = models.OneToOneField(Log, on_delete=models.CASCADE, related_name='log_count', db_constraint=False)
     info_count = models.IntegerField(default=0)
     error_count = models.IntegerField(default=0)
     warn_count = models.IntegerField(default=0)
+
+
+class LogRollup(models.Model):
+    MINUTE = 'minute'
+    HOUR = 'hour'
+    DAY = 'day'
+    GRANULARITY_CHOICES = [
+        (MINUTE, 'Minute'),
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    ]
+
+    granularity = models.CharField(max_length=6, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+    logGroupName = models.CharField(max_length=100)
+    logStreamName = models.CharField(max_length=100)
+    level = models.CharField(max_length=5, blank=True, default='')
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket', 'logGroupName', 'logStreamName', 'level'],
+                name='cloudwatch_logrollup_unique_bucket',
+            ),
+        ]
+
+
+class LogGroup(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+    log_count = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class LogStream(models.Model):
+    group = models.ForeignKey(LogGroup, on_delete=models.CASCADE, related_name='streams')
+    name = models.CharField(max_length=100)
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+    log_count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'name'], name='cloudwatch_logstream_unique_name'),
+        ]
+
+    def __str__(self):
+        return f"{self.group.name} - {self.name}"
+
+
+class LogCounter(models.Model):
+    TOTAL = 'total'
+    OWNER = 'owner'
+    SCOPE_CHOICES = [
+        (TOTAL, 'Total'),
+        (OWNER, 'Owner'),
+    ]
+
+    scope = models.CharField(max_length=5, choices=SCOPE_CHOICES)
+    key = models.CharField(max_length=100, blank=True, default='')
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='cloudwatch_logcounter_unique_key'),
+        ]
+
+
+class LogTemplate(models.Model):
+    """
+    A message template, the variable tokens of the messages replaced with <*>, see cloudwatch.templates.
+
+    Every text is stored once, under the MD5 of the text, and never changes. A template that was
+    generalized refers to the template of its new text.
+    """
+    template = models.TextField()
+    template_hash = models.CharField(max_length=32, unique=True, editable=False)
+    token_count = models.IntegerField()
+    general = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL,
+                                related_name='generalized', editable=False)
+
+    def __str__(self):
+        return self.template
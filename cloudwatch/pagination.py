@@ -0,0 +1,190 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over logs keyed on (timestamp, id), newest first.
+
+    Every page is fetched with an indexable `timestamp <= cursor` condition and a LIMIT,
+    so deep pages cost the same as the first one. The cursor is opaque to clients and
+    only carries the key of the row the page starts after or ends before.
+
+    Pagination is opt-in: a listing is only paginated when the request has a `cursor`
+    or `page_size` query parameter, unless CLOUDWATCH_PAGINATE_BY_DEFAULT is set.
+    """
+    page_size = getattr(settings, 'CLOUDWATCH_PAGE_SIZE', 100)
+    max_page_size = getattr(settings, 'CLOUDWATCH_MAX_PAGE_SIZE', 1000)
+    paginate_by_default = getattr(settings, 'CLOUDWATCH_PAGINATE_BY_DEFAULT', False)
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request):
+        """Same as paginate_queryset, for async views: the page is fetched with the async ORM interface."""
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page([row async for row in queryset])
+
+    def page_queryset(self, queryset, request):
+        """Returns the query of the requested page, with one extra row, or None if the request is not paginated."""
+        # request.GET works for both REST framework and plain Django (async view) requests
+        params = request.GET
+        if not self.paginate_by_default and self.cursor_query_param not in params \
+                and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(params.get(self.cursor_query_param))
+        cursor = self.cursor
+
+        if cursor is None:
+            return queryset.order_by('-timestamp', '-id')[:self.page_size + 1]
+        timestamp, pk = cursor['timestamp'], cursor['id']
+        if cursor['direction'] == 'next':
+            return (
+                queryset.filter(Q(timestamp__lte=timestamp) & (Q(timestamp__lt=timestamp) | Q(id__lt=pk)))
+                .order_by('-timestamp', '-id')[:self.page_size + 1]
+            )
+        return (
+            queryset.filter(Q(timestamp__gte=timestamp) & (Q(timestamp__gt=timestamp) | Q(id__gt=pk)))
+            .order_by('timestamp', 'id')[:self.page_size + 1]
+        )
+
+    def set_page(self, rows):
+        """Trims the fetched rows to the page and records the keys the next and previous links start from."""
+        cursor = self.cursor
+        if cursor is None:
+            self.has_next, self.has_previous = len(rows) > self.page_size, False
+            rows = rows[:self.page_size]
+        elif cursor['direction'] == 'next':
+            self.has_next, self.has_previous = len(rows) > self.page_size, True
+            rows = rows[:self.page_size]
+        else:
+            self.has_next, self.has_previous = True, len(rows) > self.page_size
+            rows = rows[:self.page_size][::-1]
+
+        if rows:
+            self.first, self.last = (rows[0].timestamp, rows[0].id), (rows[-1].timestamp, rows[-1].id)
+        else:
+            # Paged past either end, link back to the position of the cursor
+            key = (cursor['timestamp'], cursor['id']) if cursor else None
+            self.first, self.last = key, key
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.GET.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.build_link(self.last, 'next')
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first is None:
+            return None
+        return self.build_link(self.first, 'previous')
+
+    def build_link(self, key, direction):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(key, direction))
+
+    def encode_cursor(self, key, direction):
+        timestamp, pk = key
+        payload = json.dumps({'t': timestamp.isoformat(), 'i': pk, 'd': direction[0]})
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, encoded):
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            cursor = {
+                'timestamp': parse_datetime(payload['t']),
+                'id': int(payload['i']),
+                'direction': 'next' if payload['d'] == 'n' else 'previous',
+            }
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if cursor['timestamp'] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+
+class SearchPagination(BasePagination):
+    """
+    Limit/offset pagination for ranked results, which have no stable key to page on.
+
+    One extra row is fetched to know whether there is a next page, so no COUNT query is run.
+    """
+    default_limit = 50
+    max_limit = 500
+    limit_query_param = 'limit'
+    offset_query_param = 'offset'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_integer(self.limit_query_param, self.default_limit, 1, self.max_limit)
+        self.offset = self.get_integer(self.offset_query_param, 0, 0, None)
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        return rows[:self.limit]
+
+    def get_integer(self, name, default, minimum, maximum):
+        try:
+            value = int(self.request.query_params.get(name, default))
+        except ValueError:
+            return default
+        value = max(minimum, value)
+        return min(value, maximum) if maximum is not None else value
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_previous_link(self):
+        if self.offset <= 0:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, max(0, self.offset - self.limit))
@@ -0,0 +1,197 @@
+import re
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import invalidate
+from .catalog import remove_from_catalog
+from .counters import apply_deltas
+from .models import Log, LogCount, LogCounter
+
+PARTITION_NAME = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def log_table():
+    return Log._meta.db_table
+
+
+def default_partition():
+    return f'{log_table()}_default'
+
+
+def month_start(value):
+    """Returns the first instant of the UTC month containing value."""
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value, months):
+    """Returns the first instant of the month that is `months` months after the month of value."""
+    month = value.year * 12 + value.month - 1 + months
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(start):
+    return f'{log_table()}_p{start.year:04d}_{start.month:02d}'
+
+
+def is_partitioned():
+    """Returns whether the Log table is a PostgreSQL partitioned table."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [log_table()])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def list_partitions():
+    """
+    Returns the monthly partitions of the Log table.
+
+    Returns:
+        list: (name, start, end) tuples ordered by start. The default partition is not included.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s)",
+            [log_table()],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.search(name)
+        if match:
+            start = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)
+            partitions.append((name, start, add_months(start, 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(start):
+    """
+    Creates the partition of the Log table for the month starting at start.
+
+    Parameters:
+        start (datetime): The first instant of the month, in UTC.
+
+    Returns:
+        bool: False if the partition already existed.
+
+    Description:
+        The partition is created as a plain table, the rows of its month that landed in the
+        default partition are moved into it, and it is then attached to the Log table.
+        Attaching builds the partition's copy of every Log index.
+    """
+    name = partition_name(start)
+    end = add_months(start, 1)
+    quote = connection.ops.quote_name
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+        if cursor.fetchone()[0]:
+            return False
+
+        cursor.execute(
+            f"CREATE TABLE {quote(name)} (LIKE {quote(log_table())} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [default_partition()])
+        if cursor.fetchone()[0]:
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {quote(default_partition())} "
+                f"WHERE \"timestamp\" >= %s AND \"timestamp\" < %s RETURNING *) "
+                f"INSERT INTO {quote(name)} SELECT * FROM moved",
+                [start, end],
+            )
+        cursor.execute(
+            f"ALTER TABLE {quote(log_table())} ATTACH PARTITION {quote(name)} FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+    return True
+
+
+def ensure_partitions(months_ahead=3, since=None):
+    """
+    Creates the missing monthly partitions up to months_ahead months after the current month.
+
+    Parameters:
+        months_ahead (int): The number of future months to create partitions for.
+        since (datetime): The first month to create a partition for, defaults to the current month.
+
+    Returns:
+        list: The names of the created partitions.
+    """
+    if not is_partitioned():
+        return []
+
+    start = month_start(since or timezone.now())
+    last = add_months(month_start(timezone.now()), months_ahead)
+    created = []
+    while start <= last:
+        if create_partition(start):
+            created.append(partition_name(start))
+        start = add_months(start, 1)
+    return created
+
+
+def drop_partitions_before(cutoff, detach_only=False):
+    """
+    Removes the monthly partitions whose whole month is before cutoff.
+
+    Parameters:
+        cutoff (datetime): The oldest instant to keep.
+        detach_only (bool): Detach the partitions and keep them as standalone tables instead of dropping them.
+
+    Returns:
+        list: The names of the removed partitions.
+
+    Description:
+        This is the retention path: a whole month goes away with a DETACH and a DROP instead
+        of a row-by-row DELETE. The LogCount rows of the month are deleted first since their
+        foreign key to the partitioned Log table is not enforced by the database, and the
+        logs of the month are subtracted from the catalog and the log counters.
+        The rollups are kept, so the interval counts of removed months stay available.
+    """
+    if not is_partitioned():
+        return []
+
+    quote = connection.ops.quote_name
+    removed = []
+    for name, start, end in list_partitions():
+        if end > cutoff:
+            break
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT "logGroupName", "logStreamName", "owner", count(*) FROM {quote(name)} '
+                f'GROUP BY "logGroupName", "logStreamName", "owner"'
+            )
+            streams, counters = Counter(), Counter()
+            for group, stream, owner, count in cursor.fetchall():
+                streams[(group, stream)] += count
+                counters[(LogCounter.TOTAL, '')] -= count
+                counters[(LogCounter.OWNER, str(owner))] -= count
+            remove_from_catalog(streams)
+            apply_deltas(counters)
+            cursor.execute(
+                f"DELETE FROM {quote(LogCount._meta.db_table)} "
+                f"WHERE log_id IN (SELECT id FROM {quote(name)})"
+            )
+            cursor.execute(f"ALTER TABLE {quote(log_table())} DETACH PARTITION {quote(name)}")
+            if not detach_only:
+                cursor.execute(f"DROP TABLE {quote(name)}")
+        removed.append(name)
+    if removed:
+        invalidate()
+    return removed
+
+
+def ensure_partitions_after_migrate(sender, using=None, **kwargs):
+    """post_migrate receiver that keeps the upcoming monthly partitions in place."""
+    if using in (None, 'default'):
+        ensure_partitions()
@@ -0,0 +1,93 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import LogRollup
+
+GRANULARITIES = {
+    LogRollup.MINUTE: timedelta(minutes=1),
+    LogRollup.HOUR: timedelta(hours=1),
+    LogRollup.DAY: timedelta(days=1),
+}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+ROLLUP_COLUMNS = ('granularity', 'bucket', 'logGroupName', 'logStreamName', 'level', 'count')
+UPSERT_BATCH_SIZE = 1000
+
+
+def truncate(timestamp, granularity):
+    """
+    Truncates a timestamp to the start of its rollup bucket, in UTC.
+
+    Parameters:
+        timestamp (datetime): The timestamp, naive values are read in the current time zone.
+        granularity (str): One of the LogRollup granularities.
+
+    Returns:
+        datetime: The start of the bucket.
+    """
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    timestamp = timestamp.astimezone(dt_timezone.utc)
+    return timestamp - (timestamp - EPOCH) % GRANULARITIES[granularity]
+
+
+def update_rollups(logs, sign=1):
+    """
+    Adds logs to, or removes logs from, the minute, hour and day rollups.
+
+    Parameters:
+        logs (iterable): The Log objects.
+        sign (int): 1 to count the logs, -1 to uncount them.
+
+    Description:
+        The changes are summed per bucket in Python and then applied with one
+        INSERT ... ON CONFLICT DO UPDATE statement per batch of buckets, so the
+        number of queries does not depend on the number of logs.
+    """
+    deltas = Counter()
+    for log in logs:
+        for granularity in GRANULARITIES:
+            key = (granularity, truncate(log.timestamp, granularity), log.logGroupName, log.logStreamName, log.level)
+            deltas[key] += sign
+
+    # Sorted so that concurrent writers lock the rollup rows in the same order and cannot deadlock
+    rows = [key + (delta,) for key, delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+
+    quote = connection.ops.quote_name
+    table = quote(LogRollup._meta.db_table)
+    columns = ', '.join(quote(column) for column in ROLLUP_COLUMNS)
+    conflict = ', '.join(quote(column) for column in ROLLUP_COLUMNS[:-1])
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {placeholders} '
+                f'ON CONFLICT ({conflict}) DO UPDATE SET "count" = {table}."count" + EXCLUDED."count"',
+                [value for row in batch for value in row],
+            )
+
+
+def pick_granularity(start_time, interval_delta):
+    """
+    Returns the coarsest rollup granularity whose buckets fit exactly in the given intervals.
+
+    Parameters:
+        start_time (datetime): The start of the first interval.
+        interval_delta (timedelta): The length of each interval.
+
+    Returns:
+        str: The granularity, or None if the intervals are not aligned to whole minutes.
+    """
+    for granularity in (LogRollup.DAY, LogRollup.HOUR, LogRollup.MINUTE):
+        size = GRANULARITIES[granularity]
+        if interval_delta % size == timedelta(0) and truncate(start_time, granularity) == start_time:
+            return granularity
+    return None
+
@@ -0,0 +1,126 @@
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+REPLICA_ALIASES = getattr(settings, 'CLOUDWATCH_REPLICA_DATABASES', [])
+# How long the reads of a user stay on the primary after the user wrote something,
+# should be above the replication lag
+PRIMARY_AFTER_WRITE_SECONDS = getattr(settings, 'CLOUDWATCH_PRIMARY_AFTER_WRITE_SECONDS', 10)
+CACHE_ALIAS = getattr(settings, 'CLOUDWATCH_CACHE_ALIAS', 'default')
+
+reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+
+def wrote_recently_key(user):
+    return f'cloudwatch:wrote:{user.pk}'
+
+
+def wrote_recently(user):
+    return user.is_authenticated and caches[CACHE_ALIAS].get(wrote_recently_key(user)) is not None
+
+
+def replica_reads(view):
+    """
+    Lets the ORM read from a replica database while a read-only view runs, see ReplicaRouter.
+
+    The decorator goes below the api_view decorator so that the user is known. Only GET requests
+    are routed, and a user who wrote something in the last CLOUDWATCH_PRIMARY_AFTER_WRITE_SECONDS
+    keeps reading from the primary so that they see their own writes. Works on async views too.
+    """
+    def use_replica(request):
+        return bool(REPLICA_ALIASES) and request.method == 'GET' and not wrote_recently(request.user)
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            token = reading_from_replica.set(use_replica(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                reading_from_replica.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = reading_from_replica.set(use_replica(request))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            reading_from_replica.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of the views decorated with replica_reads to one of the CLOUDWATCH_REPLICA_DATABASES,
+    chosen at random, and everything else to the default database.
+
+    Reads inside a transaction on the default database stay on it, so a view that writes
+    and reads back in a transaction sees its own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if reading_from_replica.get() and not connections['default'].in_atomic_block:
+            return random.choice(REPLICA_ALIASES)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same data as the default database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+def wrote_something(request, response):
+    """Returns whether a request may have written something: a successful request other than a read."""
+    return bool(REPLICA_ALIASES) and request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400
+
+
+def request_user(request):
+    """Returns the authenticated user of a request, or None."""
+    # The REST framework sets the user it authenticated on the Django request
+    user = getattr(request, 'user', None)
+    return user if user is not None and user.is_authenticated else None
+
+
+class PrimaryAfterWriteMiddleware:
+    """
+    Records the users who just wrote something, so that their reads stay on the primary for a while.
+
+    Works under WSGI and ASGI, without moving the async views to a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if wrote_something(request, response):
+            user = request_user(request)
+            if user is not None:
+                caches[CACHE_ALIAS].set(wrote_recently_key(user), True, PRIMARY_AFTER_WRITE_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if wrote_something(request, response):
+            # The user may still be the lazy one of AuthenticationMiddleware, which queries the database
+            user = await sync_to_async(request_user)(request)
+            if user is not None:
+                await caches[CACHE_ALIAS].aset(wrote_recently_key(user), True, PRIMARY_AFTER_WRITE_SECONDS)
+        return response
@@ -0,0 +1,68 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, Lookup
+
+from .models import Log
+
+SEARCH_CONFIG = 'simple'
+SEARCH_MODES = ('text', 'substring')
+MIN_SUBSTRING_LENGTH = 3
+
+
+class ILike(Lookup):
+    """
+    `field ILIKE pattern`, unlike icontains the column is not wrapped in UPPER(),
+    so the pg_trgm index on the column can be used. Used as a filter expression,
+    not registered on TextField, so the other text fields don't get the lookup.
+    """
+    lookup_name = 'ilike'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} ILIKE {rhs}', lhs_params + rhs_params
+
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_logs(query, mode='text', filters=None):
+    """
+    Searches the log messages with the full-text or the trigram index.
+
+    Parameters:
+        query (str): The search terms.
+        mode (str): 'text' for a ranked full-text search of the words in the query (web search syntax:
+                    quoted phrases, `or`, `-word`), 'substring' for a case-insensitive substring match.
+        filters (Q): Optional filter on the other Log fields, see build_log_filters.
+
+    Returns:
+        QuerySet: The matching logs, best match first for 'text' and newest first for 'substring'.
+
+    Raises:
+        ValueError: If the mode is invalid or the query is too short for a substring search.
+
+    Description:
+        Words are indexed as they appear, so dotted names such as
+        `o.e.c.m.MetadataIndexTemplateService` are a single word for the full-text search;
+        use the substring mode to find part of them.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Invalid search mode. Valid options are {', '.join(repr(name) for name in SEARCH_MODES)}.")
+
+    logs = Log.objects.all()
+    if filters is not None:
+        logs = logs.filter(filters)
+
+    if mode == 'substring':
+        if len(query) < MIN_SUBSTRING_LENGTH:
+            raise ValueError(f"A substring search needs at least {MIN_SUBSTRING_LENGTH} characters.")
+        return logs.filter(ILike(F('message'), f'%{escape_like(query)}%')).order_by('-timestamp', '-id')
+
+    vector = SearchVector('message', config=SEARCH_CONFIG)
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    return (
+        logs.annotate(search=vector, rank=SearchRank(vector, search_query))
+        .filter(search=search_query)
+        .order_by('-rank', '-timestamp', '-id')
+    )
@@ -1,7 +1,97 @@
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from .metrics import TimedListSerializer, TimedSerializerMixin, timed_serialization
 from .models import Log
 
-class LogSerializer(serializers.ModelSerializer):
+class LogSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Log
-        fields = '__all__'
+        exclude = ['message_hash', 'template_id']
+        list_serializer_class = TimedListSerializer
+
+
+# Fields whose representation of a database value is the value itself
+PLAIN_FIELDS = (serializers.CharField, serializers.IntegerField)
+# The keyset pagination reads these from every row, see KeysetPagination.set_page
+PAGINATION_KEYS = ('timestamp', 'id')
+
+
+def log_fields(names=None):
+    """
+    Returns the fields of LogSerializer to represent, in the order LogSerializer outputs them.
+
+    Parameters:
+        names (str): Comma-separated names of the fields to keep, a sparse fieldset. All fields if empty.
+
+    Raises:
+        ValueError: If a name is not a field of LogSerializer.
+    """
+    fields = [field for field in LogSerializer().fields.values() if not field.write_only]
+    if not names:
+        return fields
+    selected = set(names.split(','))
+    unknown = selected.difference(field.field_name for field in fields)
+    if unknown:
+        raise ValueError(
+            f"Invalid fields {', '.join(sorted(unknown))}. "
+            f"Valid options are {', '.join(field.field_name for field in fields)}."
+        )
+    return [field for field in fields if field.field_name in selected]
+
+
+def log_rows(queryset, fields):
+    """
+    Returns the values of the fields for the logs of a queryset, without building model instances.
+
+    The rows are named tuples holding the fields in order, followed by the timestamp and id if they are
+    not among them, so that the rows can be paginated like Log objects.
+    """
+    sources = [field.source for field in fields]
+    return queryset.values_list(*sources, *(key for key in PAGINATION_KEYS if key not in sources), named=True)
+
+
+def converter(field):
+    """
+    Returns the function representing the database values of a field, or None if they are represented as they are.
+
+    DateTimeField looks up the current timezone for every value; here it is looked up once.
+    """
+    if type(field) in PLAIN_FIELDS:
+        return None
+    if type(field) is not serializers.DateTimeField:
+        return field.to_representation
+
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def represent_datetime(value):
+        if value.utcoffset() is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+    return represent_datetime
+
+
+def represent_logs(rows, fields):
+    """
+    Returns the representation of rows of log_rows, the same as LogSerializer(logs, many=True).data.
+
+    The conversions of the fields are looked up once, instead of once per row and field.
+    """
+    with timed_serialization():
+        names = [field.field_name for field in fields]
+        converters = [converter(field) for field in fields]
+        count = len(fields)
+        if not any(converters):
+            return [dict(zip(names, row[:count])) for row in rows]
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, convert, value in zip(names, converters, row[:count]):
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
@@ -0,0 +1,224 @@
+import csv
+import gzip
+import io
+import json
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+
+from .ingest import build_log, insert_logs, record_created
+from .models import Log, LogCount
+from .templates import miner
+from .utils import count_levels
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+EVENT_FIELDS = ('logGroupName', 'logStreamName', 'owner', 'timestamp', 'message', 'ingestionTime')
+LOG_COLUMNS = ('id',) + EVENT_FIELDS + ('level', 'message_hash', 'template_id')
+# CSV COPY reads an unquoted empty field as NULL, an empty string in these columns has to stay one
+LOG_TEXT_COLUMNS = tuple(
+    column for column in LOG_COLUMNS if isinstance(Log._meta.get_field(column), (models.CharField, models.TextField))
+)
+LOG_COUNT_COLUMNS = ('log_id', 'info_count', 'error_count', 'warn_count')
+STAGING_TABLE = 'cloudwatch_log_staging'
+
+
+def open_ndjson(fileobj, gzipped=False):
+    """
+    Returns an iterator over the raw lines of a newline-delimited JSON stream.
+
+    Parameters:
+        fileobj (file-like): A binary stream, for example the incoming HttpRequest.
+        gzipped (bool): Whether the stream is gzip compressed.
+
+    Returns:
+        iterator: The lines as bytes, decompressed incrementally when needed.
+    """
+    if gzipped:
+        fileobj = gzip.GzipFile(fileobj=fileobj, mode='rb')
+    return iter(fileobj.readline, b'')
+
+
+def clean_event(data):
+    """
+    Validates a single log event with the Log model fields.
+
+    Parameters:
+        data (dict): The decoded log event.
+
+    Returns:
+        dict: The cleaned values keyed by field name.
+
+    Raises:
+        ValidationError: If the event is not an object or a field is missing or invalid.
+    """
+    if not isinstance(data, dict):
+        raise ValidationError("Expected a JSON object.")
+
+    cleaned = {}
+    errors = {}
+    for name in EVENT_FIELDS:
+        if name not in data:
+            errors[name] = ["This field is required."]
+            continue
+        try:
+            cleaned[name] = Log._meta.get_field(name).clean(data[name], None)
+        except ValidationError as e:
+            errors[name] = e.messages
+    if errors:
+        raise ValidationError(errors)
+    return cleaned
+
+
+def parse_events(lines):
+    """
+    Decodes and validates newline-delimited JSON log events one line at a time.
+
+    Parameters:
+        lines (iterable): The raw lines of the stream.
+
+    Yields:
+        tuple: (line_number, cleaned_event, errors) where exactly one of cleaned_event and errors is set.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, clean_event(json.loads(line)), None
+        except ValueError as e:
+            yield line_number, None, [str(e)]
+        except ValidationError as e:
+            yield line_number, None, e.message_dict if hasattr(e, 'error_dict') else e.messages
+
+
+def copy_rows(cursor, table, columns, rows, not_null=()):
+    """
+    Loads rows into a table with PostgreSQL COPY.
+
+    Parameters:
+        cursor (CursorWrapper): A cursor on a PostgreSQL connection.
+        table (str): The table name.
+        columns (tuple): The column names, in the order of the row values.
+        rows (iterable): The rows to load.
+        not_null (tuple): The text columns whose empty values are empty strings rather than NULL.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    quote = connection.ops.quote_name
+    options = 'FORMAT csv'
+    if not_null:
+        options += ', FORCE_NOT_NULL ({})'.format(', '.join(quote(column) for column in not_null))
+    sql = 'COPY {} ({}) FROM STDIN WITH ({})'.format(
+        quote(table), ', '.join(quote(column) for column in columns), options,
+    )
+    if hasattr(cursor, 'copy_expert'):
+        cursor.copy_expert(sql, buffer)
+    else:
+        with cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def write_chunk(events):
+    """
+    Stores a chunk of cleaned log events together with their LogCount rows.
+
+    Parameters:
+        events (list): The cleaned log events.
+
+    Returns:
+        int: The number of stored logs, events that were already stored are skipped.
+
+    Description:
+        On PostgreSQL the ids are reserved from the Log sequence up front and the Log rows are
+        loaded with COPY into a temporary staging table, then moved into the Log table with
+        INSERT ... ON CONFLICT DO NOTHING so that events already stored are skipped.
+        The LogCount rows of the stored logs are loaded with COPY as well.
+        Other databases fall back to insert_logs and bulk_create.
+        The template ids and the derived tables are updated from the same chunk.
+    """
+    logs = [build_log(event) for event in events]
+
+    if connection.vendor != 'postgresql':
+        logs = insert_logs(logs)
+        LogCount.objects.bulk_create([LogCount(log=log, **count_levels(log.message)) for log in logs])
+        record_created(logs)
+        return len(logs)
+
+    miner.assign(logs)
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(column) for column in LOG_COLUMNS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+            [Log._meta.db_table, len(logs)],
+        )
+        for log, (log_id,) in zip(logs, cursor.fetchall()):
+            log.id = log_id
+
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {quote(STAGING_TABLE)} '
+            f'(LIKE {quote(Log._meta.db_table)} INCLUDING DEFAULTS) ON COMMIT DROP'
+        )
+        copy_rows(cursor, STAGING_TABLE, LOG_COLUMNS, (
+            [getattr(log, column) for column in LOG_COLUMNS] for log in logs
+        ), not_null=LOG_TEXT_COLUMNS)
+        cursor.execute(
+            f'INSERT INTO {quote(Log._meta.db_table)} ({columns}) '
+            f'SELECT {columns} FROM {quote(STAGING_TABLE)} ORDER BY "id" '
+            f'ON CONFLICT DO NOTHING RETURNING "id"'
+        )
+        stored = {row[0] for row in cursor.fetchall()}
+        cursor.execute(f'DROP TABLE {quote(STAGING_TABLE)}')
+
+        logs = [log for log in logs if log.id in stored]
+        copy_rows(cursor, LogCount._meta.db_table, LOG_COUNT_COLUMNS, (
+            [log.id] + list(count_levels(log.message).values()) for log in logs
+        ))
+    record_created(logs)
+    return len(logs)
+
+
+def load_ndjson(lines, chunk_size=CHUNK_SIZE):
+    """
+    Streams newline-delimited JSON log events into the Log table.
+
+    Parameters:
+        lines (iterable): The raw lines of the stream, see open_ndjson.
+        chunk_size (int): The number of events written per COPY and per transaction.
+
+    Returns:
+        dict: The number of loaded, duplicate and rejected events and the first rejected lines.
+
+    Description:
+        The stream is parsed incrementally and written in chunks, each chunk in its own
+        transaction, so memory use only depends on the chunk size and not on the payload size.
+        Events that are already stored are counted as duplicates and skipped, so an interrupted
+        load can be sent again.
+    """
+    summary = {'loaded': 0, 'duplicates': 0, 'rejected': 0, 'errors': []}
+    parsed = parse_events(lines)
+
+    while True:
+        batch = list(islice(parsed, chunk_size))
+        if not batch:
+            break
+
+        chunk = []
+        for line_number, event, errors in batch:
+            if errors is None:
+                chunk.append(event)
+                continue
+            summary['rejected'] += 1
+            if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                summary['errors'].append({'line': line_number, 'errors': errors})
+
+        if chunk:
+            with transaction.atomic():
+                loaded = write_chunk(chunk)
+            summary['loaded'] += loaded
+            summary['duplicates'] += len(chunk) - loaded
+
+    return summary
@@ -0,0 +1,144 @@
+"""
+Generates realistic synthetic log events, to load test data sets of any size.
+"""
+import random
+from datetime import timedelta
+
+from django.utils import timezone
+
+# Message templates per level, in the format of the Elasticsearch logs of cloudwatch.logs.save_log.
+# The {placeholders} are filled with random values for every event.
+MESSAGE_TEMPLATES = {
+    'INFO': (
+        "[INFO ][o.e.c.m.MetadataIndexTemplateService] [{node}] updating index template [{index}-index-template] "
+        "for index patterns [.internal.{index}-*]",
+        "[INFO ][o.e.c.m.MetadataCreateIndexService] [{node}] creating index [{index}-{day}], "
+        "cause [auto(bulk api)], shards [1]/[1]",
+        "[INFO ][o.e.c.r.a.AllocationService] [{node}] current.health=\"GREEN\" previous.health=\"YELLOW\" "
+        "reason=\"shards started [[{index}-{day}][0]]\"",
+        "[INFO ][o.e.h.AbstractHttpServerTransport] [{node}] GET /{index}/_search took [{millis}ms] "
+        "from [{ip}]",
+        "[INFO ][o.e.x.i.IndexLifecycleTransition] [{node}] moving index [{index}-{day}] from [hot] to [warm] "
+        "in policy [{index}-policy]",
+    ),
+    'WARN': (
+        "[WARN ][o.e.c.r.a.DiskThresholdMonitor] [{node}] high disk watermark [90%] exceeded on [{node}] "
+        "free: {free}gb[{percent}%], shards will be relocated away from this node",
+        "[WARN ][o.e.m.j.JvmGcMonitorService] [{node}] [gc][{count}] overhead, spent [{millis}ms] collecting "
+        "in the last [1s]",
+        "[WARN ][o.e.t.TransportService] [{node}] Received response for a request that has timed out, "
+        "sent [{millis}ms] ago, timed out [{count}ms] ago, action [indices:data/read/search], node [{ip}]",
+    ),
+    'ERROR': (
+        "[ERROR ][o.e.b.ElasticsearchUncaughtExceptionHandler] [{node}] fatal error in thread [{thread}], "
+        "exiting java.lang.OutOfMemoryError: Java heap space",
+        "[ERROR ][o.e.x.s.a.AuthenticationService] [{node}] authentication of user [{user}] from [{ip}] failed "
+        "after [{count}] attempts",
+        "[ERROR ][o.e.a.b.TransportShardBulkAction] [{node}] [{index}-{day}][0] failed to execute bulk item "
+        "(index) index {{[{index}-{day}][_doc][{count}]}}",
+    ),
+}
+
+DEFAULT_LEVEL_MIX = {'INFO': 80, 'WARN': 15, 'ERROR': 5}
+
+INDICES = ('.alerts-observability.logs', '.alerts-observability.uptime', '.alerts-ml.anomaly-detection',
+           '.kibana-event-log', 'metrics-system.cpu', 'logs-nginx.access', 'traces-apm')
+THREADS = ('elasticsearch[write][T#1]', 'elasticsearch[search][T#3]', 'elasticsearch[management][T#2]')
+USERS = ('elastic', 'kibana_system', 'logstash_writer', 'beats_system', 'apm_system')
+
+
+def parse_level_mix(value):
+    """
+    Parses a level mix such as "INFO=80,WARN=15,ERROR=5" into weights per level.
+
+    Raises:
+        ValueError: If a level is unknown or a weight is not a non-negative number.
+    """
+    mix = {}
+    for part in value.split(','):
+        level, _, weight = part.partition('=')
+        level = level.strip().upper()
+        if level not in MESSAGE_TEMPLATES:
+            raise ValueError(f"Unknown level '{level}', expected one of {', '.join(MESSAGE_TEMPLATES)}.")
+        mix[level] = float(weight)
+        if mix[level] < 0:
+            raise ValueError(f"The weight of {level} must not be negative.")
+    if not any(mix.values()):
+        raise ValueError("At least one level must have a positive weight.")
+    return mix
+
+
+class LogGenerator:
+    """
+    Produces log events spread over log groups, streams and time, with a given mix of levels.
+
+    The events are the cleaned values of the Log fields, as accepted by stream.write_chunk, and
+    are produced in timestamp order. Stream activity is skewed: a few streams of every group
+    produce most of the events, like in real deployments. With the same seed the same events
+    are produced.
+    """
+
+    def __init__(self, owner, groups=10, streams_per_group=5, level_mix=None, start=None, end=None, seed=None):
+        self.owner = owner
+        self.end = end or timezone.now()
+        self.start = start or self.end - timedelta(days=30)
+        if self.start >= self.end:
+            raise ValueError("The start of the time range must be before its end.")
+        self.random = random.Random(seed)
+        self.streams = [
+            (f'benchmark-group-{group:03d}', f'benchmark-group-{group:03d}-stream-{stream:03d}')
+            for group in range(groups) for stream in range(streams_per_group)
+        ]
+        if not self.streams:
+            raise ValueError("At least one log group and one log stream are needed.")
+        self.stream_weights = [1 / (rank + 1) for rank in range(len(self.streams))]
+        self.random.shuffle(self.stream_weights)
+        mix = level_mix or DEFAULT_LEVEL_MIX
+        self.levels = list(mix)
+        self.level_weights = [mix[level] for level in self.levels]
+        self.nodes = [f'node-{number:02d}' for number in range(max(3, groups))]
+
+    def message(self, level, timestamp):
+        template = self.random.choice(MESSAGE_TEMPLATES[level])
+        randint = self.random.randint
+        return template.format(
+            node=self.random.choice(self.nodes),
+            index=self.random.choice(INDICES),
+            day=timestamp.strftime('%Y.%m.%d'),
+            millis=randint(1, 30000),
+            count=randint(1, 100000),
+            free=randint(1, 50),
+            percent=randint(1, 10),
+            ip=f'10.{randint(0, 255)}.{randint(0, 255)}.{randint(1, 254)}',
+            thread=self.random.choice(THREADS),
+            user=self.random.choice(USERS),
+        )
+
+    def events(self, count):
+        """
+        Yields count log events with timestamps spread evenly over the time range, with some jitter.
+
+        Parameters:
+            count (int): The number of events.
+
+        Yields:
+            dict: The values of the logGroupName, logStreamName, owner, timestamp, message and ingestionTime fields.
+        """
+        step = (self.end - self.start) / max(count, 1)
+        jitter = step.total_seconds() * 1000
+        streams = self.random.choices(self.streams, weights=self.stream_weights, k=min(count, 100000))
+        levels = self.random.choices(self.levels, weights=self.level_weights, k=min(count, 100000))
+
+        for number in range(count):
+            timestamp = self.start + step * number + timedelta(milliseconds=self.random.uniform(0, jitter))
+            group, stream = streams[number % len(streams)]
+            level = levels[number % len(levels)]
+            yield {
+                'logGroupName': group,
+                'logStreamName': stream,
+                'owner': self.owner,
+                'timestamp': timestamp,
+                'message': self.message(level, timestamp),
+                # Delivered a little after the event happened
+                'ingestionTime': int(timestamp.timestamp() * 1000) + self.random.randint(50, 5000),
+            }
@@ -0,0 +1,239 @@
+"""
+Live tail of the new logs, pushed to the subscribers of the live_tail endpoint as Server-Sent Events.
+
+On PostgreSQL the ingest paths send the ids of the stored logs with NOTIFY in the transaction that
+stores them, so every process serving the endpoint hears about the logs of every worker and of the
+import commands once they are committed. One listener thread per process fetches the new logs once
+and fans them out to the subscribers of the process. On other databases the logs are published
+in process when the transaction commits.
+
+Every subscriber has a bounded buffer. A subscriber that does not read its events fast enough is
+dropped when its buffer is full, the ingest paths never wait for the subscribers.
+
+The live tail is off unless CLOUDWATCH_LIVE_TAIL is set: the ingest paths cannot know whether a
+process of another server listens, so once on they announce every log.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections, transaction
+
+from .renderers import ORJSONRenderer
+
+logger = logging.getLogger(__name__)
+
+LIVE_TAIL = getattr(settings, 'CLOUDWATCH_LIVE_TAIL', False)
+TAIL_BUFFER_SIZE = getattr(settings, 'CLOUDWATCH_TAIL_BUFFER_SIZE', 1000)
+CHANNEL = 'cloudwatch_logs'
+# A NOTIFY payload is limited to 8000 bytes
+NOTIFY_IDS = 500
+# A comment is sent to idle subscribers this often, so that proxies keep the connection open
+HEARTBEAT_SECONDS = 15
+RECONNECT_SECONDS = 5
+
+
+def publish_created(logs):
+    """
+    Announces stored logs to the live tail subscribers once the current transaction commits.
+
+    Parameters:
+        logs (list): The stored Log objects.
+    """
+    if not LIVE_TAIL or not logs:
+        return
+    if connection.vendor != 'postgresql':
+        transaction.on_commit(lambda: broker.publish(logs))
+        return
+
+    ids = [log.id for log in logs]
+    payloads = [
+        json.dumps({
+            'ids': ids[start:start + NOTIFY_IDS],
+            # The time range lets the listener skip the partitions that cannot hold the logs
+            'first': min(log.timestamp for log in logs[start:start + NOTIFY_IDS]).isoformat(),
+            'last': max(log.timestamp for log in logs[start:start + NOTIFY_IDS]).isoformat(),
+        }, separators=(',', ':'))
+        for start in range(0, len(ids), NOTIFY_IDS)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload', [CHANNEL, payloads])
+
+
+def fetch_logs(payloads):
+    """Returns the logs announced by NOTIFY payloads, in id order."""
+    from .models import Log
+
+    logs = []
+    for payload in payloads:
+        notice = json.loads(payload)
+        logs.extend(Log.objects.filter(id__in=notice['ids'], timestamp__range=(notice['first'], notice['last'])))
+    return sorted(logs, key=lambda log: log.id)
+
+
+def parse_filters(params):
+    """
+    Returns the filters of a live tail subscription.
+
+    Parameters:
+        params (QueryDict): logGroupName, logStreamName and level, a comma-separated list of levels.
+
+    Returns:
+        dict: The filters, a missing filter matches every log.
+    """
+    levels = params.get('level')
+    return {
+        'logGroupName': params.get('logGroupName') or None,
+        'logStreamName': params.get('logStreamName') or None,
+        'levels': {level.strip().upper() for level in levels.split(',')} if levels else None,
+    }
+
+
+def event_frame(log, data):
+    """Returns the Server-Sent Event of a log."""
+    return f'id: {log.id}\nevent: log\ndata: {ORJSONRenderer().render(data).decode()}\n\n'.encode()
+
+
+class Subscriber:
+    """A live tail client: its filters and the events waiting to be sent to it."""
+
+    def __init__(self, filters, buffer_size=TAIL_BUFFER_SIZE):
+        self.filters = filters
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = False
+
+    def matches(self, log):
+        filters = self.filters
+        return (
+            (filters['logGroupName'] is None or log.logGroupName == filters['logGroupName'])
+            and (filters['logStreamName'] is None or log.logStreamName == filters['logStreamName'])
+            and (filters['levels'] is None or log.level in filters['levels'])
+        )
+
+    async def events(self):
+        """Yields the events of the subscriber, with a heartbeat comment when it is idle."""
+        while True:
+            try:
+                frame = await asyncio.wait_for(self.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield b': heartbeat\n\n'
+                continue
+            if self.dropped:
+                break
+            yield frame
+        yield b'event: dropped\ndata: {"detail": "The client did not keep up with the new logs."}\n\n'
+
+
+class Broker:
+    """
+    Fans the new logs out to the subscribers of this process.
+
+    publish() can be called from any thread: it serializes every log once, selects the events of
+    every subscriber and hands them to the event loop of the subscriber.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.listener = None
+        self.stats = {'published': 0, 'dropped': 0}
+
+    def subscribe(self, filters):
+        """Registers a subscriber, must be called from the event loop that serves it."""
+        subscriber = Subscriber(filters)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            if connections[DEFAULT_DB_ALIAS].vendor == 'postgresql' and self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name='cloudwatch-tail', daemon=True)
+                self.listener.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, logs):
+        from .serializers import LogSerializer
+
+        with self.lock:
+            subscribers = list(self.subscribers)
+            self.stats['published'] += len(logs)
+        if not subscribers or not logs:
+            return
+
+        frames = [(log, event_frame(log, data)) for log, data in zip(logs, LogSerializer(logs, many=True).data)]
+        for subscriber in subscribers:
+            selected = [frame for log, frame in frames if subscriber.matches(log)]
+            if not selected:
+                continue
+            try:
+                subscriber.loop.call_soon_threadsafe(self.deliver, subscriber, selected)
+            except RuntimeError:
+                # The event loop of the subscriber is closed
+                self.unsubscribe(subscriber)
+
+    def deliver(self, subscriber, frames):
+        """Queues events for a subscriber, runs in the event loop of the subscriber."""
+        if subscriber.dropped:
+            return
+        for frame in frames:
+            try:
+                subscriber.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                subscriber.dropped = True
+                self.unsubscribe(subscriber)
+                with self.lock:
+                    self.stats['dropped'] += 1
+                logger.warning("Dropped a live tail subscriber that did not keep up",
+                               extra={'buffer_size': subscriber.queue.maxsize})
+                return
+
+    def metrics(self):
+        with self.lock:
+            return {'subscribers': len(self.subscribers), **self.stats}
+
+    def listen(self):
+        """Runs in the listener thread: publishes the logs announced with NOTIFY, reconnecting on errors."""
+        while True:
+            try:
+                self.listen_once()
+            except Exception:
+                logger.exception("The live tail listener lost its connection, reconnecting")
+                time.sleep(RECONNECT_SECONDS)
+
+    def listen_once(self):
+        # A connection of its own, outside of Django's connection handling and pooling, stays subscribed
+        wrapper = connections[DEFAULT_DB_ALIAS]
+        listening = wrapper.Database.connect(**wrapper.get_connection_params())
+        listening.autocommit = True
+        try:
+            with listening.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            while True:
+                payloads = wait_for_notifies(listening, HEARTBEAT_SECONDS)
+                if payloads:
+                    close_old_connections()
+                    self.publish(fetch_logs(payloads))
+        finally:
+            listening.close()
+
+
+def wait_for_notifies(listening, timeout):
+    """Returns the payloads of the notifications received within timeout seconds."""
+    if hasattr(listening, 'poll'):
+        # psycopg2
+        if select.select([listening], [], [], timeout)[0]:
+            listening.poll()
+            notifies, listening.notifies[:] = list(listening.notifies), []
+            return [notify.payload for notify in notifies]
+        return []
+    # psycopg 3
+    return [notify.payload for notify in listening.notifies(timeout=timeout, stop_after=NOTIFY_IDS)]
+
+
+broker = Broker()
@@ -0,0 +1,313 @@
+"""
+Online extraction of message templates, in the way of Drain (He et al., "Drain: An Online Log Parsing
+Approach with Fixed Depth Tree", ICWS 2017).
+
+Every message is split on whitespace. Tokens that are obviously variable (numbers, addresses,
+identifiers) are replaced with a wildcard, then the message is routed through a tree of fixed depth,
+by its number of tokens and its first tokens, to a few candidate templates. The most similar candidate
+takes the message if enough of their tokens are equal, and the tokens where they differ become
+wildcards. Otherwise the message starts a new template.
+
+A log stores the id of its template in Log.template_id and the templates are stored once per text
+in the LogTemplate table, when the first log of a text is stored, so counts per template group on an
+integer column. The parameters of a log
+are the tokens of its message at the wildcards of its template, see extract_params.
+"""
+import re
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.expressions import RawSQL
+
+from .utils import hash_message
+
+WILDCARD = '<*>'
+# Depth of the tree: the number of tokens is the first level, the next DEPTH - 2 tokens the next ones
+DEPTH = getattr(settings, 'CLOUDWATCH_TEMPLATE_DEPTH', 4)
+# Share of equal tokens a message needs to join a template
+SIMILARITY = getattr(settings, 'CLOUDWATCH_TEMPLATE_SIMILARITY', 0.5)
+MAX_CHILDREN = 100
+
+MASKS = (
+    re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.IGNORECASE),
+    re.compile(r'\d{1,3}(\.\d{1,3}){3}(:\d+)?'),
+    re.compile(r'0x[0-9a-f]+', re.IGNORECASE),
+    re.compile(r'[-+]?\d+([.,:/-]\d+)*[a-z%]*', re.IGNORECASE),
+)
+HAS_DIGIT = re.compile(r'\d')
+
+
+def tokenize(message):
+    """Returns the tokens of a message, with the obviously variable tokens replaced with the wildcard."""
+    return [
+        WILDCARD if any(mask.fullmatch(token) for mask in MASKS) else token
+        for token in message.split()
+    ]
+
+
+def extract_params(template, message):
+    """
+    Returns the parameters of a message: its tokens at the wildcards of its template.
+
+    Returns:
+        list: The parameters, or None if the message does not have the tokens of the template.
+    """
+    tokens = message.split()
+    pattern = template.split()
+    if len(tokens) != len(pattern):
+        return None
+    return [token for token, expected in zip(tokens, pattern) if expected == WILDCARD]
+
+
+def similarity(template, tokens):
+    """Returns the share of equal tokens and the number of wildcards of a template, compared by the first."""
+    if not tokens:
+        return 1.0, 0
+    equal = sum(1 for expected, token in zip(template, tokens) if expected == token and expected != WILDCARD)
+    return equal / len(tokens), template.count(WILDCARD)
+
+
+class Template:
+    __slots__ = ('tokens',)
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    @property
+    def text(self):
+        return ' '.join(self.tokens)
+
+
+class TemplateMiner:
+    """
+    Assigns messages to templates, see the module documentation.
+
+    The templates are loaded from the LogTemplate table on first use, so that the processes
+    share the templates that are already stored. Matching only changes the templates in memory:
+    match returns the text of the template of a message, and assign stores the texts and sets
+    the template ids of logs in the transaction that stores them.
+
+    A template text is stored once and never changes, its id comes from an upsert on the text so
+    every process gets the same id for the same text. When a template is generalized, the stored
+    row of its previous text is linked to the row of the new text with LogTemplate.general, so the
+    logs matched before are counted with the new text, see general_templates.
+    """
+
+    def __init__(self, depth=DEPTH, similarity=SIMILARITY, max_children=MAX_CHILDREN):
+        self.depth = depth
+        self.similarity = similarity
+        self.max_children = max_children
+        self.tree = {}
+        # Committed template texts mapped to their id
+        self.ids = {}
+        # Template texts mapped to the text they were generalized into
+        self.generalized = {}
+        # The generalizations whose link is not committed yet
+        self.unlinked = {}
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def load(self):
+        from .models import LogTemplate
+
+        rows = list(LogTemplate.objects.values_list('id', 'template', 'general_id').order_by('id'))
+        with self.lock:
+            if self.loaded:
+                return
+            for template_id, text, general_id in rows:
+                self.ids[text] = template_id
+                # New messages join the general templates, the ones they replaced only keep their logs
+                if general_id is None:
+                    self.leaf(text.split()).append(Template(text.split()))
+            self.loaded = True
+
+    def leaf(self, tokens):
+        """Returns the list of the candidate templates of the tokens, creating the branch if needed."""
+        node = self.tree.setdefault(len(tokens), {})
+        for token in tokens[:self.depth - 2]:
+            key = WILDCARD if HAS_DIGIT.search(token) else token
+            if key not in node and len(node) >= self.max_children:
+                key = WILDCARD
+            node = node.setdefault(key, {})
+        # Tokens are never empty, the empty key holds the templates
+        return node.setdefault('', [])
+
+    def match(self, message):
+        """
+        Returns the text of the template of a message, creating or generalizing the template if needed.
+
+        Nothing is written to the database, see assign.
+        """
+        if not self.loaded:
+            self.load()
+        tokens = tokenize(message)
+        with self.lock:
+            candidates = self.leaf(tokens)
+            best, best_score = None, (-1.0, -1)
+            for candidate in candidates:
+                score = similarity(candidate.tokens, tokens)
+                if score > best_score:
+                    best, best_score = candidate, score
+
+            if best is None or best_score[0] < self.similarity:
+                candidates.append(Template(tokens))
+                return ' '.join(tokens)
+
+            previous = best.text
+            best.tokens = [expected if expected == token else WILDCARD for expected, token in zip(best.tokens, tokens)]
+            text = best.text
+            if text != previous:
+                self.generalized[previous] = text
+                self.unlinked[previous] = text
+            return text
+
+    def assign(self, logs):
+        """
+        Sets the template_id of logs from their template_text, see match, storing the texts that are not stored.
+
+        Runs in the transaction that stores the logs: the templates of logs that are rejected or never
+        written are not stored, and a rollback removes the templates together with the logs.
+        """
+        ids = self.store({log.template_text for log in logs if log.template_text is not None})
+        for log in logs:
+            log.template_id = ids.get(log.template_text)
+
+    def store(self, texts):
+        """
+        Returns template texts mapped to their id, storing the texts and the generalizations that are not stored.
+
+        The ids become known to the process when the transaction commits. The queries run outside the lock.
+        """
+        from .models import LogTemplate
+
+        with self.lock:
+            missing = set()
+            pending = list(texts)
+            while pending:
+                text = pending.pop()
+                if text in self.ids or text in missing:
+                    continue
+                missing.add(text)
+                # A text is stored with the texts it was generalized into, to be linked to them
+                if text in self.generalized:
+                    pending.append(self.generalized[text])
+            # A generalization is linked once its new text is stored, the previous text may be stored by any process
+            links = {text: general for text, general in self.unlinked.items() if general in missing or general in self.ids}
+            links.update((text, self.generalized[text]) for text in missing if text in self.generalized)
+            ids = {text: self.ids[text] for text in set(texts) | set(links.values()) if text in self.ids}
+
+        quote = connection.ops.quote_name
+        table = quote(LogTemplate._meta.db_table)
+        stored = {}
+        with connection.cursor() as cursor:
+            if missing:
+                # Sorted so that concurrent writers lock the new texts in the same order and cannot deadlock
+                rows = sorted((hash_message(text), text, len(text.split())) for text in missing)
+                cursor.execute(
+                    f'INSERT INTO {table} ("template_hash", "template", "token_count") '
+                    f'VALUES {", ".join(["(%s, %s, %s)"] * len(rows))} '
+                    f'ON CONFLICT ("template_hash") DO UPDATE SET "template_hash" = EXCLUDED."template_hash" '
+                    f'RETURNING "template_hash", "id"',
+                    [value for row in rows for value in row],
+                )
+                hashes = dict(cursor.fetchall())
+                stored = {text: hashes[hash_message(text)] for text in missing}
+                ids.update(stored)
+            if links:
+                # A text keeps the first generalization stored for it, texts that are not stored are skipped
+                rows = sorted((hash_message(text), ids[general]) for text, general in links.items())
+                cursor.execute(
+                    f'UPDATE {table} SET "general_id" = linked.general_id '
+                    f'FROM (VALUES {", ".join(["(%s, %s)"] * len(rows))}) AS linked (template_hash, general_id) '
+                    f'WHERE {table}."template_hash" = linked.template_hash AND {table}."general_id" IS NULL',
+                    [value for row in rows for value in row],
+                )
+
+        def committed():
+            with self.lock:
+                self.ids.update(stored)
+                for text, general in links.items():
+                    if self.unlinked.get(text) == general:
+                        del self.unlinked[text]
+
+        transaction.on_commit(committed)
+        return ids
+
+
+def general_templates(template_ids):
+    """
+    Maps template ids to the id of the most general template they were generalized into, or to themselves.
+
+    The links are followed one level per query, a template is generalized at most once per token.
+    """
+    from .models import LogTemplate
+
+    links = {}
+    pending = set(template_ids)
+    while pending:
+        rows = LogTemplate.objects.filter(id__in=pending, general_id__isnull=False).values_list('id', 'general_id')
+        links.update(rows)
+        pending = {general_id for _, general_id in rows if general_id not in links}
+
+    general = {}
+    for template_id in template_ids:
+        seen = {template_id}
+        target = template_id
+        while target in links and links[target] not in seen:
+            target = links[target]
+            seen.add(target)
+        general[template_id] = target
+    return general
+
+
+def template_family(template_id):
+    """
+    Returns a subquery of the id of a template and of the ids of the templates generalized into it,
+    the template ids of its logs. It is filtered with Log.template_id__in.
+    """
+    from .models import LogTemplate
+
+    table = connection.ops.quote_name(LogTemplate._meta.db_table)
+    return RawSQL(
+        f'WITH RECURSIVE family ("id") AS (SELECT %s::bigint UNION '
+        f'SELECT {table}."id" FROM {table} JOIN family ON {table}."general_id" = family."id") '
+        f'SELECT "id" FROM family',
+        [template_id],
+    )
+
+
+def top_templates(logs, limit):
+    """
+    Counts the logs of a queryset per template, grouping on Log.template_id.
+
+    Parameters:
+        logs (QuerySet): The logs to count.
+        limit (int): The number of templates to return.
+
+    Returns:
+        list: The templates with the most logs first, each with its id, its text and its count. The logs
+              of the templates that were generalized are counted with the general one, see general_templates.
+    """
+    from .models import LogTemplate
+
+    counts = dict(
+        logs.exclude(template_id=None).values('template_id').annotate(count=Count('id'))
+        .order_by().values_list('template_id', 'count')
+    )
+    general = general_templates(counts)
+    totals = Counter()
+    for template_id, count in counts.items():
+        totals[general[template_id]] += count
+
+    texts = dict(LogTemplate.objects.filter(id__in=totals).values_list('id', 'template'))
+    templates = [
+        {'template_id': template_id, 'template': texts[template_id], 'count': count}
+        for template_id, count in totals.items() if template_id in texts
+    ]
+    return sorted(templates, key=lambda template: (-template['count'], template['template_id']))[:limit]
+
+
+miner = TemplateMiner()
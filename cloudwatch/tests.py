@@ -1,3 +1,1247 @@
-from django.test import TestCase
+"""
+Tests of the cloudwatch app. They need PostgreSQL: the Log table is partitioned and the search and
+EXPLAIN tests use its indexes.
+"""
+import asyncio
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Count
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.http import HttpResponse, QueryDict, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from authapis.models import User
+
+from .cache import cache_stats, invalidate
+from .compression import ENCODINGS, CompressionMiddleware, negotiate
+from .counters import exact_count
+from .histogram import histogram
+from .ingest import build_log
+from .metrics import UNMATCHED_VIEW, MetricsMiddleware
+from .models import Log, LogCount, LogGroup, LogRollup, LogStream, LogTemplate
+from .pagination import KeysetPagination
+from .partitions import (
+    add_months, create_partition, drop_partitions_before, list_partitions, month_start, partition_name,
+)
+from .renderers import ORJSONRenderer
+from .routers import PrimaryAfterWriteMiddleware, wrote_recently_key
+from .serializers import LogSerializer, log_fields, log_rows, represent_logs
+from .stream import write_chunk
+from .tail import Broker, Subscriber, parse_filters, publish_created
+from .templates import TemplateMiner
+from .writer import BatchWriter
+
+SEEDED_LOGS = 200000
+SEEDED_DAYS = 90
+GROUPS = 20
+STREAMS_PER_GROUP = 10
+OWNERS = 50
+# A partition with fewer rows is small enough to be scanned sequentially
+LARGE_PARTITION_ROWS = 10000
+
+# The query shapes the Log indexes are designed for, see the Log model and migration 0012
+ENDPOINTS = [
+    '/api/cloudwatch/recent-logs/',
+    '/api/cloudwatch/filter-logs/?logGroupName=group-3&page_size=50',
+    '/api/cloudwatch/filter-logs/?logGroupName=group-3&logStreamName=group-3-stream-7&page_size=50',
+    '/api/cloudwatch/filter-logs/?logGroupName=group-3&logStreamName=group-3-stream-7&period=last_week',
+    '/api/cloudwatch/filter-logs/?securityinfo=ERROR&page_size=50',
+    '/api/cloudwatch/filter-logs/?period=last_day&page_size=50',
+    '/api/cloudwatch/logs/?period=last_day',
+    '/api/cloudwatch/total-logs-count/?period=last_day',
+    '/api/cloudwatch/total-logs-count/?owner=7&period=last_week',
+    '/api/cloudwatch/search/?q=user-42',
+    '/api/cloudwatch/async/recent-logs/',
+    '/api/cloudwatch/async/filter-logs/?logGroupName=group-3&logStreamName=group-3-stream-7&page_size=50',
+]
+
+
+def authenticated_client(username):
+    """Returns a client authenticated with the token of a new user, and the user."""
+    user = User.objects.create_user(username=username, password=f'{username}-password')
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+    return client, user
+
+
+def log_event(i=0, **fields):
+    """
+    Returns the i-th cleaned log event of a series, as build_log and write_chunk take it, the given fields
+    replacing the defaults. The events of a series have distinct identities.
+    """
+    return dict({
+        'logGroupName': 'test-group', 'logStreamName': 'stream-1', 'owner': 1,
+        'timestamp': datetime(2026, 10, 1, 12, tzinfo=timezone.utc),
+        'message': f'[INFO ] request {i} done', 'ingestionTime': i,
+    }, **fields)
+
+
+def store_events(*events, **fields):
+    """
+    Stores a series of log events with write_chunk: each event is given by the fields it varies,
+    see log_event, and fields are shared by all of them. Returns the number of stored logs.
+    """
+    return write_chunk([log_event(i, **dict(fields, **event)) for i, event in enumerate(events)])
+
+
+def seed_logs(count):
+    """Inserts count logs spread evenly over the last SEEDED_DAYS days, in GROUPS groups of STREAMS_PER_GROUP streams."""
+    table = connection.ops.quote_name(Log._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            INSERT INTO {table} ("logGroupName", "logStreamName", "owner", "timestamp", "message",
+                                 "ingestionTime", "level", "message_hash", "template_id")
+            SELECT 'group-' || (i %% %(groups)s),
+                   'group-' || (i %% %(groups)s) || '-stream-' || (i / %(groups)s %% %(streams)s),
+                   i %% %(owners)s + 1,
+                   moment,
+                   message,
+                   (extract(epoch FROM moment) * 1000)::bigint,
+                   level,
+                   md5(message),
+                   i %% 30
+            FROM (
+                SELECT i,
+                       now() - (i * interval '1 day' * %(days)s / %(count)s) AS moment,
+                       CASE WHEN i %% 20 = 0 THEN 'ERROR' WHEN i %% 10 = 1 THEN 'WARN' ELSE 'INFO' END AS level,
+                       '[' || CASE WHEN i %% 20 = 0 THEN 'ERROR' WHEN i %% 10 = 1 THEN 'WARN' ELSE 'INFO' END
+                           || ' ] request ' || i || ' of user-' || (i %% 1000) || ' done' AS message
+                FROM generate_series(1, %(count)s) AS i
+            ) AS seeded
+            ''',
+            {'count': count, 'days': SEEDED_DAYS, 'groups': GROUPS, 'streams': STREAMS_PER_GROUP, 'owners': OWNERS},
+        )
+        cursor.execute(f'ANALYZE {table}')
+
+
+def partition_sizes():
+    """Returns the partitions of the Log table mapped to their number of rows."""
+    table = connection.ops.quote_name(Log._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT tableoid::regclass::text, count(*) FROM {table} GROUP BY 1')
+        return dict(cursor.fetchall())
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+class LogIndexExplainTests(TestCase):
+    """
+    EXPLAIN regression tests: the queries of the listing endpoints must keep using the Log indexes.
+
+    The Log table is seeded with enough rows for the planner to prefer its indexes, then every endpoint
+    is requested and the plan of each of its Log queries is checked for a sequential scan of a large
+    partition. Small partitions may be scanned sequentially, which is what the planner should do.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_logs(SEEDED_LOGS)
+        cls.large_partitions = {
+            name for name, rows in partition_sizes().items() if rows >= LARGE_PARTITION_ROWS
+        }
+        cls.user = User.objects.create_user(username='explain', password='explain-password')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            return cursor.fetchone()[0][0]['Plan']
+
+    def sequential_scans(self, plan):
+        return [
+            node['Relation Name'] for node in plan_nodes(plan)
+            if node['Node Type'] == 'Seq Scan' and node['Relation Name'] in self.large_partitions
+        ]
+
+    def log_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content[:200])
+        return [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and f'"{Log._meta.db_table}"' in query['sql']
+        ]
+
+    def test_seeded_table_is_large(self):
+        self.assertTrue(self.large_partitions)
+
+    def test_endpoints_do_not_scan_large_partitions_sequentially(self):
+        for url in ENDPOINTS:
+            with self.subTest(url=url):
+                queries = self.log_queries(url)
+                self.assertTrue(queries, "The endpoint ran no Log query")
+                for sql in queries:
+                    plan = self.explain(sql)
+                    scanned = self.sequential_scans(plan)
+                    self.assertFalse(scanned, f"Sequential scan of {scanned} for\n{sql}\n{json.dumps(plan, indent=2)}")
+
+    def test_keyset_pages_use_the_indexes(self):
+        response = self.client.get('/api/cloudwatch/filter-logs/?logGroupName=group-3&page_size=50')
+        next_url = response.json()['next']
+        self.assertIsNotNone(next_url)
+        for sql in self.log_queries(next_url):
+            plan = self.explain(sql)
+            self.assertFalse(self.sequential_scans(plan), f"{sql}\n{json.dumps(plan, indent=2)}")
+
+
+class PartitionTests(TestCase):
+
+    def setUp(self):
+        self.january = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        # No partition holds these months, the logs land in the default partition
+        store_events(*(
+            {'logStreamName': stream, 'owner': owner, 'timestamp': moment}
+            for stream, owner, moment in [
+                ('stream-1', 1, datetime(2025, 1, 10, tzinfo=timezone.utc)),
+                ('stream-1', 2, datetime(2025, 1, 20, tzinfo=timezone.utc)),
+                ('stream-2', 1, datetime(2025, 1, 31, 23, 59, tzinfo=timezone.utc)),
+                ('stream-1', 1, datetime(2025, 2, 1, tzinfo=timezone.utc)),
+            ]
+        ), logGroupName='partitioned-group')
+
+    def state(self):
+        logs = Log.objects.filter(logGroupName='partitioned-group')
+        return {
+            'logs': logs.count(),
+            'log_counts': LogCount.objects.filter(log__in=logs).count(),
+            'streams': dict(LogStream.objects.filter(group__name='partitioned-group').values_list('name', 'log_count')),
+            'group': LogGroup.objects.get(name='partitioned-group').log_count,
+            'owners': (exact_count(owner=1), exact_count(owner=2)),
+        }
+
+    def test_rows_of_a_new_partition_are_moved_out_of_the_default_partition(self):
+        before = self.state()
+        name = partition_name(self.january)
+        self.assertEqual(partition_sizes().get(name), None)
+
+        self.assertTrue(create_partition(self.january))
+        self.assertFalse(create_partition(self.january))
+        self.assertEqual(partition_sizes()[name], 3)
+        self.assertIn(name, [partition[0] for partition in list_partitions()])
+        # The logs are the same, only stored elsewhere
+        self.assertEqual(self.state(), before)
+        self.assertEqual(Log.objects.filter(timestamp__gte=self.january, timestamp__lt=add_months(self.january, 1),
+                                            logGroupName='partitioned-group').count(), 3)
+
+    def test_dropped_partitions_are_subtracted_from_the_catalog_and_counters(self):
+        create_partition(self.january)
+        self.assertEqual(drop_partitions_before(add_months(self.january, 1)), [partition_name(self.january)])
+        self.assertEqual(self.state(), {
+            'logs': 1, 'log_counts': 1, 'streams': {'stream-1': 1, 'stream-2': 0}, 'group': 1, 'owners': (1, 0),
+        })
+        self.assertIsNone(partition_sizes().get(partition_name(self.january)))
+
+    def test_command_creates_and_expires_partitions(self):
+        create_partition(self.january)
+        # The retention keeps the current month and the upcoming ones
+        retention_days = (django_timezone.now() - datetime(2025, 3, 1, tzinfo=timezone.utc)).days
+        out = io.StringIO()
+        call_command('manage_partitions', '--retention-days', str(retention_days), '--detach', stdout=out)
+        self.assertIn(f'Detached {partition_name(self.january)}', out.getvalue())
+        self.assertEqual(self.state()['logs'], 1)
+        # A detached partition is kept as a table
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM ' + connection.ops.quote_name(partition_name(self.january)))
+            self.assertEqual(cursor.fetchone()[0], 3)
+        current = partition_name(month_start(django_timezone.now()))
+        self.assertIn(current, [partition[0] for partition in list_partitions()])
+
+
+class LogRepresentationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_logs(50)
+
+    def test_rows_are_represented_like_the_serializer(self):
+        logs = Log.objects.order_by('-timestamp', '-id')
+        fields = log_fields()
+        self.assertEqual(
+            JSONRenderer().render(represent_logs(log_rows(logs, fields), fields)),
+            JSONRenderer().render(LogSerializer(logs, many=True).data),
+        )
+
+    def test_sparse_fieldsets_keep_the_serializer_order(self):
+        fields = log_fields('level,id,message')
+        data = represent_logs(log_rows(Log.objects.all(), fields), fields)
+        self.assertEqual(len(data), 50)
+        self.assertEqual(list(data[0]), ['id', 'message', 'level'])
+
+    def test_unknown_fields_are_rejected(self):
+        with self.assertRaises(ValueError):
+            log_fields('id,message_hash')
+
+
+class RenderingTests(SimpleTestCase):
+
+    def test_orjson_renders_like_the_json_renderer(self):
+        data = {
+            'message': 'line\u2028separated, caf\u00e9',
+            'timestamp': datetime(2026, 10, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+            'size': Decimal('1.50'),
+            'counts': {1: 2},
+            'levels': ('INFO', 'ERROR'),
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indented_json_is_rendered_by_the_json_renderer(self):
+        media_type = 'application/json; indent=2'
+        self.assertEqual(ORJSONRenderer().render([1], media_type), JSONRenderer().render([1], media_type))
+
+    def test_negotiation_follows_the_weights(self):
+        names = [encoding.name for encoding in ENCODINGS]
+        self.assertEqual(negotiate('gzip').name, 'gzip')
+        self.assertEqual(negotiate('gzip;q=0.5, ' + ', '.join(names)).name, names[0])
+        self.assertIsNone(negotiate('identity'))
+        self.assertIsNone(negotiate('gzip;q=0'))
+        self.assertIsNone(negotiate('*;q=0'))
+        self.assertEqual(negotiate('*').name, names[0])
+
+    async def test_async_streams_are_compressed_as_they_are_sent(self):
+        sent = []
+
+        async def chunks():
+            for chunk in (b'{"message": "first"}\n', b'{"message": "second"}\n'):
+                sent.append(chunk)
+                yield chunk
+
+        async def get_response(request):
+            return StreamingHttpResponse(chunks(), content_type='application/x-ndjson')
+
+        middleware = CompressionMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response.is_async)
+        self.assertEqual(sent, [])
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(gzip.decompress(body), b'{"message": "first"}\n{"message": "second"}\n')
+
+
+class AsyncViewAuthenticationTests(TestCase):
+
+    def test_async_views_require_authentication(self):
+        for name in ('async_recent_logs', 'async_total_logs_count', 'async_filter_logs',
+                     'async_log_count_interval', 'async_last_seven_days', 'live_tail'):
+            with self.subTest(view=name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 403)
+
+    def test_async_log_count_interval_answers_authenticated_requests(self):
+        user = User.objects.create_user(username='interval', password='interval-password')
+        token = Token.objects.create(user=user)
+        response = self.client.get(reverse('async_log_count_interval'), {'interval_type': 'last_hour'},
+                                   headers={'Authorization': f'Token {token.key}'})
+        self.assertEqual(response.status_code, 200)
+
+
+class StreamIngestionTests(TestCase):
+
+    def setUp(self):
+        self.client, self.user = authenticated_client('stream')
+
+    def event(self, message, i=1):
+        # Sent as JSON
+        return log_event(i, logGroupName='stream-group', owner=self.user.pk, timestamp='2026-10-01T12:00:00Z',
+                         message=message)
+
+    def test_lines_without_a_level_marker_are_stored(self):
+        body = '\n'.join(json.dumps(event) for event in (
+            self.event('no level marker here'), self.event('[ERROR ] failed'),
+        ))
+        response = self.client.post(reverse('log_stream'), body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['loaded'], 2)
+        logs = Log.objects.filter(logGroupName='stream-group').order_by('id')
+        self.assertEqual([log.level for log in logs], ['', 'ERROR'])
+        self.assertEqual(LogCount.objects.filter(log__in=logs).count(), 2)
+
+    def test_retried_batches_report_the_stored_duplicates(self):
+        events = [self.event(f'[INFO ] batch {i}', i) for i in range(3)]
+        first = self.client.post(reverse('log_batch'), events[:2], format='json').json()['results']
+        second = self.client.post(reverse('log_batch'), events + events[:1], format='json').json()['results']
+        self.assertEqual([result['status'] for result in second], ['duplicate', 'duplicate', 'accepted', 'duplicate'])
+        self.assertEqual([result['id'] for result in second[:2]], [result['id'] for result in first])
+        self.assertEqual(second[3]['id'], first[0]['id'])
+
+    def test_batches_report_a_result_per_event(self):
+        events = [self.event('[INFO ] batch accepted'), {'logGroupName': 'stream-group'}, self.event('[WARN ] batch', 2)]
+        response = self.client.post(reverse('log_batch'), events, format='json')
+        self.assertEqual(response.status_code, 207, response.content)
+        data = response.json()
+        self.assertEqual((data['accepted'], data['duplicates'], data['rejected']), (2, 0, 1))
+        self.assertEqual([(result['index'], result['status']) for result in data['results']],
+                         [(0, 'accepted'), (1, 'rejected'), (2, 'accepted')])
+        self.assertIn('message', data['results'][1]['errors'])
+        self.assertEqual(Log.objects.filter(logGroupName='stream-group').count(), 2)
+
+        response = self.client.post(reverse('log_batch'), [{}, dict(self.event('[INFO ] late'), timestamp='late')],
+                                    format='json')
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['rejected', 'rejected'])
+        self.assertEqual(Log.objects.filter(logGroupName='stream-group').count(), 2)
+
+    def test_gzipped_bodies_are_decompressed(self):
+        body = gzip.compress(''.join(
+            json.dumps(self.event(f'[INFO ] gzipped {i}', i)) + '\n' for i in range(3)
+        ).encode())
+        response = self.client.post(reverse('log_stream'), body, content_type='application/x-ndjson',
+                                    headers={'Content-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual((response.json()['loaded'], response.json()['rejected']), (3, 0))
+        self.assertEqual(sorted(Log.objects.filter(logGroupName='stream-group').values_list('message', flat=True)),
+                         ['[INFO ] gzipped 0', '[INFO ] gzipped 1', '[INFO ] gzipped 2'])
+
+        # A body that is not gzip compressed cannot be read
+        response = self.client.post(reverse('log_stream'), b'{"not": "gzipped"}\n', content_type='application/x-ndjson',
+                                    headers={'Content-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_logs_without_a_template_keep_a_null_template_id(self):
+        with mock.patch('cloudwatch.ingest.miner.match', return_value=None):
+            self.assertEqual(store_events({}, logGroupName='stream-group', owner=self.user.pk), 1)
+        self.assertIsNone(Log.objects.get(logGroupName='stream-group').template_id)
+
+
+@mock.patch('cloudwatch.routers.REPLICA_ALIASES', ['replica'])
+class PrimaryAfterWriteMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        self.user = User(pk=1, username='writer')
+        self.cache = caches['default']
+        self.addCleanup(self.cache.delete, wrote_recently_key(self.user))
+
+    def request(self, method):
+        request = getattr(RequestFactory(), method)('/api/cloudwatch/logs/')
+        request.user = self.user
+        return request
+
+    def test_records_writes_of_sync_requests(self):
+        middleware = PrimaryAfterWriteMiddleware(lambda request: HttpResponse(status=201))
+        self.assertFalse(iscoroutinefunction(middleware))
+        middleware(self.request('get'))
+        self.assertIsNone(self.cache.get(wrote_recently_key(self.user)))
+        middleware(self.request('post'))
+        self.assertTrue(self.cache.get(wrote_recently_key(self.user)))
+
+    async def test_records_writes_of_async_requests(self):
+        async def get_response(request):
+            return HttpResponse(status=201)
+
+        middleware = PrimaryAfterWriteMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(self.request('post'))
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await self.cache.aget(wrote_recently_key(self.user)))
+
+
+class MetricsMiddlewareTests(TestCase):
+
+    def get_response(self, request):
+        return HttpResponse(str(Log.objects.count()))
+
+    async def aget_response(self, request):
+        return HttpResponse(str(await Log.objects.acount()))
+
+    def test_counts_the_queries_of_sync_requests(self):
+        middleware = MetricsMiddleware(self.get_response)
+        self.assertFalse(iscoroutinefunction(middleware))
+        with mock.patch('cloudwatch.metrics.db_queries.observe') as observe:
+            middleware(RequestFactory().get('/'))
+        observe.assert_called_once_with((UNMATCHED_VIEW, 'GET'), 1)
+
+    async def test_counts_the_queries_of_async_requests(self):
+        middleware = MetricsMiddleware(self.aget_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with mock.patch('cloudwatch.metrics.db_queries.observe') as observe:
+            response = await middleware(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'0')
+        observe.assert_called_once_with((UNMATCHED_VIEW, 'GET'), 1)
+
+
+class AsyncExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='exporter', password='exporter-password')
+        cls.token = Token.objects.create(user=cls.user)
+        store_events(*(
+            {'timestamp': datetime(2026, 10, 1, 12, minute, tzinfo=timezone.utc), 'message': f'[INFO ] export {minute}'}
+            for minute in range(3)
+        ), logGroupName='export-group', logStreamName='export-1', owner=cls.user.pk)
+
+    async def read_async_export(self, query):
+        response = await self.async_client.get(
+            reverse('async_filter_logs') + query, headers={'Authorization': f'Token {self.token.key}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        return b''.join([chunk async for chunk in response.streaming_content])
+
+    async def test_exports_stream_from_an_async_iterator(self):
+        lines = (await self.read_async_export('?logGroupName=export-group&export=ndjson&fields=id,message')).splitlines()
+        self.assertEqual(sorted(json.loads(line)['message'] for line in lines),
+                         ['[INFO ] export 0', '[INFO ] export 1', '[INFO ] export 2'])
+
+    def test_csv_export_has_a_header_and_quotes_values(self):
+        store_events({'timestamp': datetime(2026, 10, 1, 12, 5, tzinfo=timezone.utc),
+                      'message': '[WARN ] retried "twice", then\ngave up'},
+                     logGroupName='export-group', logStreamName='export-1', owner=self.user.pk)
+        response = self.client.get(reverse('filter-logs'), {'logGroupName': 'export-group', 'export': 'csv',
+                                                            'fields': 'message,logStreamName'},
+                                   headers={'Authorization': f'Token {self.token.key}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="logs.csv"')
+        content = response.getvalue().decode()
+        self.assertIn('"[WARN ] retried ""twice"", then\ngave up"', content)
+        # The fields keep the order of the log representation
+        self.assertEqual(list(csv.reader(io.StringIO(content))), [
+            ['logStreamName', 'message'],
+            ['export-1', '[WARN ] retried "twice", then\ngave up'],
+            ['export-1', '[INFO ] export 2'], ['export-1', '[INFO ] export 1'], ['export-1', '[INFO ] export 0'],
+        ])
+
+        response = self.client.get(reverse('filter-logs'), {'export': 'csv', 'fields': 'message,secret'},
+                                   headers={'Authorization': f'Token {self.token.key}'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_async_csv_export_matches_the_sync_one(self):
+        query = '?logGroupName=export-group&export=csv'
+        response = self.client.get(reverse('filter-logs') + query, headers={'Authorization': f'Token {self.token.key}'})
+        self.assertEqual(async_to_sync(self.read_async_export)(query), response.getvalue())
+
+
+@mock.patch('cloudwatch.routers.REPLICA_ALIASES', ['replica'])
+class ReplicaExportTests(TransactionTestCase):
+    # Reads inside a transaction stay on the primary, see ReplicaRouter
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client, self.user = authenticated_client('replica-exporter')
+
+    def test_exports_read_from_the_replica(self):
+        # The logs are read after the view returned, outside of replica_reads
+        for view, iterator in (('filter-logs', 'iter_csv'), ('async_filter_logs', 'aiter_csv'), ('log_list', 'iter_csv')):
+            with self.subTest(view=view), mock.patch(f'cloudwatch.export.{iterator}', return_value=iter([])) as export:
+                response = self.client.get(reverse(view), {'export': 'csv'})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(export.call_args.args[0].db, 'replica')
+
+    def test_exports_after_a_write_read_from_the_primary(self):
+        caches['default'].set(wrote_recently_key(self.user), True)
+        with mock.patch('cloudwatch.export.iter_csv', return_value=iter([])) as export:
+            self.client.get(reverse('filter-logs'), {'export': 'csv'})
+        self.assertEqual(export.call_args.args[0].db, 'default')
+
+
+class CachedResponseTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client, self.user = authenticated_client('cacher')
+
+    def cache_outcomes(self, *paths):
+        return [self.client.get('/api/cloudwatch/' + path)['X-Cache'] for path in paths]
+
+    def store(self, group, stream):
+        with self.captureOnCommitCallbacks(execute=True):
+            store_events({}, logGroupName=group, logStreamName=stream, owner=self.user.pk, message='[INFO ] cached')
+
+    def test_hits_and_misses_are_counted(self):
+        self.assertEqual(self.cache_outcomes('total-logs-count/', 'total-logs-count/', 'total-logs-count/?owner=1'),
+                         ['MISS', 'HIT', 'MISS'])
+        self.assertEqual(cache_stats()['total_logs_count'], {'hits': 1, 'misses': 2, 'hit_ratio': 0.3333})
+
+    def test_new_logs_only_invalidate_the_responses_about_their_group_and_stream(self):
+        paths = [
+            'total-logs-count/?logGroupName=group-a&logStreamName=stream-1',
+            'total-logs-count/?logGroupName=group-a&logStreamName=stream-2',
+            'total-logs-count/?logGroupName=group-a',
+            'total-logs-count/?logGroupName=group-b',
+            'total-logs-count/',
+            'logs/grouped/?logGroupName=group-b',
+            'recent-logs/',
+        ]
+        self.cache_outcomes(*paths)
+        self.store('group-a', 'stream-1')
+        self.assertEqual(self.cache_outcomes(*paths), ['MISS', 'HIT', 'MISS', 'HIT', 'MISS', 'HIT', 'MISS'])
+        response = self.client.get('/api/cloudwatch/total-logs-count/?logGroupName=group-a')
+        self.assertEqual(response.json(), {'total_logs_count': 1})
+
+    def test_deleted_logs_invalidate_the_responses_about_their_stream(self):
+        self.store('group-a', 'stream-1')
+        path = 'total-logs-count/?logGroupName=group-a&logStreamName=stream-1'
+        self.assertEqual(self.client.get('/api/cloudwatch/' + path).json(), {'total_logs_count': 1})
+
+        log = Log.objects.get(logGroupName='group-a')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f'/api/cloudwatch/logs/{log.pk}/').status_code, 204)
+        response = self.client.get('/api/cloudwatch/' + path)
+        self.assertEqual((response['X-Cache'], response.json()), ('MISS', {'total_logs_count': 0}))
+
+    def test_views_and_everything_can_be_invalidated(self):
+        paths = ['templates/', 'total-logs-count/?logGroupName=group-a']
+        self.cache_outcomes(*paths)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate(views=['log_templates'])
+        self.assertEqual(self.cache_outcomes(*paths), ['MISS', 'HIT'])
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate()
+        self.assertEqual(self.cache_outcomes(*paths), ['MISS', 'MISS'])
+
+    def test_nothing_is_invalidated_before_the_commit(self):
+        self.cache_outcomes('total-logs-count/')
+        with self.captureOnCommitCallbacks(execute=False):
+            invalidate(streams=[('group-a', 'stream-1')])
+        self.assertEqual(self.cache_outcomes('total-logs-count/'), ['HIT'])
+
+
+class TemplateMinerTests(TestCase):
+
+    def test_processes_get_the_same_id_for_the_same_text(self):
+        # Two miners stand for two processes
+        first, second = TemplateMiner(), TemplateMiner()
+        specific = first.match('login of user alice from web')
+        self.assertEqual(second.match('login of user alice from web'), specific)
+        general = second.match('login of user bob from web')
+        self.assertEqual(first.match('login of user carol from web'), general)
+
+        first_ids, second_ids = first.store({specific, general}), second.store({general, specific})
+        self.assertEqual(first_ids, second_ids)
+        self.assertEqual(
+            dict(LogTemplate.objects.filter(id__in=first_ids.values()).values_list('template', 'general')),
+            {specific: first_ids[general], general: None},
+        )
+
+    def test_matching_writes_nothing(self):
+        miner = TemplateMiner()
+        miner.load()
+        with self.assertNumQueries(0):
+            miner.match('cache miss for key alpha')
+            miner.match('cache miss for key beta')
+        # Neither do the rejected events and the events queued for the writer
+        client, _ = authenticated_client('templates')
+        response = client.post(reverse('log_batch') + '?async=true', [{'message': '[INFO ] never stored here'}],
+                               format='json')
+        self.assertEqual(response.status_code, 400, response.content)
+        with mock.patch.object(BatchWriter, 'start'), mock.patch('cloudwatch.views.writer', BatchWriter()):
+            response = client.post(reverse('log_list') + '?async=true',
+                                   log_event(message='[INFO ] queued and never stored'), format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertFalse(LogTemplate.objects.filter(template__contains='stored').exists())
+
+    def test_templates_are_stored_with_their_logs(self):
+        miner = TemplateMiner()
+        text = miner.match('shard rebalanced on node west')
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            miner.store({text})
+            raise RuntimeError
+        self.assertFalse(LogTemplate.objects.filter(template=text).exists())
+        self.assertNotIn(text, miner.ids)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            template_id = miner.store({text})[text]
+        self.assertEqual(LogTemplate.objects.get(template=text).pk, template_id)
+        with self.assertNumQueries(0):
+            self.assertEqual(miner.store({text}), {text: template_id})
+
+    def test_templates_are_stored_outside_the_lock(self):
+        miner = TemplateMiner()
+
+        def execute(execute, sql, params, many, context):
+            self.assertFalse(miner.lock.locked())
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(execute):
+            text = miner.match('worker started in region west')
+            miner.store({text})
+
+    def test_logs_of_generalized_templates_are_counted_together(self):
+        caches['default'].clear()
+        client, user = authenticated_client('generalized')
+        for i, name in enumerate(('alice', 'bob', 'carol')):
+            event = log_event(i, logGroupName='template-group', owner=user.pk, message=f'payment of order {name} from shop')
+            response = client.post(reverse('log_list'), event, format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(set(Log.objects.filter(logGroupName='template-group').values_list('template_id'))), 2)
+
+        templates = client.get(reverse('log_templates'), {'logGroupName': 'template-group'}).json()
+        self.assertEqual([(template['template'], template['count']) for template in templates],
+                         [('payment of order <*> from shop', 3)])
+        response = client.get(reverse('filter-logs'), {'template_id': templates[0]['template_id']})
+        self.assertEqual(len(response.json()), 3)
+
+
+class RollupMaintenanceTests(TestCase):
+
+    def setUp(self):
+        self.client, self.user = authenticated_client('rollups')
+
+    def rollups(self):
+        return {
+            (rollup.granularity, rollup.bucket.isoformat(), rollup.logStreamName, rollup.level): rollup.count
+            for rollup in LogRollup.objects.filter(logGroupName='rollup-group').exclude(count=0)
+        }
+
+    def expected(self, stream, level, count=1):
+        return {
+            ('minute', '2026-10-01T12:34:00+00:00', stream, level): count,
+            ('hour', '2026-10-01T12:00:00+00:00', stream, level): count,
+            ('day', '2026-10-01T00:00:00+00:00', stream, level): count,
+        }
+
+    def test_rollups_follow_created_updated_and_deleted_logs(self):
+        event = log_event(logGroupName='rollup-group', owner=self.user.pk,
+                          timestamp=datetime(2026, 10, 1, 12, 34, 56, tzinfo=timezone.utc), message='[ERROR ] disk full')
+        response = self.client.post(reverse('log_list'), event, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.rollups(), self.expected('stream-1', 'ERROR'))
+
+        # Posting the same event again is a duplicate, it is not counted twice
+        self.assertEqual(self.client.post(reverse('log_list'), event, format='json').status_code, 200)
+        self.assertEqual(self.rollups(), self.expected('stream-1', 'ERROR'))
+
+        path = f"/api/cloudwatch/logs/{response.json()['id']}/"
+        response = self.client.patch(path, {'logStreamName': 'stream-2', 'message': '[WARN ] disk almost full'},
+                                     format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.rollups(), self.expected('stream-2', 'WARN'))
+
+        response = self.client.put(path, dict(event, timestamp='2026-10-01T12:35:00Z'), format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.rollups(), {
+            ('minute', '2026-10-01T12:35:00+00:00', 'stream-1', 'ERROR'): 1,
+            ('hour', '2026-10-01T12:00:00+00:00', 'stream-1', 'ERROR'): 1,
+            ('day', '2026-10-01T00:00:00+00:00', 'stream-1', 'ERROR'): 1,
+        })
+
+        self.assertEqual(self.client.delete(path).status_code, 204)
+        self.assertEqual(self.rollups(), {})
+
+    def test_logs_of_a_chunk_are_summed_per_bucket(self):
+        self.assertEqual(store_events(*(
+            {'timestamp': datetime(2026, 10, 1, 12, 34, second, tzinfo=timezone.utc), 'message': f'[ERROR ] disk {second} full'}
+            for second in (0, 30, 59)
+        ), logGroupName='rollup-group', owner=self.user.pk), 3)
+        self.assertEqual(self.rollups(), self.expected('stream-1', 'ERROR', count=3))
+
+
+class HistogramTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='histogram', password='histogram-password')
+        store_events(*({'timestamp': moment, 'message': f'[{level} ] request done'} for moment, level in [
+            (datetime(2026, 10, 1, 12, 0, 0, tzinfo=timezone.utc), 'INFO'),
+            (datetime(2026, 10, 1, 12, 4, 59, tzinfo=timezone.utc), 'ERROR'),
+            (datetime(2026, 10, 1, 12, 5, 0, tzinfo=timezone.utc), 'INFO'),
+            (datetime(2026, 10, 1, 12, 20, 0, tzinfo=timezone.utc), 'WARN'),
+            (datetime(2026, 10, 1, 12, 30, 0, tzinfo=timezone.utc), 'INFO'),
+        ]), logGroupName='histogram-group', owner=cls.user.pk)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def counts(self, start, end, width, **kwargs):
+        buckets = histogram(start, end, width, filters={'logGroupName': 'histogram-group'}, **kwargs)
+        return [(bucket['interval_start'].strftime('%H:%M:%S'), bucket['interval_end'].strftime('%H:%M:%S'),
+                 bucket['count']) for bucket in buckets]
+
+    def queried_tables(self, start, end, width):
+        with CaptureQueriesContext(connection) as queries:
+            self.counts(start, end, width)
+        self.assertEqual(len(queries), 1)
+        return [table for table in ('cloudwatch_logrollup', 'cloudwatch_log"') if table in queries[0]['sql']]
+
+    def test_aligned_buckets_are_summed_from_the_rollups_and_gaps_filled(self):
+        start, end = datetime(2026, 10, 1, 12, tzinfo=timezone.utc), datetime(2026, 10, 1, 12, 30, tzinfo=timezone.utc)
+        # A log at the start of a bucket belongs to it, the end of the range is excluded
+        self.assertEqual(self.counts(start, end, timedelta(minutes=5)), [
+            ('12:00:00', '12:05:00', 2), ('12:05:00', '12:10:00', 1), ('12:10:00', '12:15:00', 0),
+            ('12:15:00', '12:20:00', 0), ('12:20:00', '12:25:00', 1), ('12:25:00', '12:30:00', 0),
+        ])
+        self.assertEqual(self.queried_tables(start, end, timedelta(minutes=5)), ['cloudwatch_logrollup'])
+
+    def test_unaligned_buckets_are_counted_from_the_logs(self):
+        start, end = datetime(2026, 10, 1, 12, 0, 30, tzinfo=timezone.utc), datetime(2026, 10, 1, 12, 20, tzinfo=timezone.utc)
+        # The last bucket ends with the range
+        self.assertEqual(self.counts(start, end, timedelta(minutes=5)), [
+            ('12:00:30', '12:05:30', 2), ('12:05:30', '12:10:30', 0),
+            ('12:10:30', '12:15:30', 0), ('12:15:30', '12:20:00', 0),
+        ])
+        self.assertEqual(self.queried_tables(start, end, timedelta(minutes=5)), ['cloudwatch_log"'])
+
+    def test_rollups_and_logs_give_the_same_counts(self):
+        start = datetime(2026, 10, 1, 12, tzinfo=timezone.utc)
+        filters = {'logGroupName': 'histogram-group'}
+        aligned = histogram(start, start + timedelta(hours=1), timedelta(minutes=10), 'level', filters)
+        # A range ending within a minute cannot be read from the rollups
+        unaligned = histogram(start, start + timedelta(hours=1, microseconds=1), timedelta(minutes=10), 'level', filters)
+        self.assertEqual([bucket['count'] for bucket in aligned], [3, 0, 1, 1, 0, 0])
+        self.assertEqual([(bucket['count'], bucket['counts']) for bucket in unaligned[:6]],
+                         [(bucket['count'], bucket['counts']) for bucket in aligned])
+
+    def test_buckets_are_split_by_level(self):
+        start = datetime(2026, 10, 1, 12, tzinfo=timezone.utc)
+        buckets = histogram(start, start + timedelta(minutes=10), timedelta(minutes=5), split_by='level',
+                            filters={'logGroupName': 'histogram-group'})
+        self.assertEqual([bucket['counts'] for bucket in buckets], [{'INFO': 1, 'ERROR': 1}, {'INFO': 1}])
+
+    def test_invalid_ranges_are_refused(self):
+        start = datetime(2026, 10, 1, 12, tzinfo=timezone.utc)
+        for end, width in ((start, timedelta(minutes=5)), (start + timedelta(hours=1), timedelta(0)),
+                           (start + timedelta(days=365), timedelta(seconds=1))):
+            with self.subTest(end=end, width=width), self.assertRaises(ValueError):
+                histogram(start, end, width)
+
+    def test_endpoint_returns_the_end_of_every_interval(self):
+        response = self.client.get(reverse('log_count_interval'), {
+            'start': '2026-10-01T12:00:00Z', 'end': '2026-10-01T12:15:00Z', 'width': '00:05:00',
+            'logGroupName': 'histogram-group',
+        })
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([(interval['interval'], interval['count']) for interval in response.json()], [
+            ('2026-10-01T12:05:00Z', 2), ('2026-10-01T12:10:00Z', 1), ('2026-10-01T12:15:00Z', 0),
+        ])
+        response = self.client.get(reverse('log_count_interval'), {'start': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_endpoints_refuse_an_unknown_level(self):
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        params = {'start': '2026-10-01T12:00:00Z', 'end': '2026-10-01T12:15:00Z', 'width': '00:05:00'}
+        for name in ('log_count_interval', 'async_log_count_interval'):
+            for level, expected in (('ERROR', 200), ('DEBUG', 400), ('error', 400), ("INFO' OR '1'='1", 400)):
+                with self.subTest(name=name, level=level):
+                    response = client.get(reverse(name), dict(params, securityinfo=level))
+                    self.assertEqual(response.status_code, expected, response.content)
+                    if expected == 200:
+                        self.assertEqual([interval['count'] for interval in response.json()], [1, 0, 0])
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='keyset', password='keyset-password')
+        # Token authentication, which the async views use as well
+        cls.token = Token.objects.create(user=cls.user)
+        # Pairs of logs share a timestamp, so that the pages are split between logs of the same time
+        store_events(*({'timestamp': datetime(2026, 10, 1, 12, i // 2, tzinfo=timezone.utc)} for i in range(7)),
+                     logGroupName='keyset-group', owner=cls.user.pk)
+        cls.ids = list(Log.objects.filter(logGroupName='keyset-group').order_by('-timestamp', '-id')
+                       .values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def page(self, url=None, **params):
+        if url is None:
+            response = self.client.get(reverse('filter-logs'), dict({'logGroupName': 'keyset-group'}, **params))
+        else:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        return [log['id'] for log in data['results']], data['next'], data['previous']
+
+    def cursor(self, log_id, direction):
+        log = Log.objects.get(pk=log_id)
+        return KeysetPagination().encode_cursor((log.timestamp, log.id), direction)
+
+    def test_pages_go_forward_and_back_over_every_log_once(self):
+        ids, next_url, previous_url = self.page(page_size=3)
+        self.assertEqual((ids, previous_url), (self.ids[:3], None))
+
+        forward = [ids]
+        while next_url:
+            ids, next_url, previous_url = self.page(next_url)
+            forward.append(ids)
+        self.assertEqual(forward, [self.ids[:3], self.ids[3:6], self.ids[6:]])
+
+        backward = []
+        while previous_url:
+            ids, next_url, previous_url = self.page(previous_url)
+            self.assertIsNotNone(next_url)
+            backward.append(ids)
+        self.assertEqual(backward, [self.ids[3:6], self.ids[:3]])
+
+    def test_paging_past_either_end_links_back(self):
+        ids, next_url, previous_url = self.page(page_size=3, cursor=self.cursor(self.ids[-1], 'next'))
+        self.assertEqual((ids, next_url), ([], None))
+        self.assertEqual(self.page(previous_url)[0], self.ids[3:6])
+
+        ids, next_url, previous_url = self.page(page_size=3, cursor=self.cursor(self.ids[0], 'previous'))
+        self.assertEqual((ids, previous_url), ([], None))
+        self.assertEqual(self.page(next_url)[0], self.ids[1:4])
+
+    def test_invalid_cursors_are_not_found(self):
+        for cursor in ('not-a-cursor', 'e30', KeysetPagination().encode_cursor((datetime(2026, 10, 1), 'x'), 'next'),
+                       base64.urlsafe_b64encode(b'{"t": "yesterday", "i": 1, "d": "n"}').decode()):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('filter-logs'), {'logGroupName': 'keyset-group', 'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
+
+    def test_async_view_pages_the_same_way(self):
+        response = self.client.get(reverse('async_filter_logs'), {'logGroupName': 'keyset-group', 'page_size': 4})
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertEqual([log['id'] for log in data['results']], self.ids[:4])
+        self.assertEqual(self.page(data['next'])[0], self.ids[4:])
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='search', password='search-password')
+        store_events(*({'timestamp': datetime(2026, 10, 1, 12, i, tzinfo=timezone.utc), 'message': message}
+                       for i, message in enumerate([
+            '[INFO ] disk usage at 100% on node-1',
+            '[INFO ] disk usage at 1000 on node_2',
+            '[ERROR ] o.e.c.m.MetadataIndexTemplateService failed',
+            '[WARN ] Disk quota exceeded on nodeX2',
+        ])), logGroupName='search-group', owner=cls.user.pk)
+        cls.ids = list(Log.objects.filter(logGroupName='search-group').order_by('timestamp')
+                       .values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('log_search'), dict({'q': query, 'logGroupName': 'search-group'}, **params))
+        self.assertEqual(response.status_code, 200, response.content)
+        return [self.ids.index(log['id']) for log in response.json()['results']]
+
+    def test_text_search_matches_words(self):
+        # Equally ranked logs are newest first
+        self.assertEqual(self.search('disk'), [3, 1, 0])
+        self.assertEqual(self.search('DISK usage'), [1, 0])
+        self.assertEqual(self.search('disk -quota', mode='text'), [1, 0])
+        self.assertEqual(self.search('"usage at 1000"'), [1])
+        # A dotted name is a single word
+        self.assertEqual(self.search('MetadataIndexTemplateService'), [])
+
+    def test_substring_search_matches_part_of_words(self):
+        self.assertEqual(self.search('METADATAindex', mode='substring'), [2])
+        self.assertEqual(self.search('sage at 10', mode='substring'), [1, 0])
+
+    def test_substring_search_escapes_wildcards(self):
+        self.assertEqual(self.search('100%', mode='substring'), [0])
+        self.assertEqual(self.search('node_2', mode='substring'), [1])
+        self.assertEqual(self.search('%_%', mode='substring'), [])
+
+    def test_invalid_searches_are_rejected(self):
+        for params in ({'q': 'ab', 'mode': 'substring'}, {'q': 'disk', 'mode': 'regex'}, {'q': ' '}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('log_search'), params)
+                self.assertEqual(response.status_code, 400)
+
+
+class CatalogConsistencyTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client, self.user = authenticated_client('catalog')
+        store_events(*(
+            {'logGroupName': group, 'logStreamName': stream, 'timestamp': datetime(2026, 10, 1, 12, i, tzinfo=timezone.utc)}
+            for i, (group, stream) in enumerate([
+                ('catalog-a', 'stream-1'), ('catalog-a', 'stream-1'), ('catalog-a', 'stream-2'), ('catalog-b', 'stream-1'),
+            ])
+        ), owner=self.user.pk)
+
+    def assertCatalogMatchesLogs(self):
+        streams = LogStream.objects.filter(group__name__startswith='catalog-', log_count__gt=0)
+        logs = Log.objects.filter(logGroupName__startswith='catalog-').values('logGroupName', 'logStreamName')
+        self.assertEqual(
+            {(stream.group.name, stream.name): stream.log_count for stream in streams.select_related('group')},
+            {(row['logGroupName'], row['logStreamName']): row['count'] for row in logs.annotate(count=Count('id'))},
+        )
+        groups = LogGroup.objects.filter(name__startswith='catalog-', log_count__gt=0)
+        self.assertEqual(
+            dict(groups.values_list('name', 'log_count')),
+            dict(logs.values('logGroupName').annotate(count=Count('id')).values_list('logGroupName', 'count')),
+        )
+
+    def detail(self, group, stream):
+        return f"/api/cloudwatch/logs/{Log.objects.filter(logGroupName=group, logStreamName=stream).latest('id').pk}/"
+
+    def test_catalog_follows_created_logs(self):
+        self.assertCatalogMatchesLogs()
+        stream = LogStream.objects.get(group__name='catalog-a', name='stream-1')
+        self.assertEqual((stream.first_seen.minute, stream.last_seen.minute), (0, 1))
+        group = LogGroup.objects.get(name='catalog-a')
+        self.assertEqual((group.first_seen.minute, group.last_seen.minute), (0, 2))
+
+    def test_catalog_follows_moved_logs(self):
+        response = self.client.patch(self.detail('catalog-a', 'stream-2'),
+                                     {'logGroupName': 'catalog-b', 'logStreamName': 'stream-3'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertCatalogMatchesLogs()
+
+        response = self.client.patch(self.detail('catalog-a', 'stream-1'),
+                                     {'timestamp': '2026-10-02T00:00:00Z'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertCatalogMatchesLogs()
+        # A modified log widens the range its stream was seen in, without being counted again
+        stream = LogStream.objects.get(group__name='catalog-a', name='stream-1')
+        self.assertEqual((stream.log_count, stream.last_seen), (2, datetime(2026, 10, 2, tzinfo=timezone.utc)))
+
+    def test_catalog_follows_deleted_logs(self):
+        for group, stream in (('catalog-a', 'stream-1'), ('catalog-b', 'stream-1')):
+            self.assertEqual(self.client.delete(self.detail(group, stream)).status_code, 204)
+            self.assertCatalogMatchesLogs()
+
+        # Streams and groups left without logs are not listed
+        response = self.client.get(reverse('logs_grouped_by_group_and_stream'))
+        self.assertEqual(
+            [(group['logGroupName'], [(stream['logStreamName'], stream['logCount']) for stream in group['logStreams']])
+             for group in response.json() if group['logGroupName'].startswith('catalog-')],
+            [('catalog-a', [('stream-1', 1), ('stream-2', 1)])],
+        )
+
+
+class CounterConsistencyTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client, self.user = authenticated_client('counters')
+        self.other = User.objects.create_user(username='counters-other', password='counters-other-password')
+        store_events(*(
+            {'owner': owner, 'timestamp': datetime(2026, 10, 1, 12, i, tzinfo=timezone.utc)}
+            for i, owner in enumerate([self.user.pk, self.user.pk, self.other.pk])
+        ), logGroupName='counter-group')
+
+    def assertCountersMatchLogs(self):
+        self.assertEqual(exact_count(), Log.objects.count())
+        for owner in (self.user.pk, self.other.pk):
+            self.assertEqual(exact_count(owner=owner), Log.objects.filter(owner=owner).count())
+        self.assertEqual(exact_count('counter-group'), Log.objects.filter(logGroupName='counter-group').count())
+
+    def total_logs_count(self, **params):
+        return self.client.get(reverse('total-logs-count'), params).json()['total_logs_count']
+
+    def detail(self, owner):
+        return f"/api/cloudwatch/logs/{Log.objects.filter(owner=owner).latest('id').pk}/"
+
+    def test_counters_follow_created_logs(self):
+        self.assertCountersMatchLogs()
+        self.assertEqual(exact_count(owner=self.user.pk), 2)
+
+    def test_counters_follow_logs_given_to_another_owner(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.detail(self.user.pk), {'owner': self.other.pk}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertCountersMatchLogs()
+        self.assertEqual((self.total_logs_count(owner=self.user.pk), self.total_logs_count(owner=self.other.pk)), (1, 2))
+
+        # Changes that keep the owner do not move the log between counters
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.detail(self.other.pk), {'message': '[WARN ] request retried'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertCountersMatchLogs()
+
+    def test_counters_follow_deleted_logs(self):
+        for owner in (self.user.pk, self.other.pk):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.client.delete(self.detail(owner)).status_code, 204)
+            self.assertCountersMatchLogs()
+        self.assertEqual((self.total_logs_count(owner=self.user.pk), self.total_logs_count(owner=self.other.pk)), (1, 0))
+
+
+class WriterBackpressureTests(TestCase):
+
+    def setUp(self):
+        self.client, self.user = authenticated_client('backpressure')
+        # The thread is not started, so the queued logs stay queued
+        patcher = mock.patch.object(BatchWriter, 'start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.writer = BatchWriter(max_depth=2)
+
+    def event(self, i):
+        return log_event(i, logGroupName='queued-group', owner=self.user.pk)
+
+    def test_logs_are_refused_when_the_queue_is_full(self):
+        with mock.patch('cloudwatch.views.writer', self.writer):
+            response = self.client.post(reverse('log_list') + '?async=true', self.event(0), format='json')
+            self.assertEqual(response.status_code, 202, response.content)
+            # A batch is queued whole or not at all
+            response = self.client.post(reverse('log_batch') + '?async=true', [self.event(1), self.event(2)],
+                                        format='json')
+            self.assertEqual(response.status_code, 429, response.content)
+            self.assertEqual(response['Retry-After'], '1')
+
+            response = self.client.post(reverse('log_list') + '?async=true', self.event(1), format='json')
+            self.assertEqual(response.status_code, 202, response.content)
+            response = self.client.post(reverse('log_list') + '?async=true', self.event(2), format='json')
+            self.assertEqual(response.status_code, 429, response.content)
+
+            metrics = self.client.get(reverse('ingest_queue')).json()
+        self.assertEqual((metrics['queue_depth'], metrics['enqueued'], metrics['rejected']), (2, 2, 3))
+        self.assertFalse(Log.objects.filter(logGroupName='queued-group').exists())
+
+
+class WriterShutdownTests(TransactionTestCase):
+    # The writer stores the logs from its own thread and connection, outside of a test transaction
+
+    def build_logs(self, count):
+        return [build_log(log_event(i, logGroupName='drained-group')) for i in range(count)]
+
+    def test_queued_logs_are_stored_before_stopping(self):
+        # Neither the batch size nor the flush interval is reached before the writer stops
+        writer = BatchWriter(batch_size=100, flush_interval=60)
+        self.assertTrue(writer.submit(self.build_logs(5)))
+        self.assertTrue(writer.submit(self.build_logs(5)[:2]))
+        self.assertEqual(Log.objects.filter(logGroupName='drained-group').count(), 0)
+
+        self.assertTrue(writer.stop(timeout=10))
+        self.assertEqual(Log.objects.filter(logGroupName='drained-group').count(), 5)
+        self.assertEqual(LogCount.objects.filter(log__logGroupName='drained-group').count(), 5)
+        metrics = writer.metrics()
+        self.assertEqual((metrics['queue_depth'], metrics['stored'], metrics['duplicates'], metrics['flushes']),
+                         (0, 5, 2, 1))
+
+        # A stopping writer takes no more logs
+        self.assertFalse(writer.submit(self.build_logs(1)))
+        self.assertEqual(writer.metrics()['rejected'], 1)
+
+
+class LiveTailTests(TestCase):
+
+    def tail_logs(self):
+        return [
+            Log(id=i, logGroupName=group, logStreamName='stream-1', owner=1, level=level,
+                message=f'[{level} ] request {i} done', timestamp=datetime(2026, 10, 1, 12, i, tzinfo=timezone.utc))
+            for i, (group, level) in enumerate([('tail-a', 'INFO'), ('tail-a', 'ERROR'), ('tail-b', 'WARN')], 1)
+        ]
+
+    def test_filters_match_the_group_stream_and_levels(self):
+        log = self.tail_logs()[1]
+        for query, matches in [('', True), ('logGroupName=tail-a', True), ('logGroupName=tail-b', False),
+                               ('logStreamName=stream-1', True), ('logStreamName=stream-2', False),
+                               ('level=warn, error', True), ('level=INFO', False),
+                               ('logGroupName=tail-a&logStreamName=stream-1&level=ERROR', True),
+                               ('logGroupName=tail-a&level=INFO', False)]:
+            with self.subTest(query=query):
+                self.assertEqual(Subscriber.matches(mock.Mock(filters=parse_filters(QueryDict(query))), log), matches)
+
+    async def test_subscriber_that_falls_behind_is_dropped(self):
+        broker = Broker()
+        errors = Subscriber(parse_filters(QueryDict('level=ERROR')), buffer_size=2)
+        everything = Subscriber(parse_filters(QueryDict('')), buffer_size=2)
+        broker.subscribers.update([errors, everything])
+
+        with self.assertLogs('cloudwatch.tail', 'WARNING'):
+            broker.publish(self.tail_logs())
+            # The events are delivered by the event loop
+            await asyncio.sleep(0)
+
+        self.assertEqual(broker.metrics(), {'subscribers': 1, 'published': 3, 'dropped': 1})
+        self.assertTrue(everything.dropped)
+        frames = [frame async for frame in everything.events()]
+        self.assertEqual(len(frames), 1)
+        self.assertTrue(frames[0].startswith(b'event: dropped\n'))
+
+        self.assertFalse(errors.dropped)
+        self.assertEqual(errors.queue.qsize(), 1)
+        self.assertTrue(errors.queue.get_nowait().startswith(b'id: 2\nevent: log\n'))
+
+    def test_ingest_notifies_only_when_the_live_tail_is_on(self):
+        store_events({}, logGroupName='tail-a')
+        logs = list(Log.objects.filter(logGroupName='tail-a'))
+        for enabled, notifies in ((False, 0), (True, 1)):
+            with self.subTest(enabled=enabled), mock.patch('cloudwatch.tail.LIVE_TAIL', enabled):
+                with CaptureQueriesContext(connection) as queries:
+                    publish_created(logs)
+                self.assertEqual(sum('pg_notify' in query['sql'] for query in queries), notifies)
+
+
+class ImportResumeTests(TransactionTestCase):
+    # The workers of the import commit in their own connections
+
+    def setUp(self):
+        directory, state = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(state.cleanup)
+        self.directory = directory.name
+        # Outside of the imported directory, where it would be found as an export file
+        self.checkpoint = os.path.join(state.name, 'checkpoint.json')
+        moment = int(datetime(2026, 10, 1, 12, tzinfo=timezone.utc).timestamp() * 1000)
+        with open(os.path.join(self.directory, 'first.ndjson'), 'w') as f:
+            f.writelines(json.dumps({'timestamp': moment + i, 'message': f'[INFO ] import {i} done',
+                                     'ingestionTime': i}) + '\n' for i in range(3))
+        with open(os.path.join(self.directory, 'second.json'), 'w') as f:
+            json.dump({'logStreamName': 'second', 'events': [
+                {'timestamp': moment + i, 'message': f'[WARN ] import {i} retried', 'ingestionTime': i} for i in range(2)
+            ]}, f)
+
+    def run_import(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_logs', self.directory, '--workers', '1', '--checkpoint', self.checkpoint,
+                     '--log-group', 'import-group', '--owner', '1', *args, stdout=out, stderr=err)
+        return out.getvalue()
+
+    def imported(self):
+        return dict(Log.objects.filter(logGroupName='import-group').values_list('logStreamName')
+                    .annotate(count=Count('id')).order_by())
+
+    def test_interrupted_import_resumes_after_the_imported_files(self):
+        def write_chunk_failing_on_second(chunk):
+            if chunk[0]['logStreamName'] == 'second':
+                raise RuntimeError("The database went away")
+            return write_chunk(chunk)
+
+        # The workers are forked while the failure is patched in
+        with mock.patch('cloudwatch.importer.write_chunk', write_chunk_failing_on_second):
+            with self.assertRaisesMessage(RuntimeError, "The database went away"):
+                self.run_import()
+        self.assertEqual(self.imported(), {'first': 3})
+        with open(self.checkpoint) as f:
+            self.assertEqual([key.split(':')[0] for key in json.load(f)['done']],
+                             [os.path.join(self.directory, 'first.ndjson')])
+
+        out = self.run_import()
+        self.assertIn('Importing 1 ranges of 1 files with 1 workers (1 ranges already imported)', out)
+        self.assertIn('Imported 2 logs', out)
+        self.assertEqual(self.imported(), {'first': 3, 'second': 2})
+        # The import is complete, its checkpoint is removed
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+        # Imported again from scratch, every event is a duplicate
+        out = self.run_import('--restart')
+        self.assertIn('Imported 0 logs', out)
+        self.assertIn('5 duplicates skipped', out)
+        self.assertEqual(self.imported(), {'first': 3, 'second': 2})
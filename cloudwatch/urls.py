@@ -1,17 +1,31 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 from .views import Logview
 
 urlpatterns = [
     path('logs/', views.log_list, name='log_list'),
+    path('logs/batch/', views.log_batch, name='log_batch'),
+    path('logs/stream/', views.log_stream, name='log_stream'),
+    path('logs/queue/', views.ingest_queue, name='ingest_queue'),
     path('logs/<int:pk>/', views.log_detail, name='log_detail'),
     path('log-counts/', views.log_count_list, name='log_count_list'),
     path('filter-logs/', views.filter_logs, name='filter-logs'),
+    path('search/', views.log_search, name='log_search'),
     path("logs_views/", views.logs_views, name="logs_views"),
     path("log_api/", Logview.as_view(), name="log_api"),
     path('total-logs-count/', views.total_logs_count, name='total-logs-count'),
     path('recent-logs/', views.recent_logs, name='recent-logs'),
     path('logs/grouped/', views.logs_grouped_by_group_and_stream, name='logs_grouped_by_group_and_stream'),
+    path('templates/', views.log_templates, name='log_templates'),
     path('logs/log_count_interval/',views.log_count_interval,name='log_count_interval'),
     path('last_seven_days/',views.last_seven_days,name='last_seven_days'),
+    path('cache-stats/', views.cache_statistics, name='cache_statistics'),
+    path('metrics/', views.metrics, name='metrics'),
+    # Async versions of the read endpoints, for ASGI deployments
+    path('async/recent-logs/', async_views.recent_logs, name='async_recent_logs'),
+    path('async/total-logs-count/', async_views.total_logs_count, name='async_total_logs_count'),
+    path('async/filter-logs/', async_views.filter_logs, name='async_filter_logs'),
+    path('async/logs/log_count_interval/', async_views.log_count_interval, name='async_log_count_interval'),
+    path('async/last_seven_days/', async_views.last_seven_days, name='async_last_seven_days'),
+    path('logs/tail/', async_views.live_tail, name='live_tail'),
 ]
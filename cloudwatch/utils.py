@@ -1,5 +1,26 @@
+import hashlib
+import logging
+import re
 from datetime import datetime, timedelta
 
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+LEVEL_PATTERNS = {
+    'info_count': re.compile(r'\[INFO \]'),
+    'error_count': re.compile(r'\[ERROR \]'),
+    'warn_count': re.compile(r'\[WARN \]'),
+}
+
+# Ordered from the most to the least severe, the first marker found in a message wins.
+LEVELS = (
+    ('ERROR', LEVEL_PATTERNS['error_count']),
+    ('WARN', LEVEL_PATTERNS['warn_count']),
+    ('INFO', LEVEL_PATTERNS['info_count']),
+)
+
+
 def get_time_interval(period):
     now = datetime.now()
 
@@ -29,6 +50,90 @@ def get_time_interval(period):
         )
     else:
         raise ValueError("Invalid time period")
-    print("Start-time: ",start_time)
-    print("end-time: ",end_time)
+    logger.debug("Time interval of %s", period, extra={'period': period, 'start': start_time, 'end': end_time})
     return start_time, end_time
+
+
+def count_levels(message):
+    """
+    Counts the occurrences of the INFO, ERROR and WARN markers in a log message.
+
+    Parameters:
+        message (str): The log message.
+
+    Returns:
+        dict: The counts keyed by the LogCount field names.
+    """
+    return {field: len(pattern.findall(message)) for field, pattern in LEVEL_PATTERNS.items()}
+
+
+def parse_level(message):
+    """
+    Returns the level of a log message.
+
+    Parameters:
+        message (str): The log message.
+
+    Returns:
+        str: 'ERROR', 'WARN' or 'INFO' for the most severe marker found in the message,
+             or an empty string if the message has none.
+    """
+    for level, pattern in LEVELS:
+        if pattern.search(message):
+            return level
+    return ''
+
+
+def hash_message(message):
+    """
+    Returns the MD5 hex digest of a log message, the same value as PostgreSQL's md5(message).
+
+    Parameters:
+        message (str): The log message.
+
+    Returns:
+        str: The 32 character digest, part of the identity of a log event.
+    """
+    return hashlib.md5(message.encode('utf-8')).hexdigest()
+
+
+def build_log_filters(params):
+    """
+    Builds the log filter shared by the filter endpoints from the request query parameters.
+
+    Parameters:
+        params (QueryDict): The query parameters, `logGroupName`, `logStreamName`, `period`, `securityinfo`
+                            and `template_id` are used.
+
+    Returns:
+        Q: The filter to apply to the Log queryset.
+
+    Raises:
+        ValueError: If the period, the securityinfo or the template_id is invalid.
+    """
+    logGroupName = params.get('logGroupName', None)
+    logStreamName = params.get('logStreamName', None)
+    period = params.get('period', None)
+    securityinfo = params.get('securityinfo', None)
+
+    filters = Q()
+
+    if logGroupName:
+        filters &= Q(logGroupName=logGroupName)
+    if logStreamName:
+        filters &= Q(logStreamName=logStreamName)
+    if period:
+        start_time, end_time = get_time_interval(period)
+        filters &= Q(timestamp__range=(start_time, end_time))
+    if securityinfo:
+        if securityinfo not in ['INFO', 'ERROR', 'WARN']:
+            raise ValueError("Invalid securityinfo. Valid options are 'INFO', 'ERROR', and 'WARN'.")
+        filters &= Q(level=securityinfo)
+    if params.get('template_id'):
+        if not params['template_id'].isdigit():
+            raise ValueError("Invalid template_id. It must be the id of a template.")
+        # The logs of the templates generalized into it are listed with it, see cloudwatch.templates
+        from .templates import template_family
+        filters &= Q(template_id__in=template_family(int(params['template_id'])))
+
+    return filters
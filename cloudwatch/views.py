@@ -1,25 +1,42 @@
 from rest_framework.decorators import api_view, authentication_classes, permission_classes 
 from rest_framework.response import Response
 from rest_framework import status,generics
-from cloudwatch.utils import get_time_interval
-from .models import Log, LogCount
-from .serializers import LogSerializer
+from cloudwatch.utils import get_time_interval, count_levels, build_log_filters
+from .ingest import (
+    ingest_batch, build_log, insert_logs, store_log, validate_events, record_created, record_updated, record_deleted,
+    BATCH_MAX_SIZE,
+)
+from .writer import writer, ASYNC_INGEST
+from .histogram import histogram, interval_from_params, filters_from_params, interval_counts
+from .stream import open_ndjson, load_ndjson
+from .models import Log, LogCount, LogStream
+from .serializers import LogSerializer, log_fields, log_rows, represent_logs
+from .pagination import KeysetPagination, SearchPagination
+from .export import export_response
+from .search import search_logs
+from .templates import top_templates
+from .cache import cached_response, cache_stats
+from .routers import replica_reads
+from .counters import exact_count, estimated_count
+from .metrics import export_metrics, PROMETHEUS_CONTENT_TYPE
 from rest_framework.exceptions import ValidationError
-import re
-from django.db.models import Q
+from django.http import HttpResponse
+from django.db import IntegrityError, transaction
+import copy
 from .logs import save_log
-from collections import defaultdict
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from rest_framework.authentication import SessionAuthentication
+from authapis.authentication import CachedTokenAuthentication
 from django.utils import timezone
-from django.db.models import Count
-from django.db.models.functions import TruncMinute, TruncHour, TruncDay
+from django.db.models import Count, Q
 from datetime import timedelta, datetime
+from django.utils.dateparse import parse_datetime
 
 
 @api_view(['GET', 'POST'])
-@authentication_classes([SessionAuthentication, TokenAuthentication])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def log_list(request):
     """
     View function for handling GET and POST requests to the log_list endpoint.
@@ -30,28 +47,30 @@ def log_list(request):
     Returns:
         Response: The HTTP response object.
 
-    Raises:
-        ValidationError: If a log with the same ingestionTime already exists.
-
     Description:
         This function handles GET and POST requests to the log_list endpoint.
         If the request method is GET, it retrieves logs based on the provided period query parameter.
         If the period parameter is provided, it calls the get_time_interval function to get the start and end times
         for the specified period. It then filters the Log objects based on the timestamp range.
         If the period parameter is not provided, it retrieves all Log objects.
-        It serializes the logs using the LogSerializer and returns the serialized data in the response.
+        It returns the logs in the LogSerializer representation, read without building model instances, see
+        represent_logs. The `fields` query parameter, for example `fields=id,timestamp,level`, keeps only these fields.
+        If the `cursor` or `page_size` query parameter is provided, the logs are returned newest first
+        in pages with `next` and `previous` cursor links, see KeysetPagination.
+        If the `export` query parameter is 'ndjson' or 'csv', all the matching logs are streamed in that format instead.
 
         If the request method is POST, it expects the request data to contain a valid log object.
         It validates the serialized data using the LogSerializer.
-        If the data is valid, it checks if a log with the same ingestionTime already exists.
-        If it does, it raises a ValidationError.
-        If it doesn't exist, it saves the log object and calls the update_log_count function to update the log count.
-        It returns the serialized data in the response with a status code of 201 (Created).
+        If the data is valid, it stores the log object together with its log count, unless a log with the same
+        logGroupName, logStreamName, ingestionTime, timestamp and message is already stored.
+        It returns the serialized data of the new log with a status code of 201 (Created), or the serialized data
+        of the stored log with a status code of 200 (OK) for a duplicate, so that retried deliveries are idempotent.
         If the data is not valid, it returns the serializer errors in the response with a status code of 400 (Bad Request).
+        In asynchronous mode, see use_async_ingest, the valid log object is queued for the background writer instead
+        and the response has a status code of 202 (Accepted), or 429 (Too Many Requests) if the queue is full.
     """
         
     if request.method == 'GET':
-        print(timezone.LocalTimezone())
         period = request.query_params.get('period', None)
         if period:
             try:
@@ -62,25 +81,172 @@ def log_list(request):
         else:
             logs = Log.objects.all()
 
-        serializer = LogSerializer(logs, many=True)
-        return Response(serializer.data)
+        try:
+            fields = log_fields(request.query_params.get('fields', None))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        export_format = request.query_params.get('export', None)
+        if export_format:
+            try:
+                return export_response(logs, export_format, fields)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return list_response(log_rows(logs, fields), fields, request)
 
     elif request.method == 'POST':
         serializer = LogSerializer(data=request.data)
         if serializer.is_valid():
-            log_data = serializer.validated_data
-            existing_logs = Log.objects.filter(ingestionTime=log_data['ingestionTime'])
-            if existing_logs.exists():
-                raise ValidationError("A log with the same ingestionTime already exists.")
-            
-            log = serializer.save()
-            update_log_count(log)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            if use_async_ingest(request):
+                if not writer.submit([build_log(serializer.validated_data)]):
+                    return queue_full_response()
+                return Response({'status': 'queued'}, status=status.HTTP_202_ACCEPTED)
+
+            with transaction.atomic():
+                log, created = store_log(serializer.validated_data)
+            response_status = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+            return Response(LogSerializer(log).data, status=response_status)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def log_batch(request):
+    """
+    View function for handling POST requests to the log_batch endpoint.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        Response: The HTTP response object containing the accepted and rejected counts
+                  and one result per submitted log event.
+
+    Description:
+        This function expects the request data to be a list of log objects in the format accepted by log_list.
+        All events are validated together and the valid ones are stored with bulk inserts in one transaction.
+        Events that are already stored are reported as duplicates with the id of the stored log.
+        It returns 201 (Created) if no event was rejected, 207 (Multi-Status) if only some were,
+        and 400 (Bad Request) if all were or if the payload is not a list or exceeds the batch size limit.
+        In asynchronous mode, see use_async_ingest, the valid events are queued for the background writer instead
+        and reported as queued. It then returns 202 (Accepted) if no event was rejected, or 429 (Too Many Requests)
+        without queuing anything if the queue cannot take all the valid events.
+    """
+    events = request.data
+    if not isinstance(events, list):
+        return Response({"error": "Expected a list of log objects."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(events) > BATCH_MAX_SIZE:
+        return Response({"error": f"A batch can contain at most {BATCH_MAX_SIZE} log objects."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    if use_async_ingest(request):
+        candidates, results = validate_events(events)
+        if candidates and not writer.submit([log for _, log in candidates]):
+            return queue_full_response()
+        for index, _ in candidates:
+            results[index] = {'index': index, 'status': 'queued'}
+
+        queued, rejected = len(candidates), len(events) - len(candidates)
+        if rejected == 0:
+            response_status = status.HTTP_202_ACCEPTED
+        elif queued:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({'queued': queued, 'rejected': rejected, 'results': results}, status=response_status)
+
+    results = ingest_batch(events)
+    accepted = sum(1 for result in results if result['status'] == 'accepted')
+    duplicates = sum(1 for result in results if result['status'] == 'duplicate')
+    rejected = len(results) - accepted - duplicates
+
+    if rejected == 0:
+        response_status = status.HTTP_201_CREATED
+    elif accepted or duplicates:
+        response_status = status.HTTP_207_MULTI_STATUS
+    else:
+        response_status = status.HTTP_400_BAD_REQUEST
+    return Response({'accepted': accepted, 'duplicates': duplicates, 'rejected': rejected, 'results': results},
+                    status=response_status)
+
+
+def use_async_ingest(request):
+    """
+    Returns whether a POST to log_list or log_batch is queued for the background writer instead of stored
+    before responding. The `async` query parameter ('true' or 'false') overrides the CLOUDWATCH_ASYNC_INGEST setting.
+    """
+    value = request.query_params.get('async')
+    if value in ('true', 'false'):
+        return value == 'true'
+    return ASYNC_INGEST
+
+
+def queue_full_response():
+    return Response(
+        {"error": "The ingestion queue is full, retry later."},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(max(1, round(writer.flush_interval)))},
+    )
+
+
+@api_view(['GET'])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def ingest_queue(request):
+    """
+    View function for handling GET requests to the ingest_queue endpoint.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        Response: The HTTP response object containing the queue depth and the counters of the background writer
+                  of this process: enqueued, rejected, stored, duplicate and failed logs, and the flush latency.
+    """
+    return Response(writer.metrics())
+
+
+@api_view(['POST'])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def log_stream(request):
+    """
+    View function for handling POST requests to the log_stream endpoint.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        Response: The HTTP response object containing the number of loaded and rejected log events
+                  and the first rejected lines.
+
+    Description:
+        This function expects a newline-delimited JSON body with one log object per line,
+        optionally gzip compressed (Content-Encoding: gzip or Content-Type: application/gzip).
+        The body is read and parsed incrementally instead of through the REST framework parsers,
+        and the log events are loaded in chunks with PostgreSQL COPY, so large exports can be
+        loaded without buffering the whole payload.
+        Log events that are already stored are skipped and counted as duplicates.
+        It returns a 201 (Created) response if at least one log event was loaded or already stored,
+        otherwise a 400 (Bad Request) response.
+    """
+    gzipped = (
+        request.META.get('HTTP_CONTENT_ENCODING', '').lower() == 'gzip'
+        or request.content_type in ('application/gzip', 'application/x-gzip')
+    )
+    try:
+        summary = load_ndjson(open_ndjson(request._request, gzipped=gzipped))
+    except (OSError, EOFError) as e:
+        return Response({"error": f"Could not read the request body: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    response_status = status.HTTP_201_CREATED if summary['loaded'] or summary['duplicates'] else status.HTTP_400_BAD_REQUEST
+    return Response(summary, status=response_status)
+
+
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
-@authentication_classes([SessionAuthentication, TokenAuthentication])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def log_detail(request, pk):
     """
@@ -94,7 +260,7 @@ def log_detail(request, pk):
         Response: The HTTP response object.
 
     Raises:
-        ValidationError: If a log with the same ingestionTime already exists during a PUT or PATCH request.
+        ValidationError: If a PUT or PATCH request would make the log a duplicate of another stored log.
 
     Description:
         This function handles GET, PUT, PATCH, and DELETE requests to the log_detail endpoint.
@@ -130,26 +296,44 @@ def log_detail(request, pk):
     elif request.method == 'PUT':
         serializer = LogSerializer(log, data=request.data)
         if serializer.is_valid():
-            log = serializer.save()
-            update_log_count(log)
+            previous = copy.copy(log)
+            try:
+                with transaction.atomic():
+                    log = serializer.save()
+                    update_log_count(log)
+                    record_updated(previous, log)
+            except IntegrityError:
+                raise ValidationError("A log with the same logGroupName, logStreamName, ingestionTime, "
+                                      "timestamp and message already exists.")
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     elif request.method == 'PATCH':
         serializer = LogSerializer(log, data=request.data, partial=True)
         if serializer.is_valid():
-            log = serializer.save()
-            update_log_count(log)
+            previous = copy.copy(log)
+            try:
+                with transaction.atomic():
+                    log = serializer.save()
+                    update_log_count(log)
+                    record_updated(previous, log)
+            except IntegrityError:
+                raise ValidationError("A log with the same logGroupName, logStreamName, ingestionTime, "
+                                      "timestamp and message already exists.")
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     elif request.method == 'DELETE':
-        log.delete()
+        with transaction.atomic():
+            log.delete()
+            record_deleted([log])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 @api_view(['GET'])
-@authentication_classes([SessionAuthentication, TokenAuthentication])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
+@cached_response()
+@replica_reads
 def log_count_list(request):
     """
     View function for handling GET requests to the log_count_list endpoint.
@@ -162,35 +346,22 @@ def log_count_list(request):
 
     Description:
         This function handles GET requests to the log_count_list endpoint.
-        It initializes the counts for INFO, ERROR, and WARN log messages.
-        It retrieves all logs from the Log model.
-        It loops through the logs and counts the occurrences of patterns
-        '[INFO ]', '[ERROR]', and '[WARN ]' in the log message.
-        It creates a dictionary with the counts and returns it in the response.
-    """
-
-    # Initialize counts
-    info_count = 0
-    error_count = 0
-    warn_count = 0
-
-    # Get all logs
-    logs = Log.objects.all()
-
-    # Loop through logs and count occurrences of patterns
-    for log in logs:
-        if re.search(r'\[INFO \]', log.message):
-            info_count += 1
-        if re.search(r'\[ERROR \]', log.message):
-            error_count += 1
-        if re.search(r'\[WARN \]', log.message):
-            warn_count += 1
+        It counts the logs per level with a single aggregate query over the indexed level column,
+        which is parsed from the log message when the log is stored.
+        It creates a dictionary with the counts for INFO, ERROR, and WARN and returns it in the response.
+    """
+    counts = dict(
+        Log.objects.filter(level__in=['INFO', 'ERROR', 'WARN'])
+        .values_list('level')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
 
     # Create response
     log_counts = {
-        'INFO': info_count,
-        'ERROR': error_count,
-        'WARN': warn_count
+        'INFO': counts.get('INFO', 0),
+        'ERROR': counts.get('ERROR', 0),
+        'WARN': counts.get('WARN', 0)
     }
 
     return Response(log_counts)
@@ -207,17 +378,7 @@ def update_log_count(log):
         None
     """
     
-    message = log.message
-    info_count = len(re.findall(r'\[INFO \]', message))
-    error_count = len(re.findall(r'\[ERROR \]', message))
-    warn_count = len(re.findall(r'\[WARN \]', message))
-
-    log_count, created = LogCount.objects.get_or_create(log=log)
-    if not created:
-        log_count.info_count = info_count
-        log_count.error_count = error_count
-        log_count.warn_count = warn_count
-        log_count.save()
+    LogCount.objects.update_or_create(log=log, defaults=count_levels(log.message))
 
 
 # @api_view(['GET'])
@@ -251,14 +412,16 @@ def update_log_count(log):
 
 
 @api_view(["GET"])
-@authentication_classes([SessionAuthentication, TokenAuthentication])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def logs_views(request):
     if request.method == "GET":
         logs_data = save_log()
         serializer = LogSerializer(data=logs_data, many=True)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                logs = insert_logs([build_log(data) for data in serializer.validated_data])
+                record_created(logs)
             return Response("Logs saved successfully", status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     return Response("Method not allowed", status=status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -267,10 +430,29 @@ def logs_views(request):
 class Logview(generics.ListCreateAPIView):
     queryset = Log.objects.all()
     serializer_class = LogSerializer
+    pagination_class = KeysetPagination
+
+    def list(self, request, *args, **kwargs):
+        try:
+            fields = log_fields(request.query_params.get('fields', None))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = log_rows(self.filter_queryset(self.get_queryset()), fields)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(represent_logs(page, fields))
+        return Response(represent_logs(rows, fields))
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            serializer.instance, _ = store_log(serializer.validated_data)
 
 @api_view(['GET'])
-@authentication_classes([SessionAuthentication, TokenAuthentication])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
+@cached_response(scope=('logGroupName', 'logStreamName'))
+@replica_reads
 def total_logs_count(request):
     """
     View function for handling GET requests to the total_logs_count endpoint.
@@ -280,14 +462,58 @@ def total_logs_count(request):
 
     Returns:
         Response: The HTTP response object containing the total count of logs.
+
+    Description:
+        The count can be restricted with the `logGroupName`, `logStreamName` and `owner` query parameters.
+        It is read from the counters maintained as logs are stored and deleted, so the Log table is not scanned.
+        Combinations of filters that no counter covers, as well as `period` and `securityinfo`, fall back
+        to counting the logs.
+        With `approximate=true` any of these filters is answered from the PostgreSQL planner statistics
+        instead, which is fast but only as accurate as the last ANALYZE of the table.
     """
-    total_count = Log.objects.count()
+    params = request.query_params
+    try:
+        filters, owner = count_filters(params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if params.get('approximate') == 'true':
+        total_count = estimated_count(Log.objects.filter(filters))
+        return Response({'total_logs_count': total_count, 'approximate': True})
+
+    total_count = None
+    if not params.get('period') and not params.get('securityinfo'):
+        total_count = exact_count(params.get('logGroupName'), params.get('logStreamName'), owner)
+    if total_count is None:
+        total_count = Log.objects.filter(filters).count()
     return Response({'total_logs_count': total_count})
 
 
+def count_filters(params):
+    """
+    Reads the filters of the total_logs_count endpoint from its query parameters.
+
+    Returns:
+        tuple: The filter to apply to the Log queryset and the owner, if any.
+
+    Raises:
+        ValueError: If a filter is invalid.
+    """
+    filters = build_log_filters(params)
+    try:
+        owner = int(params['owner']) if params.get('owner') else None
+    except ValueError:
+        raise ValueError("Invalid owner. It must be an integer.")
+    if owner is not None:
+        filters &= Q(owner=owner)
+    return filters, owner
+
+
 @api_view(['GET'])
-@authentication_classes([SessionAuthentication, TokenAuthentication])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
+@cached_response()
+@replica_reads
 def recent_logs(request):
     """
     View function for handling GET requests to the recent_logs endpoint.
@@ -296,16 +522,22 @@ def recent_logs(request):
         request (HttpRequest): The HTTP request object.
 
     Returns:
-        Response: The HTTP response object containing the most recent 5 logs.
+        Response: The HTTP response object containing the most recent 5 logs, with the `fields` query parameter
+                  selecting their fields like the log_list endpoint.
     """
-    recent_logs = Log.objects.order_by('-timestamp')[:5]
-    serializer = LogSerializer(recent_logs, many=True)
-    return Response(serializer.data)
+    try:
+        fields = log_fields(request.query_params.get('fields', None))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    recent_logs = log_rows(Log.objects.order_by('-timestamp'), fields)[:5]
+    return Response(represent_logs(recent_logs, fields))
 
 
 @api_view(['GET'])
-@authentication_classes([SessionAuthentication, TokenAuthentication])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def filter_logs(request):
     """
     View function for handling GET requests to filter logs based on multiple query parameters.
@@ -319,38 +551,85 @@ def filter_logs(request):
     Description:
         This function handles GET requests to filter logs based on `logname`, `logstreamname`, `period`, and `securityinfo` query parameters.
         It retrieves the query parameters from the request, applies the necessary filters, and returns the filtered logs in the response.
+        The `cursor` and `page_size` query parameters return the logs in pages and `fields` selects the fields
+        of the logs, like the log_list endpoint, and `export=ndjson` or `export=csv` streams all the matching logs in that format.
     """
-    logGroupName = request.query_params.get('logGroupName', None)
-    logStreamName = request.query_params.get('logStreamName', None)
-    period = request.query_params.get('period', None)
-    securityinfo = request.query_params.get('securityinfo', None)
+    try:
+        filters = build_log_filters(request.query_params)
+        fields = log_fields(request.query_params.get('fields', None))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    filters = Q()
+    logs = Log.objects.filter(filters)
 
-    if logGroupName:
-        filters &= Q(logGroupName=logGroupName)
-    if logStreamName:
-        filters &= Q(logStreamName=logStreamName)
-    if period:
+    export_format = request.query_params.get('export', None)
+    if export_format:
         try:
-            start_time, end_time = get_time_interval(period)
-            filters &= Q(timestamp__range=(start_time, end_time))
+            return export_response(logs, export_format, fields)
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-    if securityinfo:
-        if securityinfo not in ['INFO', 'ERROR', 'WARN']:
-            return Response({"error": "Invalid securityinfo. Valid options are 'INFO', 'ERROR', and 'WARN'."}, status=status.HTTP_400_BAD_REQUEST)
-        securityinfo_pattern = f'\\[{securityinfo} \\]'
-        filters &= Q(message__regex=securityinfo_pattern)
 
-    logs = Log.objects.filter(filters)
-    serializer = LogSerializer(logs, many=True)
-    return Response(serializer.data)
+    return list_response(log_rows(logs, fields), fields, request)
+
+
+def list_response(rows, fields, request):
+    """
+    Returns the response of a log listing, paginated like KeysetPagination does when the request asks for it.
+
+    Parameters:
+        rows (QuerySet): The rows of the logs, see log_rows.
+        fields (list): The fields to represent, see log_fields.
+        request (Request): The request, for the pagination parameters.
+    """
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(rows, request)
+    if page is not None:
+        return paginator.get_paginated_response(represent_logs(page, fields))
+    return Response(represent_logs(rows, fields))
 
 
 @api_view(['GET'])
-@authentication_classes([SessionAuthentication, TokenAuthentication])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
+@replica_reads
+def log_search(request):
+    """
+    View function for handling GET requests to search the log messages.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        Response: The HTTP response object containing a page of matching logs with `next` and `previous` links.
+
+    Description:
+        This function searches the log messages for the `q` query parameter.
+        With `mode=text` (the default) the words of `q` are matched with the full-text index and the logs
+        are ranked by relevance; with `mode=substring` any log whose message contains `q` is returned, newest first.
+        The search combines with the `logGroupName`, `logStreamName`, `period` and `securityinfo` filters
+        of the filter_logs endpoint, and the results are paginated with `limit` and `offset`.
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({"error": "The 'q' query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        filters = build_log_filters(request.query_params)
+        logs = search_logs(query, mode=request.query_params.get('mode', 'text'), filters=filters)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = SearchPagination()
+    page = paginator.paginate_queryset(logs, request)
+    serializer = LogSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+@cached_response(scope=('logGroupName',))
+@replica_reads
 def logs_grouped_by_group_and_stream(request):
     """
     View function for handling GET requests to retrieve logs grouped by logGroupName and logStreamName.
@@ -360,26 +639,82 @@ def logs_grouped_by_group_and_stream(request):
 
     Returns:
         Response: The HTTP response object containing the logGroupName and logStreamName grouped by logGroupName and logStreamName.
+
+    Description:
+        The groups and streams are read from the LogGroup and LogStream catalog, which is kept up to date
+        as logs are stored, so the Log table is not scanned. Each group and stream comes with the time its
+        first and last logs were seen and the number of logs it holds.
+        The listing can be restricted to one group with the `logGroupName` query parameter.
     """
-    logs = Log.objects.all()
-    logs_by_group_and_stream = defaultdict(set)
+    streams = LogStream.objects.filter(log_count__gt=0).select_related('group').order_by('group__name', 'name')
+    if request.query_params.get('logGroupName'):
+        streams = streams.filter(group__name=request.query_params['logGroupName'])
+
+    groups = {}
+    for stream in streams:
+        if stream.group_id not in groups:
+            groups[stream.group_id] = {
+                "logGroupName": stream.group.name,
+                "firstSeen": stream.group.first_seen,
+                "lastSeen": stream.group.last_seen,
+                "logCount": stream.group.log_count,
+                "logStreams": [],
+            }
+        groups[stream.group_id]["logStreams"].append({
+            "logStreamName": stream.name,
+            "firstSeen": stream.first_seen,
+            "lastSeen": stream.last_seen,
+            "logCount": stream.log_count,
+        })
 
-    for log in logs:
-        logs_by_group_and_stream[log.logGroupName].add(log.logStreamName)
+    return Response(list(groups.values()))
 
-    response_data = []
-    for group_name, streams in logs_by_group_and_stream.items():
-        group_data = {
-            "logGroupName": group_name,
-            "logStreams": [{"logStreamName": stream_name} for stream_name in streams]
-        }
-        response_data.append(group_data)
+@api_view(['GET'])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+@cached_response(scope=('logGroupName', 'logStreamName'))
+@replica_reads
+def log_templates(request):
+    """
+    View function for handling GET requests to retrieve the message templates with the most logs.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        Response: The HTTP response object containing the templates, each with its template_id, its text and
+        its number of logs, the most frequent first.
+
+    Description:
+        The logs can be restricted with the query parameters of the filter_logs endpoint and to a window
+        with `start` and `end` (ISO 8601). `limit` sets the number of templates returned, 20 by default.
+        The logs are counted by grouping on their template id, see cloudwatch.templates. The logs of a
+        template are listed by the filter_logs endpoint with `template_id`.
+    """
+    params = request.query_params
+    try:
+        filters = build_log_filters(params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    limit = params.get('limit', '20')
+    if not limit.isdigit() or int(limit) < 1:
+        return Response({"error": "Invalid limit. It must be a positive number."}, status=status.HTTP_400_BAD_REQUEST)
+
+    for param, lookup in (('start', 'timestamp__gte'), ('end', 'timestamp__lt')):
+        if params.get(param):
+            moment = parse_datetime(params[param])
+            if moment is None:
+                return Response({"error": f"Invalid {param}. It must be an ISO 8601 datetime."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            filters &= Q(**{lookup: moment})
+
+    return Response(top_templates(Log.objects.filter(filters), int(limit)))
 
-    return Response(response_data)
 
 @api_view(['GET'])
-@authentication_classes([SessionAuthentication, TokenAuthentication])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def log_count_interval(request):
     """
     View function to get the count of logs in specified intervals.
@@ -389,83 +724,82 @@ def log_count_interval(request):
 
     Returns:
         Response: The HTTP response object containing the count of logs in specified intervals.
+
+    Description:
+        The intervals are either one of the `interval_type` presets, or an arbitrary range given by
+        `start`, `end` (defaults to now) and `width` (seconds or a duration such as 00:05:00).
+        The logs can be restricted with `logGroupName`, `logStreamName` and `securityinfo`, and
+        `split_by=level` or `split_by=stream` adds the count per level or per log stream of each interval.
+        All intervals, including empty ones, are computed from a single grouped query.
     """
-    interval_type = request.query_params.get('interval_type', 'last_week')
-    now = timezone.now()
-    print(now)
-    
-    if interval_type == 'last_hour':
-        end_time = now.replace(minute=0, second=0, microsecond=0) + timedelta(minutes=10)
-        start_time = end_time - timedelta(hours=1)
-        interval_delta = timedelta(minutes=5)
-        truncate_function = TruncMinute
-    elif interval_type == 'last_day':
-        end_time = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(hours=6,minutes=45)
-        start_time = end_time - timedelta(days=1)
-        interval_delta = timedelta(hours=1)
-        truncate_function = TruncHour
-    elif interval_type == 'previous_day':
-        end_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        start_time = end_time - timedelta(days=1)
-        interval_delta = timedelta(hours=1)
-        truncate_function = TruncHour
-    elif interval_type == 'last_week':
-        end_of_last_week = now - timedelta(days=now.weekday() + 2)
-        end_time = end_of_last_week.replace(hour=0, minute=0, second=0, microsecond=0)
-        start_of_last_week = end_time - timedelta(days=6)
-        start_time = start_of_last_week.replace(hour=0, minute=0, second=0, microsecond=0)
-        interval_delta = timedelta(days=1)
-        truncate_function = TruncDay
-    elif interval_type == 'last_month':
-        first_day_of_current_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        last_day_of_last_month = first_day_of_current_month - timedelta(days=1)
-        start_time = last_day_of_last_month.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        end_time = last_day_of_last_month.replace(hour=23, minute=59, second=59, microsecond=999999)
-        interval_delta = timedelta(days=1)
-        truncate_function = TruncDay
-    else:
-        return Response({"error": "Invalid interval type. Valid options are 'last_hour', 'last_day', 'previous_day', 'last_week', and 'last_month'."},
-                        status=status.HTTP_400_BAD_REQUEST)
-    print("Start-time: ",start_time)
-    print("end-time: ",end_time)
-    # Truncate timestamp to the specified interval and count logs
-    logs = Log.objects.filter(timestamp__range=(start_time, end_time))
-    logs = logs.annotate(interval=truncate_function('timestamp'))
-    logs_count = logs.values('interval').annotate(count=Count('id')).order_by('interval')
-
-    # Prepare response data with all intervals
-    response_data = []
-    interval_time = start_time
-
-    while interval_time <= end_time:
-        interval_end = interval_time + interval_delta
-        count = Log.objects.filter(timestamp__range=(interval_time, interval_end)).count()
-        # count = next((item['count'] for item in logs_count if item['interval'] == interval_time), 0)
-        response_data.append({
-            # 'interval_start': interval_time,
-            'interval': interval_end,
-            'count': count
-        })
-        interval_time += interval_delta
+    try:
+        start_time, end_time, interval_delta = interval_from_params(request.query_params, timezone.now())
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    split_by = request.query_params.get('split_by', None)
 
+    try:
+        buckets = histogram(start_time, end_time, interval_delta, split_by=split_by,
+                            filters=filters_from_params(request.query_params))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    response_data = interval_counts(buckets, split_by)
     return Response(response_data, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
-@authentication_classes([SessionAuthentication, TokenAuthentication])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
+@cached_response()
+@replica_reads
 def last_seven_days(request):
     current_date = datetime.now()
+    first_day = (current_date - timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
+    log_counts = [bucket['count'] for bucket in histogram(first_day, first_day + timedelta(days=7), timedelta(days=1))]
+    return Response(daily_counts(current_date, log_counts))
+
 
+def daily_counts(current_date, log_counts):
+    """Lays out the counts of the seven days before current_date as the last_seven_days response."""
     last_week_log = []
-    for i in range(1, 8):
+    for i in range(7, 0, -1):
         previous_day = current_date - timedelta(days=i)
-        start_date = previous_day.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_date = previous_day.replace(hour=23, minute=59, second=59, microsecond=999999)
-        log_count = Log.objects.filter(timestamp__range=(start_date, end_date)).count()
         formatted_date = previous_day.astimezone().isoformat(timespec="milliseconds")
-        log_entry = {"timestamp": formatted_date, "log_count": log_count}
+        log_entry = {"timestamp": formatted_date, "log_count": log_counts[7 - i]}
         last_week_log.append(log_entry)
+    return last_week_log
+
+
+@api_view(['GET'])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def cache_statistics(request):
+    """
+    View function for handling GET requests to the cache_statistics endpoint.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        Response: The HTTP response object containing the cache hits, misses and hit ratio of each cached endpoint.
+    """
+    return Response(cache_stats())
+
 
-    last_week_log.reverse()
-    return Response(last_week_log)
+@api_view(['GET'])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def metrics(request):
+    """
+    View function for handling GET requests to the metrics endpoint.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: The request latency, SQL query count and duration, response size and serializer time
+                      histograms per URL name and method, and the ingestion queue of this process,
+                      in the Prometheus text exposition format.
+    """
+    return HttpResponse(export_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,169 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .ingest import store_logs
+
+logger = logging.getLogger(__name__)
+
+ASYNC_INGEST = getattr(settings, 'CLOUDWATCH_ASYNC_INGEST', False)
+QUEUE_MAX_DEPTH = getattr(settings, 'CLOUDWATCH_QUEUE_MAX_DEPTH', 50000)
+WRITER_BATCH_SIZE = getattr(settings, 'CLOUDWATCH_WRITER_BATCH_SIZE', 1000)
+WRITER_FLUSH_INTERVAL = getattr(settings, 'CLOUDWATCH_WRITER_FLUSH_INTERVAL', 0.5)
+WRITER_MAX_ATTEMPTS = 3
+SHUTDOWN_TIMEOUT = 30
+
+
+class BatchWriter:
+    """
+    Stores logs from a bounded in-process queue with a background thread.
+
+    The thread writes a batch as soon as batch_size logs are waiting, or when the oldest
+    waiting log has waited flush_interval seconds, so a burst of requests turns into a few
+    multi-row inserts instead of one transaction per request.
+    submit() never blocks: when the queue cannot take the logs it returns False and the
+    caller answers 429 (Too Many Requests).
+    """
+
+    def __init__(self, max_depth=QUEUE_MAX_DEPTH, batch_size=WRITER_BATCH_SIZE, flush_interval=WRITER_FLUSH_INTERVAL):
+        self.max_depth = max_depth
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopping = False
+        self.oldest = None
+        self.stats = {
+            'enqueued': 0,
+            'rejected': 0,
+            'stored': 0,
+            'duplicates': 0,
+            'failed': 0,
+            'flushes': 0,
+            'flush_seconds_total': 0.0,
+            'flush_seconds_max': 0.0,
+            'last_flush_seconds': None,
+        }
+
+    def submit(self, logs):
+        """
+        Queues unsaved logs for the background thread.
+
+        Parameters:
+            logs (list): Unsaved Log objects built with build_log.
+
+        Returns:
+            bool: False if the logs were not queued because the queue is full or the writer is stopping.
+                  Either all the logs are queued or none is.
+        """
+        with self.condition:
+            if self.stopping or len(self.pending) + len(logs) > self.max_depth:
+                self.stats['rejected'] += len(logs)
+                return False
+            if not self.pending:
+                self.oldest = time.monotonic()
+            self.pending.extend(logs)
+            self.stats['enqueued'] += len(logs)
+            self.start()
+            self.condition.notify()
+        return True
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run, name='cloudwatch-writer', daemon=True)
+            self.thread.start()
+
+    def next_batch(self):
+        """Waits until a batch is due and takes it from the queue, returns an empty list once stopped and drained."""
+        with self.condition:
+            while True:
+                if self.pending:
+                    waited = time.monotonic() - self.oldest
+                    if self.stopping or len(self.pending) >= self.batch_size or waited >= self.flush_interval:
+                        break
+                    self.condition.wait(self.flush_interval - waited)
+                elif self.stopping:
+                    return []
+                else:
+                    self.condition.wait()
+
+            batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+            self.oldest = time.monotonic() if self.pending else None
+            return batch
+
+    def run(self):
+        try:
+            while batch := self.next_batch():
+                self.flush(batch)
+        finally:
+            connection.close()
+
+    def flush(self, batch):
+        """Stores a batch in one transaction, retrying it a few times if the database fails."""
+        started = time.monotonic()
+        for attempt in range(1, WRITER_MAX_ATTEMPTS + 1):
+            close_old_connections()
+            try:
+                with transaction.atomic():
+                    stored = len(store_logs(batch))
+                break
+            except Exception:
+                for log in batch:
+                    log.id = None
+                if attempt == WRITER_MAX_ATTEMPTS:
+                    logger.exception("Dropping a batch of %d logs after %d attempts", len(batch), attempt)
+                    with self.condition:
+                        self.stats['failed'] += len(batch)
+                    return
+                logger.warning("Storing a batch of %d logs failed, retrying", len(batch), exc_info=True)
+                time.sleep(0.1 * 2 ** attempt)
+
+        elapsed = time.monotonic() - started
+        with self.condition:
+            self.stats['stored'] += stored
+            self.stats['duplicates'] += len(batch) - stored
+            self.stats['flushes'] += 1
+            self.stats['flush_seconds_total'] += elapsed
+            self.stats['flush_seconds_max'] = max(self.stats['flush_seconds_max'], elapsed)
+            self.stats['last_flush_seconds'] = elapsed
+
+    def stop(self, timeout=SHUTDOWN_TIMEOUT):
+        """
+        Stops accepting logs and waits for the queued ones to be stored.
+
+        Returns:
+            bool: True if the queue was drained within the timeout.
+        """
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                logger.error("The log writer did not drain its queue within %s seconds", timeout)
+                return False
+        return True
+
+    def metrics(self):
+        """
+        Returns the queue depth and the counters of the writer.
+
+        Returns:
+            dict: The current and maximum queue depth, the number of enqueued, rejected, stored,
+                  duplicate and failed logs, and the number and duration of the flushes.
+        """
+        with self.condition:
+            metrics = dict(self.stats, queue_depth=len(self.pending), queue_max_depth=self.max_depth)
+        flushes = metrics['flushes']
+        metrics['flush_seconds_avg'] = metrics['flush_seconds_total'] / flushes if flushes else None
+        return metrics
+
+
+writer = BatchWriter()
+atexit.register(writer.stop)